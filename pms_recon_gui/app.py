@@ -19,6 +19,9 @@ def load_config():
     return {}
 
 def main():
+    from normalize.common import enable_copy_on_write
+    enable_copy_on_write()
+
     st.title("🏦 Bank ↔ Broker Reconciliation")
     st.markdown("### Welcome to the Local Reconciliation Tool")
     
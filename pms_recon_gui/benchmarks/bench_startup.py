@@ -0,0 +1,109 @@
+"""
+Cold-start import benchmark for the Streamlit app, its pages and the recon_clean CLIs.
+
+Each entry point runs in a fresh interpreter with `-X importtime`; we report
+wall time, total import time and the heaviest top-level imports.
+Streamlit scripts run in "bare" mode (no server), CLIs run with --help.
+
+Usage:
+    python benchmarks/bench_startup.py [--top 8] [--repeat 3] [--json startup.json]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CLEAN_DIR = os.path.abspath(os.path.join(APP_DIR, '..', 'recon_clean', 'src'))
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+)\s*\|\s+(\d+)\s*\|( *)(\S+)')
+
+def discover_targets():
+    """(name, script path, argv) for app.py, each page, the local CLIs and each recon_clean CLI."""
+    targets = [("app.py", os.path.join(APP_DIR, "app.py"), [])]
+    pages_dir = os.path.join(APP_DIR, "pages")
+    for name in sorted(os.listdir(pages_dir)):
+        if name.endswith(".py"):
+            targets.append((f"pages/{name}", os.path.join(pages_dir, name), []))
+    for name in ["cli.py", "service.py", "watcher.py"]:
+        targets.append((name, os.path.join(APP_DIR, name), ["--help"]))
+    for name in ["bank_parser.py", "broker_cleaner.py", "diff_report.py"]:
+        path = os.path.join(CLEAN_DIR, name)
+        if os.path.exists(path):
+            targets.append((f"recon_clean/{name}", path, ["--help"]))
+    return targets
+
+def run_once(path: str, argv: list) -> dict:
+    """One fresh-interpreter run of a script (path=None: bare interpreter baseline)."""
+    code = "pass" if path is None else (
+        "import runpy, sys\n"
+        f"sys.argv = [{path!r}] + {argv!r}\n"
+        "try:\n"
+        f"    runpy.run_path({path!r}, run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    )
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(path) if path else APP_DIR, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000.0
+
+    top_level = {}
+    n_modules = 0
+    for line in proc.stderr.splitlines():
+        m = IMPORT_LINE.match(line)
+        if not m:
+            continue
+        n_modules += 1
+        cumulative_us, indent, module = int(m.group(2)), len(m.group(3)), m.group(4)
+        # importtime indents nested imports by two spaces per level
+        if indent <= 1:
+            top_level[module] = top_level.get(module, 0) + cumulative_us
+
+    errors = [l for l in proc.stderr.splitlines() if l and not l.startswith("import time:")]
+    return {
+        "wall_ms": wall_ms,
+        "import_ms": sum(top_level.values()) / 1000.0,
+        "modules": n_modules,
+        "top": top_level,
+        "ok": proc.returncode == 0,
+        "error": errors[-1] if proc.returncode != 0 and errors else None,
+    }
+
+def bench(targets, repeat: int) -> list:
+    results = []
+    for name, path, argv in targets:
+        runs = [run_once(path, argv) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r["wall_ms"])
+        results.append({"target": name, **best})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=8, help="heaviest top-level imports to list per target")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per target (best wall time is kept)")
+    parser.add_argument("--json", dest="json_out", help="also write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = bench([("python (baseline)", None, [])] + discover_targets(), args.repeat)
+
+    for res in results:
+        status = "ok" if res["ok"] else f"FAILED ({res['error']})"
+        print(f"\n{res['target']}: wall {res['wall_ms']:.0f} ms, imports {res['import_ms']:.0f} ms, "
+              f"{res['modules']} modules [{status}]")
+        heaviest = sorted(res["top"].items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        for module, us in heaviest:
+            print(f"    {us / 1000.0:8.1f} ms  {module}")
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json_out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Command-line entry points for working without the Streamlit UI.
+
+    python cli.py parse-bank --in statement.TXT --out bank.csv
+    python cli.py raw --in statement.TXT --rows 3 17 [--parsed bank.csv]
+    python cli.py reconcile --bank statement.TXT --broker ledger.pdf --out out [--format csv xlsx zip]
+    python cli.py reconcile --bank statement.TXT --broker ledger.pdf --out out --diagnostics out/diag
+    python cli.py parse-broker --in ledger.pdf --out broker.parquet
+    python cli.py reconcile --backend outofcore --bank bank.parquet --broker broker.parquet --out out
+    python cli.py -v reconcile ...   (planner estimates per date partition)
+    python cli.py reconcile ... --metrics /var/lib/node_exporter   (run metrics; default metrics.dir)
+"""
+import argparse
+import logging
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+def _config(args) -> dict:
+    """config.yml from --config, with --metrics (relative to the working directory) overriding metrics.dir."""
+    from utils.config import load_config
+
+    config = load_config(args.config_path)
+    if args.metrics_dir:
+        config = {**config, 'metrics': {**(config.get('metrics', {}) or {}), 'dir': os.path.abspath(args.metrics_dir)}}
+    return config
+
+def cmd_parse_bank(args):
+    from engine.pipeline import record_parse
+    from parsers.bank_txt_parser import parse_bank_file
+    from utils.metrics import run_metrics
+
+    with run_metrics("parse", _config(args), side="bank") as metrics:
+        with metrics.stage("parse_bank"):
+            df = parse_bank_file(args.input_file, workers=args.workers)
+        record_parse(metrics, "bank", df)
+        with metrics.stage("write"):
+            write_parsed(df, args.output_file)
+        metrics.add("rows_out", len(df), output="bank")
+    print(f"Wrote {len(df)} rows to {args.output_file}")
+
+def cmd_parse_broker(args):
+    from engine.pipeline import record_parse
+    from parsers.broker_pdf_parser import parse_broker_pdf
+    from utils.metrics import run_metrics
+
+    with run_metrics("parse", _config(args), side="broker") as metrics:
+        with metrics.stage("parse_broker"):
+            df = parse_broker_pdf(args.input_file)
+        record_parse(metrics, "broker", df)
+        df = df.reset_index(drop=True)
+        with metrics.stage("write"):
+            write_parsed(df, args.output_file)
+        metrics.add("rows_out", len(df), output="broker")
+    print(f"Wrote {len(df)} rows to {args.output_file}")
+
+def write_parsed(df, path: str):
+    """Parsed rows as CSV (with a row_id column) or Parquet, by extension."""
+    if path.lower().endswith(".parquet"):
+        df.rename_axis("row_id").reset_index().to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index_label="row_id")
+
+def cmd_raw(args):
+    """Print the source block of parsed bank rows, sliced from the mmap'd statement."""
+    import pandas as pd
+    from parsers.bank_txt_parser import RawStatement, parse_bank_file
+
+    if args.parsed:
+        # Offsets saved by parse-bank: no re-parse, each block is a direct slice
+        df = pd.read_csv(args.parsed, index_col="row_id", usecols=["row_id", "raw_start", "raw_end"])
+    else:
+        df = parse_bank_file(args.input_file)
+
+    with RawStatement.open(args.input_file) as raw:
+        for row_id in args.rows:
+            if row_id not in df.index:
+                print(f"# row {row_id}: not found", file=sys.stderr)
+                continue
+            row = df.loc[row_id]
+            print(f"# row {row_id} (bytes {row['raw_start']}-{row['raw_end']})")
+            print(raw.row_block(row).rstrip("\r\n"))
+
+def cmd_reconcile(args):
+    from engine.pipeline import record_results, reconcile_files, write_results
+    from utils.metrics import run_metrics
+
+    config = _config(args)
+    with run_metrics("reconcile", config) as metrics:
+        if args.backend == "outofcore":
+            # Inputs are parsed rows (parse-bank / parse-broker output), streamed into an embedded database
+            from engine.pipeline import reconcile_out_of_core
+            with metrics.stage("match"):
+                results, matcher = reconcile_out_of_core(args.bank, args.broker, config)
+            record_results(metrics, results, matcher)
+            print(f"Out-of-core engine: {matcher.engine}; candidates: {matcher.stats}")
+        else:
+            results, matcher = reconcile_files(args.bank, args.broker, config, metrics=metrics)
+        with metrics.stage("export"):
+            written = write_results(results, args.out_dir, args.formats, config)
+    for path in written:
+        print(f"Wrote {path}")
+    if args.diagnostics_dir:
+        diagnostics = getattr(matcher, 'diagnostics', None)
+        if diagnostics is None:
+            print("No candidate diagnostics for this run (out-of-core backend)", file=sys.stderr)
+            return
+        top_n = args.top or int(config.get('diagnostics_top_n', 20))
+        for path in diagnostics.export(args.diagnostics_dir, top_n):
+            print(f"Wrote {path}")
+
+def _add_config_args(p: argparse.ArgumentParser):
+    p.add_argument("--config", dest="config_path", help="config.yml (default: the app's)")
+    p.add_argument("--metrics", dest="metrics_dir",
+                   help="write the run's Prometheus textfile and metrics.jsonl line here (default: metrics.dir)")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-v", "--verbose", action="store_true", help="log the planner's per-date estimates")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("parse-bank", help="parse a bank TXT statement to CSV / Parquet (with raw byte offsets)")
+    p.add_argument("--in", dest="input_file", required=True)
+    p.add_argument("--out", dest="output_file", required=True)
+    p.add_argument("--workers", type=int, default=0, help="parse processes for large statements (0 = all cores)")
+    _add_config_args(p)
+    p.set_defaults(func=cmd_parse_bank)
+
+    p = sub.add_parser("parse-broker", help="parse a broker PDF ledger to CSV / Parquet")
+    p.add_argument("--in", dest="input_file", required=True)
+    p.add_argument("--out", dest="output_file", required=True)
+    _add_config_args(p)
+    p.set_defaults(func=cmd_parse_broker)
+
+    p = sub.add_parser("raw", help="show the original statement text of parsed bank rows")
+    p.add_argument("--in", dest="input_file", required=True)
+    p.add_argument("--rows", type=int, nargs="+", required=True, help="row ids (bank_row_id in results)")
+    p.add_argument("--parsed", help="CSV from parse-bank; reuses its offsets instead of re-parsing")
+    p.set_defaults(func=cmd_raw)
+
+    p = sub.add_parser("reconcile", help="reconcile bank statements against broker ledgers and export the reports")
+    p.add_argument("--bank", nargs="+", required=True, help="bank TXT statement(s)")
+    p.add_argument("--broker", nargs="+", required=True, help="broker PDF ledger(s)")
+    p.add_argument("--out", dest="out_dir", required=True)
+    p.add_argument("--format", dest="formats", nargs="+", default=["csv"],
+                   choices=["csv", "parquet", "xlsx", "zip"])
+    _add_config_args(p)
+    p.add_argument("--backend", choices=["memory", "outofcore"], default="memory",
+                   help="outofcore: --bank / --broker are parsed .parquet / .csv files, matched in DuckDB / SQLite")
+    p.add_argument("--diagnostics", dest="diagnostics_dir",
+                   help="write candidate-set histograms and the hot bank rows / patterns here")
+    p.add_argument("--top", type=int, help="hot rows / patterns to list (default: diagnostics_top_n)")
+    p.set_defaults(func=cmd_reconcile)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    from normalize.common import enable_copy_on_write
+    enable_copy_on_write()
+    # Planner decisions and estimates go to the "recon.planner" logger
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Optional
+from .preprocess import with_processed_columns
+from .ref_index import RefIndex
+from utils.refs import canonical_ref_keys
+from utils.business_days import BusinessCalendar, day_numbers
+
+@dataclass
+class CandidateGraph:
+    """
+    All (bank row, broker row) pairs that could match under the widest settings
+    of interest, with the per-pair facts every matching rule needs.
+
+    pairs columns:
+        bank_pos, broker_pos  - positional row numbers (sorted by bank, then broker)
+        date_gap              - |bank date - broker date| in days, business days when a
+                                calendar is given (0 if broker date missing)
+        amount_delta          - |bank amount - broker amount|
+        ref_match             - canonical ref keys overlap
+        similarity            - max(ref, narration) token_set_ratio / 100 (0 if not computed)
+    bank columns (one row per bank row): amount, is_ips
+    broker_amount: the broker column matched against (credit for CR, debit for DR)
+    pruned: bank rows whose pairs were hash-joined, i.e. cut at the planner's
+            hash tolerance rather than max_tolerance (None if there are none)
+    """
+    pairs: pd.DataFrame
+    bank: pd.DataFrame
+    broker_amount: np.ndarray
+    date_window: int
+    max_tolerance: float
+    pruned: Optional[np.ndarray] = None
+
+# Candidate join strategies (chosen per date partition by engine.planner)
+NESTED = 'nested'
+SORT_MERGE = 'sort_merge'
+HASH_JOIN = 'hash_join'
+JOIN_STRATEGIES = (NESTED, SORT_MERGE, HASH_JOIN)
+
+def _expand(bank_idx: np.ndarray, lo: np.ndarray, counts: np.ndarray, order: np.ndarray):
+    """(bank_pos, broker_pos) for broker ranges order[lo:lo + count] per bank row, without a Python loop."""
+    bank_pos = np.repeat(bank_idx, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return bank_pos, order[np.repeat(lo, counts) + offsets]
+
+def _window_pairs(bank_days: np.ndarray, broker_days: np.ndarray, window: int):
+    """
+    (bank_pos, broker_pos) for every broker date within bank date ± window,
+    via binary search over the sorted broker dates instead of a nested scan.
+    Broker rows without a date pair with every dated bank row (gap 0),
+    mirroring Matcher's fallback to the bank date.
+    """
+    dated = np.flatnonzero(~np.isnan(broker_days))
+    order = dated[np.argsort(broker_days[dated], kind='stable')]
+    sorted_days = broker_days[order]
+
+    bank_ok = np.flatnonzero(~np.isnan(bank_days))
+    lo = np.searchsorted(sorted_days, bank_days[bank_ok] - window, side='left')
+    hi = np.searchsorted(sorted_days, bank_days[bank_ok] + window, side='right')
+    bank_pos, broker_pos = _expand(bank_ok, lo, hi - lo, order)
+
+    undated = np.flatnonzero(np.isnan(broker_days))
+    if len(undated) and len(bank_ok):
+        bank_pos = np.concatenate([bank_pos, np.repeat(bank_ok, len(undated))])
+        broker_pos = np.concatenate([broker_pos, np.tile(undated, len(bank_ok))])
+    return bank_pos, broker_pos
+
+def window_counts(bank_days: np.ndarray, broker_days: np.ndarray, window: int) -> np.ndarray:
+    """Broker rows in each bank row's date window, as _window_pairs would pair them (0 for undated bank rows)."""
+    broker_sorted = np.sort(broker_days[~np.isnan(broker_days)])
+    counts = (np.searchsorted(broker_sorted, bank_days + window, side='right')
+              - np.searchsorted(broker_sorted, bank_days - window, side='left'))
+    counts = counts + int(np.isnan(broker_days).sum())
+    return np.where(np.isnan(bank_days), 0, counts).astype(np.int64)
+
+def _nested_pairs(bank_days: np.ndarray, broker_days: np.ndarray, window: int, block_cells: int = 1 << 20):
+    """
+    Same pairs as _window_pairs by comparing every bank row with every broker
+    row (in blocks of about block_cells comparisons): no sort, so cheaper for
+    tiny inputs.
+    """
+    bank_ok = np.flatnonzero(~np.isnan(bank_days))
+    undated = np.isnan(broker_days)
+    step = max(1, block_cells // max(1, len(broker_days)))
+    bank_parts, broker_parts = [], []
+    for start in range(0, len(bank_ok), step):
+        rows = bank_ok[start:start + step]
+        ok = (np.abs(bank_days[rows][:, None] - broker_days[None, :]) <= window) | undated[None, :]
+        b, r = np.nonzero(ok)
+        bank_parts.append(rows[b])
+        broker_parts.append(r)
+    if not bank_parts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(bank_parts), np.concatenate(broker_parts)
+
+def _hash_pairs(bank_days: np.ndarray, broker_days: np.ndarray, bank_amount: np.ndarray,
+                broker_amount: np.ndarray, window: int, tolerance: float):
+    """
+    Pairs within the date window AND within `tolerance` in amount, via a hash
+    join on amount buckets of width >= tolerance: each bank row probes its own
+    and the two neighbouring buckets, over broker rows sorted by (bucket, date).
+    Emits only in-tolerance pairs, so dense days with many distinct amounts
+    never expand to the full date window.
+    """
+    width = max(float(tolerance), 0.01)
+    bank_ok = np.flatnonzero(~np.isnan(bank_days))
+    broker_bucket = np.floor(broker_amount / width).astype(np.int64)
+    bank_bucket = np.floor(bank_amount[bank_ok] / width).astype(np.int64)
+    bank_parts, broker_parts = [], []
+
+    dated = np.flatnonzero(~np.isnan(broker_days))
+    if len(dated) and len(bank_ok):
+        buckets = np.unique(broker_bucket[dated])
+        first = min(bank_days[bank_ok].min(), broker_days[dated].min()) - window
+        span = max(bank_days[bank_ok].max(), broker_days[dated].max()) + window - first + 1
+        # One sortable key per broker row: bucket rank, then date
+        keys = np.searchsorted(buckets, broker_bucket[dated]) * span + (broker_days[dated] - first)
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        for shift in (-1, 0, 1):
+            probe = bank_bucket + shift
+            rank = np.minimum(np.searchsorted(buckets, probe), len(buckets) - 1)
+            hit = buckets[rank] == probe
+            base = rank[hit] * span
+            day = bank_days[bank_ok[hit]]
+            lo = np.searchsorted(keys, base + (day - window - first), side='left')
+            hi = np.searchsorted(keys, base + (day + window - first), side='right')
+            b, r = _expand(bank_ok[hit], lo, hi - lo, dated[order])
+            bank_parts.append(b)
+            broker_parts.append(r)
+
+    # Undated broker rows pair with every dated bank row (gap 0): join on amount alone
+    undated = np.flatnonzero(np.isnan(broker_days))
+    if len(undated) and len(bank_ok):
+        order = undated[np.argsort(broker_amount[undated], kind='stable')]
+        amounts = broker_amount[order]
+        lo = np.searchsorted(amounts, bank_amount[bank_ok] - tolerance, side='left')
+        hi = np.searchsorted(amounts, bank_amount[bank_ok] + tolerance, side='right')
+        b, r = _expand(bank_ok, lo, hi - lo, order)
+        bank_parts.append(b)
+        broker_parts.append(r)
+
+    if not bank_parts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    bank_pos, broker_pos = np.concatenate(bank_parts), np.concatenate(broker_parts)
+    keep = np.abs(bank_amount[bank_pos] - broker_amount[broker_pos]) <= tolerance
+    return bank_pos[keep], broker_pos[keep]
+
+def _only(days: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """days with the rows outside mask blanked (NaN rows get no pairs)."""
+    return np.where(mask, days, np.nan)
+
+def build_candidate_graph(bank_df: pd.DataFrame, broker_df: pd.DataFrame, date_window: int,
+                          max_tolerance: float, with_similarity: bool = True,
+                          amount_col: str = 'credit', calendar: BusinessCalendar = None,
+                          join: Optional[np.ndarray] = None, hash_tolerance: float = np.inf,
+                          bank_rows: Optional[np.ndarray] = None) -> CandidateGraph:
+    """
+    Build the candidate pair graph once at the widest date window / tolerance,
+    comparing absolute bank amounts with broker[amount_col]. With a calendar,
+    dates become business-day ordinals, so the window and gaps count business
+    days.
+    Pairs whose amount delta exceeds max_tolerance can never match (every
+    stage enforces the tolerance), so they are dropped up front.
+
+    join: strategy per bank row (JOIN_STRATEGIES, from engine.planner; default
+    sort_merge for all). Hash-joined rows only get pairs within hash_tolerance
+    and are flagged in graph.pruned. bank_rows restricts pairs to those bank
+    positions (positions stay those of the full frames).
+    """
+    bank_df = with_processed_columns(bank_df, ['ref_no', 'narration'])
+    broker_df = with_processed_columns(broker_df, ['transaction_ref', 'particulars'])
+
+    bank_amount = bank_df['amount'].abs().to_numpy(dtype=np.float64)
+    broker_amount = broker_df[amount_col].to_numpy(dtype=np.float64)
+    bank_days = day_numbers(bank_df['txn_date'])
+    broker_days = day_numbers(broker_df['txn_date'])
+    if calendar is not None:
+        bank_days = calendar.ordinals_from_days(bank_days)
+        broker_days = calendar.ordinals_from_days(broker_days)
+
+    wanted = np.ones(len(bank_df), dtype=bool)
+    if bank_rows is not None:
+        wanted[:] = False
+        wanted[np.asarray(bank_rows, dtype=np.int64)] = True
+    if join is None:
+        join = np.full(len(bank_df), SORT_MERGE, dtype=object)
+    pruned = wanted & (join == HASH_JOIN) if np.isfinite(hash_tolerance) else None
+
+    parts = []
+    for strategy in JOIN_STRATEGIES:
+        rows = wanted & (join == strategy)
+        if not rows.any():
+            continue
+        days = _only(bank_days, rows)
+        if strategy == NESTED:
+            parts.append(_nested_pairs(days, broker_days, date_window))
+        elif strategy == HASH_JOIN and pruned is not None:
+            parts.append(_hash_pairs(days, broker_days, bank_amount, np.abs(broker_amount),
+                                     date_window, hash_tolerance))
+        else:
+            parts.append(_window_pairs(days, broker_days, date_window))
+    if parts:
+        bank_pos = np.concatenate([b for b, _ in parts]).astype(np.int64)
+        broker_pos = np.concatenate([r for _, r in parts]).astype(np.int64)
+    else:
+        bank_pos = broker_pos = np.zeros(0, dtype=np.int64)
+    amount_delta = np.abs(bank_amount[bank_pos] - np.abs(broker_amount[broker_pos]))
+    keep = amount_delta <= max_tolerance
+    bank_pos, broker_pos, amount_delta = bank_pos[keep], broker_pos[keep], amount_delta[keep]
+
+    gap = np.abs(bank_days[bank_pos] - broker_days[broker_pos])
+    date_gap = np.where(np.isnan(gap), 0, gap).astype(np.int64)
+
+    # Ref overlap on canonical keys, via the broker ref index (one lookup per bank row)
+    ref_index = RefIndex(enumerate(broker_df['transaction_ref']))
+    ref_hits = [set(ref_index.lookup_keys(canonical_ref_keys(r))) for r in bank_df['ref_no']]
+    ref_match = np.fromiter(
+        (r in ref_hits[b] for b, r in zip(bank_pos, broker_pos)),
+        dtype=bool, count=len(bank_pos)
+    )
+
+    similarity = np.zeros(len(bank_pos), dtype=np.float64)
+    if with_similarity and len(bank_pos):
+        from rapidfuzz import fuzz # only needed when similarity scores are requested
+        
+        bank_ref = bank_df['ref_no_proc'].tolist()
+        bank_narr = bank_df['narration_proc'].tolist()
+        broker_ref = broker_df['transaction_ref_proc'].tolist()
+        broker_part = broker_df['particulars_proc'].tolist()
+        for i, (b, r) in enumerate(zip(bank_pos, broker_pos)):
+            score = 0.0
+            if bank_ref[b] and broker_ref[r]:
+                score = fuzz.token_set_ratio(bank_ref[b], broker_ref[r])
+            if bank_narr[b] and broker_part[r]:
+                score = max(score, fuzz.token_set_ratio(bank_narr[b], broker_part[r]))
+            similarity[i] = score / 100.0
+
+    pairs = pd.DataFrame({
+        "bank_pos": bank_pos,
+        "broker_pos": broker_pos,
+        "date_gap": date_gap,
+        "amount_delta": amount_delta,
+        "ref_match": ref_match,
+        "similarity": similarity,
+    }).sort_values(["bank_pos", "broker_pos"], kind='stable').reset_index(drop=True)
+
+    bank = pd.DataFrame({
+        "amount": bank_amount,
+        # Same test as compute_tolerance's IPS rule
+        "is_ips": bank_df['narration'].map(lambda n: "IPS" in str(n).upper()).to_numpy(dtype=bool),
+    })
+
+    return CandidateGraph(
+        pairs=pairs,
+        bank=bank,
+        broker_amount=broker_amount,
+        date_window=date_window,
+        max_tolerance=max_tolerance,
+        pruned=pruned if pruned is not None and pruned.any() else None,
+    )
+
+def bank_tolerances(bank: pd.DataFrame, config: dict) -> np.ndarray:
+    """Vectorized compute_tolerance over CandidateGraph.bank."""
+    tol_cfg = config.get('tolerance', {})
+    ips = np.where(bank['is_ips'].to_numpy(), float(tol_cfg.get('ips_max', 10.0)), 0.0)
+    rtgs_threshold = float(tol_cfg.get('rtgs_threshold', 2000000.0))
+    rtgs = np.where(bank['amount'].to_numpy() >= rtgs_threshold, float(tol_cfg.get('rtgs_flat', 100.0)), 0.0)
+    return ips + rtgs
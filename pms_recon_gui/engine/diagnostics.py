@@ -0,0 +1,152 @@
+import os
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .candidates import window_counts
+from .memo import text_fingerprint
+from .stages import MatchState, PairView
+from utils.business_days import BusinessCalendar, day_numbers
+
+# Per bank row candidate-set sizes, in pipeline order
+METRICS = ('date_candidates', 'amount_candidates', 'fuzzy_comparisons')
+
+def _bucket(values: np.ndarray) -> np.ndarray:
+    """Power-of-two bucket per count: 0 -> 0, 1 -> 1, 2-3 -> 2, 4-7 -> 3, ..."""
+    values = np.asarray(values, dtype=np.int64)
+    out = np.zeros(len(values), dtype=np.int64)
+    pos = values > 0
+    out[pos] = np.floor(np.log2(values[pos])).astype(np.int64) + 1
+    return out
+
+def _bucket_label(b: int) -> str:
+    if b == 0:
+        return "0"
+    lo, hi = 2 ** (b - 1), 2 ** b - 1
+    return str(lo) if lo == hi else f"{lo}-{hi}"
+
+class CandidateDiagnostics:
+    """
+    Candidate-set sizes per bank row of one run, to find the rows that blow up
+    matching time (round amounts, generic narrations):
+        date_candidates    broker rows in the date window
+        amount_candidates  of those, within the row's amount tolerance
+        fuzzy_comparisons  similarity checks the FUZZY stage made for the row
+    rows has one row per bank row: side, bank_row_id, txn_date, amount,
+    ref_no, narration, the three counts and the final match_type (None if
+    unmatched).
+    """
+    def __init__(self, rows: pd.DataFrame):
+        self.rows = rows
+
+    @classmethod
+    def concat(cls, parts: Iterable[Optional["CandidateDiagnostics"]]) -> Optional["CandidateDiagnostics"]:
+        frames = [p.rows for p in parts if p is not None]
+        return cls(pd.concat(frames, ignore_index=True)) if frames else None
+
+    def totals(self) -> dict:
+        out = {"bank_rows": len(self.rows)}
+        for metric in METRICS:
+            out[metric] = int(self.rows[metric].sum())
+        return out
+
+    def histograms(self) -> pd.DataFrame:
+        """Bank rows per power-of-two bucket of each count (metric, bucket, min, rows, share)."""
+        frames = []
+        n = max(len(self.rows), 1)
+        for metric in METRICS:
+            counts = pd.Series(_bucket(self.rows[metric].to_numpy())).value_counts().sort_index()
+            frames.append(pd.DataFrame({
+                "metric": metric,
+                "bucket": [_bucket_label(int(b)) for b in counts.index],
+                "min": [0 if b == 0 else 2 ** (int(b) - 1) for b in counts.index],
+                "rows": counts.to_numpy(),
+                "share": counts.to_numpy() / n,
+            }))
+        return pd.concat(frames, ignore_index=True)
+
+    def histogram_table(self) -> pd.DataFrame:
+        """histograms() as one column per metric, indexed by bucket in ascending order."""
+        hist = self.histograms()
+        table = hist.pivot_table(index='min', columns='metric', values='rows', fill_value=0)
+        table.index = [_bucket_label(0 if m == 0 else int(m).bit_length()) for m in table.index]
+        return table.reindex(columns=[m for m in METRICS if m in table.columns])
+
+    def hot_rows(self, top_n: int = 20) -> pd.DataFrame:
+        """The top_n bank rows by fuzzy comparisons, then amount and date candidates."""
+        by = ['fuzzy_comparisons', 'amount_candidates', 'date_candidates']
+        return self.rows.sort_values(by, ascending=False, kind='stable').head(top_n).reset_index(drop=True)
+
+    def hot_patterns(self, top_n: int = 20) -> pd.DataFrame:
+        """
+        Narration fingerprints (digits dropped, as in the memo) and amounts
+        ranked by their total fuzzy comparisons and amount candidates.
+        """
+        rows = self.rows.assign(
+            narration_pattern=self.rows['narration'].map(text_fingerprint),
+        )
+        frames = []
+        total_calls = max(int(rows['fuzzy_comparisons'].sum()), 1)
+        for kind, col in (("narration", "narration_pattern"), ("amount", "amount")):
+            grouped = rows.groupby(col, dropna=True).agg(
+                rows=('date_candidates', 'size'),
+                date_candidates=('date_candidates', 'sum'),
+                amount_candidates=('amount_candidates', 'sum'),
+                fuzzy_comparisons=('fuzzy_comparisons', 'sum'),
+            )
+            grouped = grouped[grouped['rows'] > 1]
+            grouped = grouped.sort_values(['fuzzy_comparisons', 'amount_candidates'], ascending=False).head(top_n)
+            frames.append(grouped.reset_index().rename(columns={col: "value"}).assign(kind=kind))
+        out = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        out['share_of_fuzzy'] = out['fuzzy_comparisons'] / total_calls
+        return out[['kind', 'value', 'rows', 'date_candidates', 'amount_candidates', 'fuzzy_comparisons',
+                    'share_of_fuzzy']]
+
+    def export(self, out_dir: str, top_n: int = 20) -> List[str]:
+        """histograms.csv, hot_rows.csv, hot_patterns.csv and candidates.csv (every row) into out_dir."""
+        os.makedirs(out_dir, exist_ok=True)
+        paths = []
+        for name, df in (("histograms", self.histograms()), ("hot_rows", self.hot_rows(top_n)),
+                         ("hot_patterns", self.hot_patterns(top_n)), ("candidates", self.rows)):
+            path = os.path.join(out_dir, f"{name}.csv")
+            df.to_csv(path, index=False)
+            paths.append(path)
+        return paths
+
+def candidate_diagnostics(bank_df: pd.DataFrame, broker_df: pd.DataFrame, side: str, date_window: int,
+                          view: PairView, state: MatchState,
+                          calendar: Optional[BusinessCalendar] = None) -> CandidateDiagnostics:
+    """
+    Diagnostics for one Matcher side: date-window counts by binary search
+    (whichever join built the graph), in-tolerance counts from the stages'
+    PairView and fuzzy comparisons recorded in the MatchState.
+    """
+    n = len(bank_df)
+    bank_days = day_numbers(bank_df['txn_date'])
+    broker_days = day_numbers(broker_df['txn_date'])
+    if calendar is not None:
+        bank_days = calendar.ordinals_from_days(bank_days)
+        broker_days = calendar.ordinals_from_days(broker_days)
+
+    fuzzy = np.zeros(n, dtype=np.int64)
+    for pos, calls in state.fuzzy_calls.items():
+        fuzzy[pos] = calls
+    match_type = [None] * n
+    for kind, bank_pos, _ in state.matches:
+        for pos in bank_pos:
+            match_type[pos] = kind
+
+    rows = pd.DataFrame({
+        "side": side,
+        "bank_row_id": bank_df.index,
+        "txn_date": bank_df['txn_date'].to_numpy(),
+        "amount": bank_df['amount'].abs().to_numpy(),
+        "ref_no": bank_df['ref_no'].to_numpy(),
+        "narration": bank_df['narration'].to_numpy(),
+        "date_candidates": window_counts(bank_days, broker_days, date_window),
+        "amount_candidates": np.bincount(view.b.astype(np.int64), minlength=n)[:n],
+        "fuzzy_comparisons": fuzzy,
+        "match_type": match_type,
+    })
+    return CandidateDiagnostics(rows)
@@ -1,202 +1,582 @@
 import pandas as pd
+import numpy as np
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
-from .rules import within_date_window, compute_tolerance, check_similarity
+from .rules import check_processed_similarity
+from .preprocess import with_processed_columns
+from .candidates import build_candidate_graph, bank_tolerances
+from .stages import MatchState, PairView, exact_rows, amount_rows, memo_rows, fuzzy_rows, stage_subset
+from .memo import memo_for
+from .planner import log_plan, plan_side
+from .diagnostics import CandidateDiagnostics, candidate_diagnostics
+from .stage_cache import STAGE_CACHE, stage_key
 from .exceptions import ExceptionCode, ReconException
+from normalize.common import frame_hash
+from utils.jobs import JobCancelled
+from utils.business_days import BusinessCalendar
+
+# Stages that each account for one pass over the bank rows in progress reports
+# ('memo' runs between amount and fuzzy when a counterparty memo is enabled)
+PROGRESS_STAGES = ('candidates', 'exact', 'amount', 'fuzzy', 'subset')
+
+# Match types whose links are fed back into the counterparty memo (not MEMO:
+# a link confirming itself would never age out)
+LEARNED_MATCH_TYPES = ('EXACT',)
+
+# Bank side -> broker column it is reconciled against
+SIDE_COLUMNS = {'CR': 'credit', 'DR': 'debit'}
 
 class Matcher:
-    def __init__(self, bank_df: pd.DataFrame, broker_df: pd.DataFrame, config: dict):
-        self.bank_df = bank_df
-        self.broker_df = broker_df
+    """
+    Staged Bank <-> Broker matching:
+      candidates (date window) -> EXACT (ref + amount) -> REF_MISMATCH (unique amount)
+      -> MEMO (learned counterparty link) -> FUZZY (similarity)
+      -> SPLIT/BULK (many-to-one over the residue)
+    Each stage works on the residue of the previous one, and its result is
+    cached per input data + the config keys it depends on, so re-running with
+    only a later stage's settings changed re-runs only that stage onward.
+
+    The 1:1 stages walk the bank rows in chunks of `match_chunk_size`. Between
+    chunks the optional `cancel` token is checked and `progress` is called as
+    progress(done, total, stage=..., matches=..., eta=...) with done/total in
+    bank rows summed over all stages. A cancelled run still returns the
+    matches found so far (self.cancelled is set).
+
+    One Matcher reconciles one side: bank CR rows against broker credits
+    (side='CR') or bank DR rows against broker debits (side='DR'); bank
+    amounts are compared by absolute value. TwoSidedMatcher runs both.
+
+    With `memo: {enabled: true}` in config, a CounterpartyMemo (engine.memo)
+    learned from earlier EXACT matches links bank narrations and ref
+    prefixes to broker particulars; rows it resolves skip fuzzy scoring. A run
+    matches against a snapshot of the memo taken when it starts and learns
+    after it finishes (TwoSidedMatcher: after both sides finish).
+
+    Unless `planner.enabled` is off, engine.planner picks the candidate join
+    per bank date (nested / sort-merge / hash) and, with `fuzzy_engine: auto`,
+    the dates whose fuzzy pass uses the n-gram shortlist; see self.plan.
+    """
+    def __init__(self, bank_df: pd.DataFrame, broker_df: pd.DataFrame, config: dict, cache=STAGE_CACHE,
+                 progress=None, cancel=None, side: str = 'CR', memo=None):
+        # Fuzzy scorers work on pre-tokenized forms (narration_proc, particulars_proc, ...)
+        self.bank_df = with_processed_columns(bank_df, ['ref_no', 'narration'])
+        self.broker_df = with_processed_columns(broker_df, ['transaction_ref', 'particulars'])
         self.config = config
-        
+        self.side = side
+        self.amount_col = SIDE_COLUMNS[side]
+        # Stage result cache (None disables reuse between runs)
+        self.cache = cache
+        self.progress = progress
+        self.cancel = cancel
+        self.chunk_size = max(1, int(config.get('match_chunk_size', 500)))
+        self.memo = memo if memo is not None else memo_for(config)
+        # False when the caller learns from the run itself (TwoSidedMatcher)
+        self.learn_memo = True
+        self.progress_stages = PROGRESS_STAGES if self.memo is None else (
+            PROGRESS_STAGES[:3] + ('memo',) + PROGRESS_STAGES[3:]
+        )
+
         self.matches = []
         self.unmatched = []
         self.partial = []
         self.exceptions = []
-        
+
         self.matched_broker_indices = set()
-        
+        # Stages actually computed in the last run (the rest came from cache)
+        self.stages_run = []
+        # Wall seconds per stage of the last run, cache hits included (utils.metrics)
+        self.stage_seconds = {}
+        # Set when the run was cancelled; results then cover only the work done
+        self.cancelled = False
+        # Execution plan (engine.planner.MatchPlan; None with the planner disabled)
+        self.plan = None
+        self._planned = False
+        # Candidate-set sizes per bank row of the last run (engine.diagnostics)
+        self.diagnostics = None
+        self._view = None # in-tolerance PairView of the last run
+        self.calendar = BusinessCalendar.from_config(config)
+
+        self._state = MatchState() # latest (possibly in-progress) stage output
+        self._done = 0
+        self._cached = 0 # progress units satisfied from the stage cache
+        self._started = time.perf_counter()
+
+    def make_plan(self):
+        """Plan this side once (statistics only, no matching) and log the plan."""
+        if not self._planned:
+            self.plan = plan_side(self.bank_df, self.broker_df, self.config, self.side,
+                                  self.amount_col, self.calendar)
+            self._planned = True
+            if self.plan is not None:
+                log_plan(self.plan)
+        return self.plan
+
+    def _candidate_graph(self, date_window: int, bank_rows=None, plan=None):
+        """Date-window candidates (no tolerance cut: tolerance is a later stage's key)."""
+        return build_candidate_graph(
+            self.bank_df, self.broker_df, date_window, np.inf, with_similarity=False,
+            amount_col=self.amount_col, calendar=self.calendar,
+            join=plan.row_join if plan is not None else None,
+            hash_tolerance=plan.hash_tolerance if plan is not None else np.inf,
+            bank_rows=bank_rows,
+        )
+
+    def _build_ngram_shortlist(self, rows=None) -> List[list]:
+        """
+        Top-k broker row positions per bank row from the char n-gram TF-IDF index
+        (particulars + transaction_ref vs narration + ref_no). With `rows`, only
+        those bank positions get a shortlist; the others get None.
+        """
+        from .ngram_index import NGramIndex
+
+        rows = range(len(self.bank_df)) if rows is None else rows
+        shortlist = [None] * len(self.bank_df)
+        if self.broker_df.empty:
+            for pos in rows:
+                shortlist[pos] = []
+            return shortlist
+
+        broker_texts = (
+            self.broker_df['particulars'].fillna('').astype(str) + " " +
+            self.broker_df['transaction_ref'].fillna('').astype(str)
+        ).tolist()
+        bank_texts = (
+            self.bank_df['narration'].fillna('').astype(str) + " " +
+            self.bank_df['ref_no'].fillna('').astype(str)
+        ).tolist()
+        bank_texts = [bank_texts[pos] for pos in rows]
+
+        index = NGramIndex(
+            broker_texts,
+            n=int(self.config.get('ngram_size', 3)),
+            block_size=int(self.config.get('ngram_block_size', 256)),
+        )
+        top_k = int(self.config.get('ngram_top_k', 10))
+        for pos, hits in zip(rows, index.top_k(bank_texts, top_k)):
+            shortlist[pos] = hits.tolist()
+        return shortlist
+
+    def _similarity_fn(self):
+        """is_similar(bank_pos, broker_pos): ref or narration above the threshold."""
+        threshold = self.config.get('similarity_threshold', 0.85)
+        bank_ref = self.bank_df['ref_no_proc'].tolist()
+        bank_narr = self.bank_df['narration_proc'].tolist()
+        broker_ref = self.broker_df['transaction_ref_proc'].tolist()
+        broker_part = self.broker_df['particulars_proc'].tolist()
+
+        def is_similar(b: int, r: int) -> bool:
+            return (check_processed_similarity(bank_ref[b], broker_ref[r], threshold) or
+                    check_processed_similarity(bank_narr[b], broker_part[r], threshold))
+        return is_similar
+
+    def _report(self, stage: str):
+        if self.progress is None:
+            return
+        total = self.progress_total
+        computed = self._done - self._cached
+        eta = None
+        if computed > 0:
+            elapsed = time.perf_counter() - self._started
+            eta = elapsed / computed * (total - self._done)
+        self.progress(self._done, total, stage=stage, matches=len(self._state.matches), eta=eta)
+
+    @property
+    def progress_total(self) -> int:
+        return len(self.bank_df) * len(self.progress_stages)
+
+    def _check_cancel(self):
+        if self.cancel is not None:
+            self.cancel.check()
+
+    def _stage(self, parent_key: str, name: str, compute, salt: str = ""):
+        """
+        Run (or fetch from cache) one pipeline stage. Returns (key, result).
+        salt versions inputs that are not config, e.g. the memo's contents.
+        """
+        key = stage_key(parent_key + salt, name, self.config)
+        base = self._done
+        computed = []
+        started = time.perf_counter()
+
+        def run():
+            self._check_cancel()
+            self.stages_run.append(name)
+            computed.append(name)
+            return compute()
+
+        result = run() if self.cache is None else self.cache.get_or_compute(key, run)
+        if isinstance(result, MatchState):
+            self._state = result
+        self._done = base + len(self.bank_df)
+        if not computed:
+            self._cached += len(self.bank_df)
+        self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + time.perf_counter() - started
+        self._report(name)
+        return key, result
+
+    def _chunked(self, name: str, state: MatchState, match_rows) -> MatchState:
+        """
+        Apply match_rows(state, rows) to the bank rows in chunks, in order, on a
+        copy of state. Checks for cancellation and reports progress per chunk.
+        """
+        state = state.copy()
+        self._state = state
+        base = self._done
+        n = len(self.bank_df)
+        for start in range(0, n, self.chunk_size):
+            self._check_cancel()
+            match_rows(state, range(start, min(n, start + self.chunk_size)))
+            self._done = base + min(n, start + self.chunk_size)
+            self._report(name)
+        return state
+
+    def _bank_memo_keys(self) -> List[list]:
+        return [self.memo.bank_keys(n, r) for n, r in zip(self.bank_df['narration'], self.bank_df['ref_no'])]
+
+    def _broker_fingerprints(self) -> list:
+        codes = self.broker_df['client_code'] if 'client_code' in self.broker_df.columns else [None] * len(self.broker_df)
+        return [self.memo.broker_fingerprint(p, c) for p, c in zip(self.broker_df['particulars'], codes)]
+
+    def _memo_rows_fn(self, view: PairView, memo):
+        bank_keys = self._bank_memo_keys()
+        broker_fps = self._broker_fingerprints()
+        targets = lambda bank_pos: memo.targets(bank_keys[bank_pos])
+        return lambda s, rows: memo_rows(view, s, rows, targets, broker_fps)
+
+    def memo_links(self, state: MatchState) -> list:
+        """(bank keys, broker fingerprint) of this run's confident 1:1 links."""
+        learned = [(b[0], r[0]) for match_type, b, r in state.matches if match_type in LEARNED_MATCH_TYPES]
+        if not learned:
+            return []
+        bank_keys = self._bank_memo_keys()
+        broker_fps = self._broker_fingerprints()
+        return [(bank_keys[b], broker_fps[r]) for b, r in learned]
+
+    def _learn(self, state: MatchState):
+        """Feed this run's links back into the memo and persist it."""
+        links = self.memo_links(state)
+        if links:
+            self.memo.learn(links)
+            self.memo.save()
+
+    def run_stages(self) -> MatchState:
+        """
+        Execute the staged pipeline and return the final MatchState (row positions).
+        """
+        self.stages_run = []
+        self.stage_seconds = {}
+        self._state = MatchState()
+        self._view = None
+        self._done = self._cached = 0
+        self._started = time.perf_counter()
+        date_window = int(self.config.get('date_window_days', 2))
+        similarity_enabled = self.config.get('similarity_enabled', False)
+
+        data_key = frame_hash(self.bank_df) + ":" + frame_hash(self.broker_df) + ":" + self.side
+        plan = self.make_plan()
+
+        # 1. Candidate pairs in the date window, joined per date as planned
+        key, graph = self._stage(data_key, 'candidates', lambda: self._candidate_graph(date_window, plan=plan),
+                                 salt=plan.candidates_salt() if plan is not None else "")
+        tolerances = bank_tolerances(graph.bank, self.config)
+        in_tolerance = self._view = PairView(graph, date_window, tolerances)
+
+        # 2. EXACT (Ref + Amount)
+        key, state = self._stage(key, 'exact', lambda: self._chunked(
+            'exact', MatchState(), lambda s, rows: exact_rows(in_tolerance, s, rows)
+        ))
+
+        # 3. Amount match with ref mismatch (single candidate only)
+        key, state = self._stage(key, 'amount', lambda: self._chunked(
+            'amount', state, lambda s, rows: amount_rows(in_tolerance, s, rows)
+        ))
+
+        # 4. Learned counterparty links (O(1) lookups; resolved rows skip fuzzy)
+        if self.memo is not None:
+            memo = self.memo.snapshot()
+            key, state = self._stage(key, 'memo', lambda: self._chunked(
+                'memo', state, self._memo_rows_fn(in_tolerance, memo)
+            ), salt=memo.digest())
+
+        # 5. Fuzzy match (if enabled)
+        def fuzzy():
+            if not similarity_enabled:
+                return state
+            shortlist = None
+            if plan is not None:
+                # Shortlists only for the dates the planner blocked
+                if plan.row_blocked.any():
+                    shortlist = self._build_ngram_shortlist(np.flatnonzero(plan.row_blocked).tolist())
+            elif self.config.get('fuzzy_engine', 'pairwise') == 'ngram':
+                shortlist = self._build_ngram_shortlist()
+            is_similar = self._similarity_fn()
+            return self._chunked(
+                'fuzzy', state, lambda s, rows: fuzzy_rows(in_tolerance, s, rows, is_similar, shortlist)
+            )
+        key, state = self._stage(key, 'fuzzy', fuzzy, salt=plan.fuzzy_salt() if plan is not None else "")
+
+        # 6. Many-to-one pass over the 1:1 residue (split deposits / bulk receipts)
+        def subset():
+            if not self.config.get('subset_enabled', True):
+                return state
+            window_graph = graph
+            if graph.pruned is not None:
+                # Hash-joined dates kept only in-tolerance pairs; SPLIT/BULK pools need the whole window
+                residue = np.setdiff1d(np.arange(len(self.bank_df)), np.fromiter(state.bank_done, dtype=np.int64))
+                window_graph = self._candidate_graph(date_window, bank_rows=residue)
+            return stage_subset(
+                PairView(window_graph, date_window), state,
+                graph.bank['amount'].to_numpy(), graph.broker_amount, tolerances,
+                max_items=int(self.config.get('subset_max_items', 3)),
+                max_pool=int(self.config.get('subset_max_pool', 300)),
+            )
+        key, state = self._stage(key, 'subset', subset)
+
+        return state
+
     def run(self):
         """
         Execute Matching Logic.
         """
-        date_window = self.config.get('date_window_days', 2)
-        similarity_enabled = self.config.get('similarity_enabled', False)
-        sim_threshold = self.config.get('similarity_threshold', 0.85)
-        
-        # Iterate over Bank rows
-        for b_idx, bank_row in self.bank_df.iterrows():
-            bank_date = bank_row['txn_date']
-            bank_ref = bank_row['ref_no']
+        try:
+            state = self.run_stages()
+        except JobCancelled:
+            # Keep what the completed chunks found; nothing partial was cached
+            self.cancelled = True
+            state = self._state
+        self._state = state
+        if self.memo is not None and self.learn_memo and not self.cancelled:
+            self._learn(state)
+        if self._view is not None:
+            self.diagnostics = candidate_diagnostics(
+                self.bank_df, self.broker_df, self.side, int(self.config.get('date_window_days', 2)),
+                self._view, state, self.calendar,
+            )
+        if self.cancelled:
+            bank_reason = broker_reason = "Not reached (run cancelled)"
+        else:
+            bank_reason = "No matching candidate found in window/tolerance"
+            broker_reason = f"Broker {self.amount_col.title()} not found in Bank"
+
+        bank_labels = self.bank_df.index
+        broker_labels = self.broker_df.index
+        self.matched_broker_indices = {broker_labels[pos] for pos in state.broker_used}
+
+        # Report in bank row order regardless of which stage found the match
+        for match_type, bank_pos, broker_pos in sorted(state.matches, key=lambda m: m[1][0]):
+            bank_rows = [self.bank_df.iloc[p] for p in bank_pos]
+            broker_rows = [self.broker_df.iloc[p] for p in broker_pos]
+
+            if match_type in ('SPLIT', 'BULK'):
+                self._record_group(
+                    match_type,
+                    list(zip([bank_labels[p] for p in bank_pos], bank_rows)),
+                    list(zip([broker_labels[p] for p in broker_pos], broker_rows)),
+                )
+                continue
+
+            bank_row, crow = bank_rows[0], broker_rows[0]
             bank_amt = abs(bank_row['amount'])
-            bank_narration = bank_row['narration']
-            
-            # Calculate dynamic tolerance for this row
-            tolerance = compute_tolerance(bank_amt, bank_narration, self.config)
-            
-            # 1. Filter Candidates (Date Window)
-            # We filter broker_df where index not used and date in window
-            # (Optimization: Can be vectorised, but loop is fine for local tool)
-            
-            candidates = []
-            
-            for br_idx, broker_row in self.broker_df.iterrows():
-                if br_idx in self.matched_broker_indices:
-                    continue
-                
-                br_date = broker_row['txn_date'] or bank_date # Fallback if missing?
-                
-                if within_date_window(bank_date, br_date, date_window):
-                    candidates.append((br_idx, broker_row))
-            
-            match_found = False
-            best_match = None
-            match_type = None
-            
-            # 2. Try EXACT Match (Ref + Amount)
-            for cid, crow in candidates:
-                crow_credit = abs(crow['credit'])
-                # Check Amount with tiny tolerance (float precision) or configured tolerance?
-                # Usually "Exact" means 0 diff, but we allow tolerance generally.
-                amt_diff = abs(bank_amt - crow_credit)
-                
-                # Check Ref
-                # Exact string match
-                ref_match = (str(bank_ref) == str(crow['transaction_ref']))
-                
-                if ref_match and amt_diff <= tolerance:
-                    best_match = (cid, crow)
-                    match_type = 'EXACT'
-                    break
-            
-            # 3. Fallback 1: Amount Match (Ref mismatch)
-            if not best_match:
-                # Find candidates with matching amount
-                # Prefer closest date?
-                potential_amts = []
-                for cid, crow in candidates:
-                    crow_credit = abs(crow['credit'])
-                    amt_diff = abs(bank_amt - crow_credit)
-                    
-                    if amt_diff <= tolerance:
-                        potential_amts.append((cid, crow))
-                
-                if len(potential_amts) == 1:
-                    # Single candidate with matching amount -> Valid Match (Ref Mismatch Exception/Warning)
-                    best_match = potential_amts[0]
-                    # Check if ref is totally different or just fuzzy?
-                    match_type = 'REF_MISMATCH'
-                elif len(potential_amts) > 1:
-                    # Multiple matching amounts -> Ambiguous
-                    # We skip mapping for now and mark as ambiguous exception?
-                    # Or try fuzzy ref match to break tie
-                    pass
-            
-            # 4. Fallback 2: Simpson/Fuzzy Match (if enabled)
-            if not best_match and similarity_enabled:
-                best_score = 0
-                temp_match = None
-                
-                for cid, crow in candidates:
-                    # Check similarity of Ref or Narration vs Particulars
-                    score_ref = 0
-                    if bank_ref and crow['transaction_ref']:
-                        if check_similarity(bank_ref, crow['transaction_ref'], sim_threshold):
-                            score_ref = 1.0 # High confidence
-                            
-                    score_narr = 0
-                    if check_similarity(bank_narration, crow['particulars'], sim_threshold):
-                        score_narr = 1.0
-                        
-                    if score_ref or score_narr:
-                        # Check amount? Usually must be close.
-                        # If amount is way off, fuzzy match shouldn't count?
-                        # Let's enforce amount tolerance even for fuzzy match
-                        crow_credit = abs(crow['credit'])
-                        amt_diff = abs(bank_amt - crow_credit)
-                        
-                        if amt_diff <= tolerance:
-                            temp_match = (cid, crow)
-                            break # Take first good fuzzy match
-                
-                if temp_match:
-                    best_match = temp_match
-                    match_type = 'FUZZY'
-
-            # Finalize Row
-            if best_match:
-                br_idx, crow = best_match
-                self.matched_broker_indices.add(br_idx)
-                
-                match_entry = {
-                    "match_id": str(uuid.uuid4()),
-                    "bank_row_id": b_idx,
-                    "broker_row_id": br_idx,
-                    "date": bank_date,
-                    "bank_amount": bank_amt,
-                    "broker_credit": crow['credit'],
-                    "delta": bank_amt - crow['credit'],
-                    "match_type": match_type,
+            bank_ref = bank_row['ref_no']
+            match_entry = {
+                "match_id": str(uuid.uuid4()),
+                "bank_row_id": bank_labels[bank_pos[0]],
+                "broker_row_id": broker_labels[broker_pos[0]],
+                "date": bank_row['txn_date'],
+                "side": self.side,
+                "bank_amount": bank_amt,
+                "broker_amount": crow[self.amount_col],
+                "delta": bank_amt - crow[self.amount_col],
+                "match_type": match_type,
+                "bank_ref": bank_ref,
+                "broker_ref": crow['transaction_ref']
+            }
+
+            if match_type == 'REF_MISMATCH':
+                # Amount matched but ref differs -> Partial (with note ref mismatch)
+                self.partial.append({
+                    **match_entry,
+                    "note": "Amount matched, Ref mismatch"
+                })
+                # Add exception record
+                self.exceptions.append({
+                    "code": ExceptionCode.REF_MISMATCH,
+                    "side": self.side,
+                    "description": f"Ref mismatch: {bank_ref} != {crow['transaction_ref']}",
                     "bank_ref": bank_ref,
                     "broker_ref": crow['transaction_ref']
-                }
-                
-                if match_type == 'REF_MISMATCH':
-                    # Log exception/warning but considered "Matched" or "Partial"?
-                    # Prompt says "Partial (with note ref mismatch)".
-                    # We'll put it in Matched but flag it, or Partial list?
-                    # Let's put in Partial.
-                    self.partial.append({
-                        **match_entry,
-                        "note": "Amount matched, Ref mismatch"
-                    })
-                    # Add exception record
-                    self.exceptions.append({
-                        "code": ExceptionCode.REF_MISMATCH,
-                        "description": f"Ref mismatch: {bank_ref} != {crow['transaction_ref']}",
-                        "bank_ref": bank_ref,
-                        "broker_ref": crow['transaction_ref']
-                    })
-                else:
-                    self.matches.append(match_entry)
-
+                })
             else:
-                # No match found
+                self.matches.append(match_entry)
+
+        # Unmatched Bank Rows
+        for pos in range(len(self.bank_df)):
+            if pos in state.bank_done:
+                continue
+            bank_row = self.bank_df.iloc[pos]
+            self.unmatched.append({
+                "side": self.side,
+                "bank_row_id": bank_labels[pos],
+                "date": bank_row['txn_date'],
+                "amount": abs(bank_row['amount']),
+                "ref": bank_row['ref_no'],
+                "reason": bank_reason
+            })
+
+        # Unmatched Broker Rows
+        # Only broker rows of this side (credits for CR, debits for DR) are reported.
+        for pos in range(len(self.broker_df)):
+            if pos in state.broker_used:
+                continue
+            broker_row = self.broker_df.iloc[pos]
+            if broker_row[self.amount_col] > 0:
                 self.unmatched.append({
-                    "bank_row_id": b_idx,
-                    "date": bank_date,
-                    "amount": bank_amt,
-                    "ref": bank_ref,
-                    "reason": "No matching candidate found in window/tolerance"
+                    "side": self.side,
+                    "broker_row_id": broker_labels[pos],
+                    "date": broker_row['txn_date'],
+                    "amount": broker_row[self.amount_col],
+                    "ref": broker_row['transaction_ref'],
+                    "reason": broker_reason
                 })
-        
-        # Post-loop: Find Unmatched Broker Rows
-        for br_idx, broker_row in self.broker_df.iterrows():
-            if br_idx not in self.matched_broker_indices:
-                # Only care about Credit rows?
-                # Broker Ledger has Debit and Credit. 
-                # Reconciling Bank (Money In/Out) matches Broker (Money Out/In).
-                # Bank Debit (Out) ~ Broker Debit (Purchase)?
-                # Bank Credit (In) ~ Broker Credit (Receipt)?
-                
-                # Prompt says: "Bank ↔ Broker matching rules... abs(bank.amount - broker.credit) <= tolerance"
-                # This implies we are primarily reconciling Bank Amounts (Inflow?) against Broker Credits (Receipts).
-                # If the broker row is a 'Debit' (Purchase), it might correspond to a Bank Debit.
-                # But the prompt focuses on "Received in BANK ... Reference No.".
-                # If it's a Credit row in Broker and not matched -> Unmatched
-                if broker_row['credit'] > 0:
-                     self.unmatched.append({
-                        "broker_row_id": br_idx,
-                        "date": broker_row['txn_date'],
-                        "amount": broker_row['credit'],
-                        "ref": broker_row['transaction_ref'],
-                        "reason": "Broker Credit not found in Bank"
-                    })
-        
+
         return {
             "matched": pd.DataFrame(self.matches),
             "unmatched": pd.DataFrame(self.unmatched),
             "partial": pd.DataFrame(self.partial),
             "exceptions": pd.DataFrame(self.exceptions)
         }
+
+    def _record_group(self, match_type: str, bank_rows: list, broker_rows: list):
+        """Record a many-to-one match as one row with lists of row ids."""
+        bank_total = sum(abs(row['amount']) for _, row in bank_rows)
+        broker_total = sum(row[self.amount_col] for _, row in broker_rows)
+
+        self.matches.append({
+            "match_id": str(uuid.uuid4()),
+            "bank_row_id": [b_idx for b_idx, _ in bank_rows],
+            "broker_row_id": [br_idx for br_idx, _ in broker_rows],
+            "date": bank_rows[0][1]['txn_date'],
+            "side": self.side,
+            "bank_amount": bank_total,
+            "broker_amount": broker_total,
+            "delta": bank_total - broker_total,
+            "match_type": match_type,
+            "bank_ref": ", ".join(str(row['ref_no']) for _, row in bank_rows),
+            "broker_ref": ", ".join(str(row['transaction_ref']) for _, row in broker_rows)
+        })
+
+def bank_sides(bank_df: pd.DataFrame) -> pd.Series:
+    """'CR' / 'DR' per bank row: the dr_cr column, else the amount's sign."""
+    if 'dr_cr' in bank_df.columns:
+        labels = bank_df['dr_cr'].fillna('').astype(str).str.strip().str.upper()
+        if labels.isin(list(SIDE_COLUMNS)).all():
+            return labels
+    return pd.Series(np.where(bank_df['amount'] < 0, 'DR', 'CR'), index=bank_df.index)
+
+def split_sides(bank_df: pd.DataFrame, broker_df: pd.DataFrame, sides) -> Dict[str, tuple]:
+    """
+    {side: (bank rows, broker rows)} for each requested side that has rows:
+    bank rows labelled with the side, broker rows with a positive amount in
+    the side's column. Row labels are kept.
+    """
+    labels = bank_sides(bank_df)
+    parts = {}
+    for side in sides:
+        col = SIDE_COLUMNS.get(side)
+        if col is None:
+            continue
+        bank_part = bank_df[labels == side]
+        if col in broker_df.columns:
+            broker_part = broker_df[broker_df[col].fillna(0) > 0]
+        else:
+            broker_part = broker_df.iloc[0:0]
+        if not bank_part.empty or not broker_part.empty:
+            parts[side] = (bank_part, broker_part)
+    return parts
+
+class TwoSidedMatcher:
+    """
+    Reconciles both directions at once: bank CR rows against broker credits
+    and bank DR rows against broker debits, as independent Matcher partitions
+    (config `match_sides`, default both) on a thread pool. Partitions share
+    the stage cache and the cancel token; progress is summed over them.
+    Results are the partitions' frames concatenated, each row tagged with
+    its side.
+    """
+    def __init__(self, bank_df: pd.DataFrame, broker_df: pd.DataFrame, config: dict, cache=STAGE_CACHE,
+                 progress=None, cancel=None):
+        self.config = config
+        self.progress = progress
+        self._lock = threading.Lock()
+        self._progress = {} # side -> (done, total, matches, eta)
+        self.memo = memo_for(config)
+
+        self.partitions = {
+            side: Matcher(
+                bank_part, broker_part, config, cache=cache,
+                progress=self._reporter(side) if progress else None, cancel=cancel, side=side, memo=self.memo,
+            )
+            for side, (bank_part, broker_part) in split_sides(
+                bank_df, broker_df, config.get('match_sides', list(SIDE_COLUMNS))
+            ).items()
+        }
+
+        for side, matcher in self.partitions.items():
+            self._progress[side] = (0, matcher.progress_total, 0, None)
+            matcher.learn_memo = False
+
+        self.stages_run = []
+        self.stage_seconds = {}
+        self.cancelled = False
+        self.matched_broker_indices = set()
+        self.diagnostics = None
+
+    def plans(self) -> dict:
+        """{side: MatchPlan or None}, planning each side if it has not run yet."""
+        return {side: matcher.make_plan() for side, matcher in self.partitions.items()}
+
+    def _learn(self, matchers: list):
+        """Both sides matched against the same memo snapshot; learn from them together, once."""
+        if self.memo is None or self.cancelled:
+            return
+        links = [link for m in matchers for link in m.memo_links(m._state)]
+        if links:
+            self.memo.learn(links)
+            self.memo.save()
+
+    def _reporter(self, side: str):
+        def report(done, total, **info):
+            with self._lock:
+                self._progress[side] = (done, total, info.get('matches', 0), info.get('eta'))
+                parts = list(self._progress.values())
+                etas = [p[3] for p in parts if p[3] is not None]
+                self.progress(
+                    sum(p[0] for p in parts), sum(p[1] for p in parts),
+                    stage=f"{side} {info.get('stage', '')}".strip(),
+                    matches=sum(p[2] for p in parts),
+                    eta=max(etas) if etas else None,
+                )
+        return report
+
+    def run(self) -> dict:
+        matchers = list(self.partitions.values())
+        if not matchers:
+            return {name: pd.DataFrame() for name in ('matched', 'unmatched', 'partial', 'exceptions')}
+        workers = max(1, min(len(matchers), int(self.config.get('match_partition_workers', 2))))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="recon-side") as pool:
+            results = list(pool.map(lambda m: m.run(), matchers))
+
+        self.cancelled = any(m.cancelled for m in matchers)
+        self._learn(matchers)
+        self.stages_run = [f"{m.side} {name}" for m in matchers for name in m.stages_run]
+        self.stage_seconds = {f"{m.side} {name}": t for m in matchers for name, t in m.stage_seconds.items()}
+        self.matched_broker_indices = set().union(*(m.matched_broker_indices for m in matchers))
+        self.diagnostics = CandidateDiagnostics.concat(m.diagnostics for m in matchers)
+        return {
+            name: pd.concat([r[name] for r in results if not r[name].empty] or [pd.DataFrame()],
+                            ignore_index=True)
+            for name in results[0]
+        }
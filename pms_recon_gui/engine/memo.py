@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from utils.refs import PLACEHOLDER_REFS
+
+_DIGITS = re.compile(r'\d')
+_REF_SEPARATORS = re.compile(r'[\s\-_.:/]+')
+
+def text_fingerprint(text) -> Optional[str]:
+    """
+    Narration / particulars with the parts that change every month removed:
+    upper-cased, tokens holding digits (dates, amounts, cheque numbers)
+    dropped, the rest sorted and de-duplicated. None if nothing is left.
+    """
+    if text is None or not isinstance(text, str):
+        return None
+    tokens = {t for t in text.upper().split() if not _DIGITS.search(t)}
+    return " ".join(sorted(tokens)) or None
+
+def ref_prefix(ref, length: int = 6) -> Optional[str]:
+    """First `length` characters of a ref without separators (None for placeholders / short refs)."""
+    if ref is None or not isinstance(ref, str) or ref.strip().upper() in PLACEHOLDER_REFS:
+        return None
+    ref = _REF_SEPARATORS.sub('', ref.upper()).lstrip('0')
+    return ref[:length] if len(ref) >= length else None
+
+class CounterpartyMemo:
+    """
+    Links learned from confirmed matches, persisted as JSON:
+        bank key -> {broker fingerprint: last seen (unix time)}
+    Bank keys are "n:<narration fingerprint>" and "r:<ref prefix>"; broker
+    fingerprints are the particulars fingerprint, prefixed with the client
+    code when the broker frame has a client_code column.
+    Entries not seen for max_age_days are dropped and at most max_entries
+    bank keys are kept (least recently seen go first), each with at most
+    max_targets broker fingerprints.
+    Every read and write takes the lock: one memo is shared by the CR / DR
+    partitions and by concurrent runs in the service and the watcher. A run
+    matches against snapshot() so its view does not change while it runs.
+    """
+    VERSION = 1
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 5000, max_age_days: float = 180,
+                 max_targets: int = 3, ref_prefix_length: int = 6):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.max_targets = max_targets
+        self.ref_prefix_length = ref_prefix_length
+        self.entries: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict) -> "CounterpartyMemo":
+        cfg = config.get('memo', {}) or {}
+        memo = cls(
+            path=cfg.get('path'),
+            max_entries=int(cfg.get('max_entries', 5000)),
+            max_age_days=float(cfg.get('max_age_days', 180)),
+            max_targets=int(cfg.get('max_targets', 3)),
+            ref_prefix_length=int(cfg.get('ref_prefix_length', 6)),
+        )
+        memo.load()
+        return memo
+
+    # --- keys ----------------------------------------------------------------
+
+    def bank_keys(self, narration, ref) -> List[str]:
+        keys = []
+        fp = text_fingerprint(narration)
+        if fp:
+            keys.append("n:" + fp)
+        prefix = ref_prefix(ref, self.ref_prefix_length)
+        if prefix:
+            keys.append("r:" + prefix)
+        return keys
+
+    @staticmethod
+    def broker_fingerprint(particulars, client_code=None) -> Optional[str]:
+        fp = text_fingerprint(particulars)
+        if fp and client_code is not None and str(client_code).strip():
+            return f"{str(client_code).strip().upper()}|{fp}"
+        return fp
+
+    # --- lookup / learning ---------------------------------------------------
+
+    def targets(self, keys: Iterable[str]) -> set:
+        """Broker fingerprints linked to any of the bank keys (one dict lookup per key)."""
+        found = set()
+        with self._lock:
+            for key in keys:
+                found.update(self.entries.get(key, ()))
+        return found
+
+    def snapshot(self) -> "CounterpartyMemo":
+        """A frozen copy of the links (no path, so it is never saved) for one run to match against."""
+        copy = CounterpartyMemo(None, self.max_entries, self.max_age_days, self.max_targets, self.ref_prefix_length)
+        with self._lock:
+            copy.entries = {k: dict(v) for k, v in self.entries.items()}
+        return copy
+
+    def learn(self, pairs: Iterable[Tuple[List[str], Optional[str]]], now: float = None):
+        """Record (bank keys, broker fingerprint) links from confirmed matches."""
+        now = time.time() if now is None else now
+        with self._lock:
+            for keys, target in pairs:
+                if not target:
+                    continue
+                for key in keys:
+                    bucket = self.entries.setdefault(key, {})
+                    bucket[target] = now
+                    if len(bucket) > self.max_targets:
+                        for old in sorted(bucket, key=bucket.get)[:len(bucket) - self.max_targets]:
+                            del bucket[old]
+            self._prune(now)
+
+    def prune(self, now: float = None):
+        """Drop aged-out links, then the least recently seen keys beyond max_entries."""
+        with self._lock:
+            self._prune(now)
+
+    def _prune(self, now: float = None):
+        now = time.time() if now is None else now
+        cutoff = now - self.max_age_days * 86400
+        for key in list(self.entries):
+            bucket = {t: seen for t, seen in self.entries[key].items() if seen >= cutoff}
+            if bucket:
+                self.entries[key] = bucket
+            else:
+                del self.entries[key]
+        if len(self.entries) > self.max_entries:
+            by_age = sorted(self.entries, key=lambda k: max(self.entries[k].values()))
+            for key in by_age[:len(self.entries) - self.max_entries]:
+                del self.entries[key]
+
+    def digest(self) -> str:
+        """Content hash of the links (not their timestamps), for stage cache keys."""
+        with self._lock:
+            links = sorted((k, sorted(v)) for k, v in self.entries.items())
+        return hashlib.blake2b(json.dumps(links).encode('utf-8'), digest_size=16).hexdigest()
+
+    # --- persistence ---------------------------------------------------------
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            table = json.load(f)
+        if table.get("version") == self.VERSION:
+            with self._lock:
+                self.entries = {k: dict(v) for k, v in table.get("entries", {}).items()}
+                self._prune()
+
+    def save(self):
+        """Write the table atomically (temp file + rename)."""
+        if not self.path:
+            return
+        with self._lock:
+            payload = {"version": self.VERSION, "entries": self.entries}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp, self.path)
+
+# One table per file per process, shared by both sides of a run
+_MEMOS: Dict[str, CounterpartyMemo] = {}
+_MEMOS_LOCK = threading.Lock()
+
+def memo_for(config: dict) -> Optional[CounterpartyMemo]:
+    """The process-wide memo for config['memo'] (None when disabled)."""
+    cfg = config.get('memo', {}) or {}
+    if not cfg.get('enabled', False):
+        return None
+    key = os.path.abspath(cfg['path']) if cfg.get('path') else ""
+    with _MEMOS_LOCK:
+        if key not in _MEMOS:
+            _MEMOS[key] = CounterpartyMemo.from_config(config)
+        return _MEMOS[key]
@@ -0,0 +1,101 @@
+import math
+import numpy as np
+from typing import List, Dict
+
+class NGramIndex:
+    """
+    Character n-gram TF-IDF index over broker text (particulars + transaction_ref).
+    Built once per run; answers "top-k most similar broker rows" for each bank
+    row with sparse matrix products instead of all-pairs fuzzy scoring.
+    Only the top-k go on to the exact token_set_ratio confirmation.
+    """
+    def __init__(self, texts: List[str], n: int = 3, block_size: int = 256):
+        # scipy is only needed when this engine is selected
+        from scipy import sparse
+        self._sparse = sparse
+
+        self.n = n
+        self.block_size = block_size
+        self.vocab: Dict[str, int] = {}
+
+        counts = self._count_rows(texts, grow=True)
+        n_docs = len(texts)
+
+        # Document frequency per n-gram (presence, not raw count)
+        doc_freq = np.zeros(len(self.vocab), dtype=np.float64)
+        for row in counts:
+            for col in row:
+                doc_freq[col] += 1
+        # Smoothed idf (same shape as sklearn's default)
+        self.idf = np.log((1.0 + n_docs) / (1.0 + doc_freq)) + 1.0
+
+        self.matrix = self._to_matrix(counts)
+
+    def _ngrams(self, text) -> List[str]:
+        if text is None:
+            return []
+        s = " " + " ".join(str(text).lower().split()) + " "
+        if len(s) < self.n:
+            return [s]
+        return [s[i:i + self.n] for i in range(len(s) - self.n + 1)]
+
+    def _count_rows(self, texts: List[str], grow: bool) -> List[Dict[int, int]]:
+        rows = []
+        for text in texts:
+            row = {}
+            for gram in self._ngrams(text):
+                col = self.vocab.get(gram)
+                if col is None:
+                    if not grow:
+                        continue # unseen n-gram can't contribute to a dot product
+                    col = len(self.vocab)
+                    self.vocab[gram] = col
+                row[col] = row.get(col, 0) + 1
+            rows.append(row)
+        return rows
+
+    def _to_matrix(self, counts: List[Dict[int, int]]):
+        """Sublinear tf * idf, L2-normalized rows, as CSR."""
+        indptr = [0]
+        indices = []
+        data = []
+        for row in counts:
+            cols = list(row.keys())
+            weights = np.array([(1.0 + math.log(row[c])) * self.idf[c] for c in cols], dtype=np.float64)
+            norm = np.sqrt((weights ** 2).sum()) if len(weights) else 0.0
+            if norm > 0:
+                weights /= norm
+            indices.extend(cols)
+            data.extend(weights.tolist())
+            indptr.append(len(indices))
+        return self._sparse.csr_matrix(
+            (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(counts), len(self.vocab)),
+        )
+
+    def transform(self, texts: List[str]):
+        """Vectorize query texts against the index vocabulary."""
+        return self._to_matrix(self._count_rows(texts, grow=False))
+
+    def top_k(self, texts: List[str], k: int = 10) -> List[np.ndarray]:
+        """
+        For each query text, return positions of the k most similar indexed rows,
+        best first. Rows with zero similarity are never returned.
+        Queries are processed in blocks so the dense-ish score matrix stays bounded.
+        """
+        results = []
+        broker_t = self.matrix.T.tocsc()
+        for start in range(0, len(texts), self.block_size):
+            block = self.transform(texts[start:start + self.block_size])
+            scores = (block @ broker_t).tocsr()
+            for i in range(scores.shape[0]):
+                lo, hi = scores.indptr[i], scores.indptr[i + 1]
+                cols = scores.indices[lo:hi]
+                vals = scores.data[lo:hi]
+                if len(cols) > k:
+                    keep = np.argpartition(-vals, k - 1)[:k]
+                    cols, vals = cols[keep], vals[keep]
+                # Best first; ties broken by row position to keep runs deterministic
+                order = np.lexsort((cols, -vals))
+                results.append(cols[order])
+        return results
@@ -0,0 +1,465 @@
+"""
+Out-of-core matching backend for ledgers too large for the in-memory Matcher.
+
+Inputs (Parquet or CSV files of parsed rows, or DataFrames) are streamed in
+batches into an embedded database on disk: DuckDB if installed, else the
+standard library's SQLite. The date-window / amount-tolerance candidate join
+runs there as a range join; only the compact candidate pairs (positions,
+gap, delta, ref overlap) come back into Python for the EXACT / REF_MISMATCH /
+FUZZY stages, and the result rows are fetched for the positions that need
+them. Peak memory is bounded by the candidate set and the batch size, not by
+the ledgers.
+
+Not covered here: the many-to-one SPLIT/BULK pass (its pools are the whole
+date window, not the tolerance-cut candidates), the counterparty memo and
+cross-file de-duplication.
+"""
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+from typing import Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .candidates import CandidateGraph, bank_tolerances
+from .exceptions import ExceptionCode
+from .matcher import SIDE_COLUMNS, bank_sides
+from .rules import check_processed_similarity, preprocess_text
+from .stages import MatchState, PairView, amount_rows, exact_rows, fuzzy_rows
+from utils.business_days import BusinessCalendar, day_numbers
+from utils.jobs import JobCancelled
+from utils.refs import canonical_ref_keys
+
+Source = Union[str, pd.DataFrame]
+
+BANK_SCHEMA = "pos INTEGER, side TEXT, day DOUBLE, txn_date TEXT, amount DOUBLE, is_ips INTEGER, ref_no TEXT, narration TEXT"
+BROKER_SCHEMA = "pos INTEGER, day DOUBLE, txn_date TEXT, credit DOUBLE, debit DOUBLE, transaction_ref TEXT, particulars TEXT"
+KEYS_SCHEMA = "pos INTEGER, key TEXT"
+
+# --- Storage engines -----------------------------------------------------------
+
+class SQLiteStore:
+    """SQLite file with journaling off; sorts and joins spill to temp files."""
+    name = "sqlite"
+
+    def __init__(self, path: str, cache_mb: int = 256):
+        self.con = sqlite3.connect(path)
+        self.con.execute("PRAGMA journal_mode=OFF")
+        self.con.execute("PRAGMA synchronous=OFF")
+        self.con.execute("PRAGMA temp_store=FILE")
+        self.con.execute(f"PRAGMA cache_size=-{int(cache_mb) * 1024}")
+
+    def execute(self, sql: str, params=()):
+        self.con.execute(sql, params)
+
+    def insert(self, table: str, df: pd.DataFrame):
+        marks = ",".join("?" * len(df.columns))
+        rows = (tuple(None if isinstance(v, float) and v != v else v for v in row)
+                for row in df.itertuples(index=False, name=None))
+        self.con.executemany(f"INSERT INTO {table} VALUES ({marks})", rows)
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        return pd.read_sql_query(sql, self.con, params=params)
+
+    def close(self):
+        self.con.close()
+
+class DuckDBStore:
+    """DuckDB file; range joins use its inequality join and spill beyond memory_limit."""
+    name = "duckdb"
+
+    def __init__(self, path: str, memory_limit: str = None, temp_dir: str = None):
+        import duckdb
+
+        self.con = duckdb.connect(path)
+        # SET takes no bound parameters: memory_limit is checked by open_store, the path is quoted
+        if memory_limit:
+            self.con.execute(f"SET memory_limit = '{memory_limit}'")
+        if temp_dir:
+            self.con.execute("SET temp_directory = '{}'".format(temp_dir.replace("'", "''")))
+
+    def execute(self, sql: str, params=()):
+        self.con.execute(sql, params)
+
+    def insert(self, table: str, df: pd.DataFrame):
+        self.con.register("_batch", df)
+        try:
+            self.con.execute(f"INSERT INTO {table} SELECT * FROM _batch")
+        finally:
+            self.con.unregister("_batch")
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        return self.con.execute(sql, params).df()
+
+    def close(self):
+        self.con.close()
+
+_MEMORY_LIMIT = re.compile(r'\d+(\.\d+)?\s*([KMGT]i?B|B)', re.IGNORECASE).fullmatch
+
+def open_store(engine: str, workdir: str, cfg: dict):
+    """'duckdb', 'sqlite' or 'auto' (DuckDB when installed)."""
+    memory_limit = cfg.get('memory_limit')
+    if memory_limit is not None and not _MEMORY_LIMIT(str(memory_limit).strip()):
+        raise ValueError(f"Invalid outofcore.memory_limit: {memory_limit!r} (expected e.g. '2GB' or '512MiB')")
+    if engine == "auto":
+        try:
+            import duckdb # noqa: F401
+            engine = "duckdb"
+        except ImportError:
+            engine = "sqlite"
+    if engine == "duckdb":
+        return DuckDBStore(os.path.join(workdir, "recon.duckdb"), memory_limit and str(memory_limit).strip(), workdir)
+    if engine == "sqlite":
+        return SQLiteStore(os.path.join(workdir, "recon.sqlite"), int(cfg.get('cache_mb', 256)))
+    raise ValueError(f"Unknown out-of-core engine: {engine!r} (expected 'auto', 'duckdb' or 'sqlite')")
+
+# --- Input batches -------------------------------------------------------------
+
+def iter_batches(source: Source, batch_rows: int) -> Iterator[pd.DataFrame]:
+    """Row batches of a DataFrame, a .parquet file (needs pyarrow) or a .csv file."""
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), batch_rows):
+            yield source.iloc[start:start + batch_rows]
+        return
+    ext = os.path.splitext(str(source))[1].lower()
+    if ext == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise ImportError("Reading Parquet inputs needs pyarrow (pip install pyarrow)") from exc
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=batch_rows):
+            yield batch.to_pandas()
+    elif ext == ".csv":
+        yield from pd.read_csv(source, chunksize=batch_rows)
+    else:
+        raise ValueError(f"Unsupported out-of-core input: {source} (expected .parquet or .csv)")
+
+def _text(series: pd.Series) -> pd.Series:
+    return series.where(series.notna(), None).map(lambda v: None if v is None else str(v))
+
+def _iso(values, days: np.ndarray) -> list:
+    out = pd.to_datetime(pd.Series(values).reset_index(drop=True), errors='coerce')
+    return [None if np.isnan(d) else ts.date().isoformat() for ts, d in zip(out, days)]
+
+def _keys(pos: np.ndarray, refs: Iterable) -> pd.DataFrame:
+    rows = [(int(p), k) for p, ref in zip(pos, refs) for k in canonical_ref_keys(ref)]
+    return pd.DataFrame(rows, columns=["pos", "key"]).astype({"pos": np.int64, "key": object})
+
+def _bank_batch(df: pd.DataFrame, start: int, calendar) -> pd.DataFrame:
+    """Bank rows as the bank table: signed amount -> side + absolute amount, dates -> day ordinals."""
+    df = df.reset_index(drop=True)
+    for col in ("txn_date", "ref_no", "narration"):
+        if col not in df.columns:
+            df[col] = None
+    df['amount'] = pd.to_numeric(df.get('amount'), errors='coerce').fillna(0.0)
+    days = day_numbers(df['txn_date'])
+    ordinals = calendar.ordinals_from_days(days) if calendar is not None else days
+    return pd.DataFrame({
+        "pos": np.arange(start, start + len(df), dtype=np.int64),
+        "side": bank_sides(df).to_numpy(dtype=object),
+        "day": ordinals,
+        "txn_date": _iso(df['txn_date'], days),
+        "amount": df['amount'].abs().to_numpy(dtype=np.float64),
+        "is_ips": df['narration'].map(lambda n: "IPS" in str(n).upper()).to_numpy(dtype=np.int64),
+        "ref_no": _text(df['ref_no']).to_numpy(dtype=object),
+        "narration": _text(df['narration']).to_numpy(dtype=object),
+    })
+
+def _broker_batch(df: pd.DataFrame, start: int, calendar) -> pd.DataFrame:
+    df = df.reset_index(drop=True)
+    for col in ("txn_date", "transaction_ref", "particulars"):
+        if col not in df.columns:
+            df[col] = None
+    days = day_numbers(df['txn_date'])
+    ordinals = calendar.ordinals_from_days(days) if calendar is not None else days
+    return pd.DataFrame({
+        "pos": np.arange(start, start + len(df), dtype=np.int64),
+        "day": ordinals,
+        "txn_date": _iso(df['txn_date'], days),
+        "credit": pd.to_numeric(df.get('credit', 0.0), errors='coerce').fillna(0.0).to_numpy(dtype=np.float64),
+        "debit": pd.to_numeric(df.get('debit', 0.0), errors='coerce').fillna(0.0).to_numpy(dtype=np.float64),
+        "transaction_ref": _text(df['transaction_ref']).to_numpy(dtype=object),
+        "particulars": _text(df['particulars']).to_numpy(dtype=object),
+    })
+
+# --- Matcher -------------------------------------------------------------------
+
+class OutOfCoreMatcher:
+    """
+    Same 1:1 stages and result frames as TwoSidedMatcher, with the inputs in
+    an embedded database (config `outofcore`: engine, workdir, batch_rows,
+    memory_limit / cache_mb, keep_workdir). Each run gets its own directory
+    inside workdir (the system temp dir by default). Row ids are positions
+    in the concatenated inputs of each side.
+    """
+    def __init__(self, bank_sources: List[Source], broker_sources: List[Source], config: dict,
+                 progress=None, cancel=None):
+        self.bank_sources = bank_sources
+        self.broker_sources = broker_sources
+        self.config = config
+        self.cfg = config.get('outofcore', {}) or {}
+        self.progress = progress
+        self.cancel = cancel
+        self.batch_rows = int(self.cfg.get('batch_rows', 100_000))
+        self.calendar = BusinessCalendar.from_config(config)
+
+        self.engine = None
+        self.stages_run = []
+        self.cancelled = False
+        self.stats = {} # side -> {'bank_rows', 'candidate_pairs', ...}
+        self.store = None
+        self.workdir = None # this run's directory (removed afterwards unless keep_workdir)
+
+    def _check_cancel(self):
+        if self.cancel is not None:
+            self.cancel.check()
+
+    def _report(self, done: int, total: int, stage: str, matches: int = 0):
+        if self.progress:
+            self.progress(done, total, stage=stage, matches=matches, eta=None)
+
+    # --- ingest ---
+
+    def _ingest(self):
+        store = self.store
+        store.execute(f"CREATE TABLE bank ({BANK_SCHEMA})")
+        store.execute(f"CREATE TABLE broker ({BROKER_SCHEMA})")
+        store.execute(f"CREATE TABLE bank_keys ({KEYS_SCHEMA})")
+        store.execute(f"CREATE TABLE broker_keys ({KEYS_SCHEMA})")
+
+        for table, sources, to_rows, ref_col in (
+            ("bank", self.bank_sources, _bank_batch, "ref_no"),
+            ("broker", self.broker_sources, _broker_batch, "transaction_ref"),
+        ):
+            n = 0
+            for source in sources:
+                for batch in iter_batches(source, self.batch_rows):
+                    self._check_cancel()
+                    rows = to_rows(batch, n, self.calendar)
+                    store.insert(table, rows)
+                    store.insert(f"{table}_keys", _keys(rows['pos'].to_numpy(), rows[ref_col]))
+                    n += len(rows)
+                    self._report(n, 0, f"loading {table}")
+        for sql in (
+            "CREATE INDEX broker_day ON broker (day)",
+            "CREATE INDEX bank_side ON bank (side, day)",
+            "CREATE INDEX bank_keys_pos ON bank_keys (pos, key)",
+            "CREATE INDEX broker_keys_pos ON broker_keys (pos, key)",
+        ):
+            store.execute(sql)
+
+    # --- candidates ---
+
+    def candidate_pairs(self, side: str) -> pd.DataFrame:
+        """Range join for one side: pairs within the date window and the bank row's tolerance."""
+        col = SIDE_COLUMNS[side]
+        tol_cfg = self.config.get('tolerance', {})
+        window = int(self.config.get('date_window_days', 2))
+        tol = "(CASE WHEN b.is_ips = 1 THEN ? ELSE 0 END) + (CASE WHEN b.amount >= ? THEN ? ELSE 0 END)"
+        tol_params = (float(tol_cfg.get('ips_max', 10.0)), float(tol_cfg.get('rtgs_threshold', 2000000.0)),
+                      float(tol_cfg.get('rtgs_flat', 100.0)))
+        # Undated broker rows pair with every dated bank row (gap 0), as in build_candidate_graph
+        sql = f"""
+            SELECT c.bank_pos, c.broker_pos, c.date_gap, c.amount_delta, c.bank_amount, c.is_ips,
+                   c.broker_amount,
+                   EXISTS (SELECT 1 FROM bank_keys bk JOIN broker_keys rk ON bk.key = rk.key
+                           WHERE bk.pos = c.bank_pos AND rk.pos = c.broker_pos) AS ref_match
+            FROM (
+                SELECT b.pos AS bank_pos, r.pos AS broker_pos,
+                       CASE WHEN r.day IS NULL THEN 0 ELSE abs(b.day - r.day) END AS date_gap,
+                       abs(b.amount - r.{col}) AS amount_delta,
+                       b.amount AS bank_amount, b.is_ips AS is_ips, r.{col} AS broker_amount
+                FROM bank b JOIN broker r
+                  ON r.{col} > 0
+                 AND (r.day IS NULL OR (r.day >= b.day - ? AND r.day <= b.day + ?))
+                WHERE b.side = ? AND b.day IS NOT NULL
+                  AND abs(b.amount - r.{col}) <= {tol}
+            ) c
+            ORDER BY c.bank_pos, c.broker_pos
+        """
+        return self.store.query(sql, (window, window, side) + tol_params)
+
+    def _graph(self, pairs: pd.DataFrame) -> Tuple[CandidateGraph, np.ndarray, np.ndarray]:
+        """CandidateGraph over local positions of the rows that have candidates."""
+        bank_ids, bank_local = np.unique(pairs['bank_pos'].to_numpy(dtype=np.int64), return_inverse=True)
+        broker_ids, broker_local = np.unique(pairs['broker_pos'].to_numpy(dtype=np.int64), return_inverse=True)
+        first_bank = np.unique(bank_local, return_index=True)[1]
+        first_broker = np.unique(broker_local, return_index=True)[1]
+        graph = CandidateGraph(
+            pairs=pd.DataFrame({
+                "bank_pos": bank_local,
+                "broker_pos": broker_local,
+                "date_gap": pairs['date_gap'].to_numpy(dtype=np.int64),
+                "amount_delta": pairs['amount_delta'].to_numpy(dtype=np.float64),
+                "ref_match": pairs['ref_match'].to_numpy().astype(bool),
+                "similarity": np.zeros(len(pairs)),
+            }),
+            bank=pd.DataFrame({
+                "amount": pairs['bank_amount'].to_numpy(dtype=np.float64)[first_bank],
+                "is_ips": pairs['is_ips'].to_numpy().astype(bool)[first_bank],
+            }),
+            broker_amount=pairs['broker_amount'].to_numpy(dtype=np.float64)[first_broker],
+            date_window=int(self.config.get('date_window_days', 2)),
+            max_tolerance=float(pairs['amount_delta'].max()) if len(pairs) else 0.0,
+        )
+        return graph, bank_ids, broker_ids
+
+    # --- row fetches ---
+
+    def _fetch(self, table: str, columns: str, positions) -> pd.DataFrame:
+        """Rows of table at the given positions (via a temp id table), indexed by pos."""
+        want = f"want_{uuid.uuid4().hex[:8]}"
+        self.store.execute(f"CREATE TEMP TABLE {want} (pos INTEGER)")
+        try:
+            ids = pd.DataFrame({"pos": np.asarray(sorted(set(int(p) for p in positions)), dtype=np.int64)})
+            for start in range(0, len(ids), self.batch_rows):
+                self.store.insert(want, ids.iloc[start:start + self.batch_rows])
+            df = self.store.query(f"SELECT t.pos, {columns} FROM {table} t JOIN {want} w ON t.pos = w.pos ORDER BY t.pos")
+        finally:
+            self.store.execute(f"DROP TABLE {want}")
+        return df.set_index("pos")
+
+    def _similarity_fn(self, bank_ids: np.ndarray, broker_ids: np.ndarray):
+        threshold = self.config.get('similarity_threshold', 0.85)
+        bank = self._fetch("bank", "t.ref_no, t.narration", bank_ids).reindex(bank_ids)
+        broker = self._fetch("broker", "t.transaction_ref, t.particulars", broker_ids).reindex(broker_ids)
+        bank_ref = [preprocess_text(v) for v in bank['ref_no']]
+        bank_narr = [preprocess_text(v) for v in bank['narration']]
+        broker_ref = [preprocess_text(v) for v in broker['transaction_ref']]
+        broker_part = [preprocess_text(v) for v in broker['particulars']]
+
+        def is_similar(b: int, r: int) -> bool:
+            return (check_processed_similarity(bank_ref[b], broker_ref[r], threshold) or
+                    check_processed_similarity(bank_narr[b], broker_part[r], threshold))
+        return is_similar
+
+    # --- run ---
+
+    def _match_side(self, side: str):
+        col = SIDE_COLUMNS[side]
+        started = time.perf_counter()
+        pairs = self.candidate_pairs(side)
+        self.stages_run.append(f"{side} candidates")
+        graph, bank_ids, broker_ids = self._graph(pairs)
+        view = PairView(graph, graph.date_window, bank_tolerances(graph.bank, self.config))
+        state = MatchState()
+        rows = view.bank_rows()
+        for name, fn in (('exact', exact_rows), ('amount', amount_rows)):
+            self._check_cancel()
+            fn(view, state, rows)
+            self.stages_run.append(f"{side} {name}")
+        if self.config.get('similarity_enabled', False):
+            self._check_cancel()
+            fuzzy_rows(view, state, rows, self._similarity_fn(bank_ids, broker_ids))
+            self.stages_run.append(f"{side} fuzzy")
+        self.stats[side] = {
+            "candidate_pairs": len(pairs),
+            "bank_rows_with_candidates": len(bank_ids),
+            "seconds": time.perf_counter() - started,
+        }
+        # Back to global positions
+        matches = [(t, int(bank_ids[b[0]]), int(broker_ids[r[0]])) for t, b, r in state.matches]
+        return self._side_results(side, col, matches)
+
+    def _side_results(self, side: str, col: str, matches: list) -> dict:
+        matched, partial, exceptions, unmatched = [], [], [], []
+        bank_rows = self._fetch("bank", "t.txn_date, t.amount, t.ref_no", [b for _, b, _ in matches])
+        broker_rows = self._fetch("broker", f"t.{col} AS amount, t.transaction_ref", [r for _, _, r in matches])
+        for match_type, b, r in sorted(matches, key=lambda m: m[1]):
+            bank_row, broker_row = bank_rows.loc[b], broker_rows.loc[r]
+            entry = {
+                "match_id": str(uuid.uuid4()),
+                "bank_row_id": b,
+                "broker_row_id": r,
+                "date": _as_date(bank_row['txn_date']),
+                "side": side,
+                "bank_amount": bank_row['amount'],
+                "broker_amount": broker_row['amount'],
+                "delta": bank_row['amount'] - broker_row['amount'],
+                "match_type": match_type,
+                "bank_ref": bank_row['ref_no'],
+                "broker_ref": broker_row['transaction_ref'],
+            }
+            if match_type == 'REF_MISMATCH':
+                partial.append({**entry, "note": "Amount matched, Ref mismatch"})
+                exceptions.append({
+                    "code": ExceptionCode.REF_MISMATCH,
+                    "side": side,
+                    "description": f"Ref mismatch: {entry['bank_ref']} != {entry['broker_ref']}",
+                    "bank_ref": entry['bank_ref'],
+                    "broker_ref": entry['broker_ref'],
+                })
+            else:
+                matched.append(entry)
+
+        # Unmatched rows are selected in the database; only they come back
+        done = "done_" + uuid.uuid4().hex[:8]
+        self.store.execute(f"CREATE TEMP TABLE {done}_bank (pos INTEGER)")
+        self.store.execute(f"CREATE TEMP TABLE {done}_broker (pos INTEGER)")
+        try:
+            self.store.insert(f"{done}_bank", pd.DataFrame({"pos": np.asarray([b for _, b, _ in matches], dtype=np.int64)}))
+            self.store.insert(f"{done}_broker", pd.DataFrame({"pos": np.asarray([r for _, _, r in matches], dtype=np.int64)}))
+            bank_left = self.store.query(
+                f"SELECT pos, txn_date, amount, ref_no FROM bank WHERE side = ? "
+                f"AND pos NOT IN (SELECT pos FROM {done}_bank) ORDER BY pos", (side,))
+            broker_left = self.store.query(
+                f"SELECT pos, txn_date, {col} AS amount, transaction_ref FROM broker WHERE {col} > 0 "
+                f"AND pos NOT IN (SELECT pos FROM {done}_broker) ORDER BY pos")
+        finally:
+            self.store.execute(f"DROP TABLE {done}_bank")
+            self.store.execute(f"DROP TABLE {done}_broker")
+        bank_reason = "No matching candidate found in window/tolerance"
+        broker_reason = f"Broker {col.title()} not found in Bank"
+        for row in bank_left.itertuples(index=False):
+            unmatched.append({"side": side, "bank_row_id": row.pos, "date": _as_date(row.txn_date),
+                              "amount": row.amount, "ref": row.ref_no, "reason": bank_reason})
+        for row in broker_left.itertuples(index=False):
+            unmatched.append({"side": side, "broker_row_id": row.pos, "date": _as_date(row.txn_date),
+                              "amount": row.amount, "ref": row.transaction_ref, "reason": broker_reason})
+        return {
+            "matched": pd.DataFrame(matched),
+            "unmatched": pd.DataFrame(unmatched),
+            "partial": pd.DataFrame(partial),
+            "exceptions": pd.DataFrame(exceptions),
+        }
+
+    def run(self) -> dict:
+        # A fresh directory per run (inside outofcore.workdir when set): runs never share a store
+        parent = self.cfg.get('workdir')
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        workdir = self.workdir = tempfile.mkdtemp(prefix="recon_ooc_", dir=parent or None)
+        self.stages_run = []
+        results = []
+        try:
+            self.store = open_store(self.cfg.get('engine', 'auto'), workdir, self.cfg)
+            self.engine = self.store.name
+            self._ingest()
+            sides = [s for s in self.config.get('match_sides', list(SIDE_COLUMNS)) if s in SIDE_COLUMNS]
+            for i, side in enumerate(sides):
+                self._check_cancel()
+                results.append(self._match_side(side))
+                self._report(i + 1, len(sides), f"{side} matched",
+                             matches=sum(len(r['matched']) + len(r['partial']) for r in results))
+        except JobCancelled:
+            self.cancelled = True
+        finally:
+            if self.store is not None:
+                self.store.close()
+            if not self.cfg.get('keep_workdir', False):
+                shutil.rmtree(workdir, ignore_errors=True)
+        names = ('matched', 'unmatched', 'partial', 'exceptions')
+        return {
+            name: pd.concat([r[name] for r in results if not r[name].empty] or [pd.DataFrame()], ignore_index=True)
+            for name in names
+        }
+
+def _as_date(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return pd.Timestamp(value).date()
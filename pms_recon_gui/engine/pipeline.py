@@ -0,0 +1,157 @@
+import logging
+import os
+import pandas as pd
+from contextlib import nullcontext
+from typing import List, Optional, Tuple
+from .matcher import TwoSidedMatcher
+from .planner import OUT_OF_CORE
+from normalize.bank_normalize import normalize_bank_data
+from normalize.broker_normalize import normalize_broker_data
+from parsers.uploads import merge_parsed
+from utils.metrics import RunMetrics
+
+# End-to-end runs outside the Upload/Reconcile pages (CLI, service, watcher)
+
+log = logging.getLogger("recon.planner")
+
+def _timed(metrics: Optional[RunMetrics], stage: str):
+    return metrics.stage(stage) if metrics is not None else nullcontext()
+
+def reconcile_frames(bank_df: pd.DataFrame, broker_df: pd.DataFrame, config: dict,
+                     progress=None, cancel=None, allow_out_of_core: bool = False,
+                     metrics: Optional[RunMetrics] = None) -> Tuple[dict, TwoSidedMatcher]:
+    """
+    Normalize both sides and match CR and DR rows. Returns (results, matcher).
+    With allow_out_of_core, a run the planner sizes beyond its memory budget
+    goes through the out-of-core backend instead (no SPLIT/BULK or memo pass).
+    metrics: optional RunMetrics that gets stage times, rows and result counts.
+    """
+    if metrics is not None:
+        metrics.add("rows_in", len(bank_df), input="bank")
+        metrics.add("rows_in", len(broker_df), input="broker")
+    with _timed(metrics, "normalize"):
+        bank_norm = normalize_bank_data(bank_df)
+        broker_norm = normalize_broker_data(broker_df)
+    matcher = TwoSidedMatcher(bank_norm, broker_norm, config, progress=progress, cancel=cancel)
+    if allow_out_of_core:
+        with _timed(metrics, "plan"):
+            too_big = [p.side for p in matcher.plans().values() if p is not None and p.strategy == OUT_OF_CORE]
+        if too_big:
+            log.info(f"Planner: {', '.join(too_big)} over planner.memory_budget_mb, running out of core")
+            with _timed(metrics, "match"):
+                results, ooc = reconcile_out_of_core([bank_norm], [broker_norm], config, progress, cancel)
+            results = _with_labels(results, bank_norm.index, broker_norm.index)
+            record_results(metrics, results, ooc)
+            return results, ooc
+    with _timed(metrics, "match"):
+        results = matcher.run()
+    record_results(metrics, results, matcher)
+    return results, matcher
+
+def record_results(metrics: Optional[RunMetrics], results: dict, matcher=None):
+    """Result rows per report, matches by side / match_type, exceptions by code and per-stage match times."""
+    if metrics is None:
+        return
+    for name, df in results.items():
+        metrics.add("rows_out", len(df), output=name)
+    for name in ('matched', 'partial'):
+        df = results.get(name)
+        if df is None or df.empty or 'match_type' not in df.columns:
+            continue
+        sides = df['side'] if 'side' in df.columns else pd.Series("", index=df.index)
+        counts = pd.DataFrame({'side': sides, 'match_type': df['match_type'].astype(str)}).value_counts()
+        for (side, match_type), n in counts.items():
+            metrics.add("matches", int(n), side=side, match_type=match_type)
+    exceptions = results.get('exceptions')
+    if exceptions is not None and not exceptions.empty and 'code' in exceptions.columns:
+        codes = exceptions['code'].map(lambda c: getattr(c, 'value', c))
+        for code, n in codes.value_counts().items():
+            metrics.add("exceptions", int(n), code=code)
+    for stage, seconds in getattr(matcher, 'stage_seconds', {}).items():
+        metrics.add("stage_duration_seconds", seconds, stage=f"match {stage}")
+
+def record_parse(metrics: Optional[RunMetrics], side: str, df: pd.DataFrame):
+    """
+    Rows read / rejected by the parser for one parsed file, from the
+    df.attrs['parse_stats'] the bank and broker parsers leave behind.
+    """
+    if metrics is None:
+        return
+    stats = df.attrs.get('parse_stats', {})
+    if side == 'bank':
+        metrics.add("rows_in", stats.get('blocks', len(df)), input="bank_blocks")
+        metrics.add("parse_failures", stats.get('rejected_blocks', 0), side=side, reason="rejected_block")
+    else:
+        metrics.add("rows_in", stats.get('table_rows', len(df)), input="broker_table_rows")
+        metrics.add("parse_failures", stats.get('skipped_rows', 0), side=side, reason="skipped_row")
+        metrics.add("parse_failures", stats.get('zero_amount_rows', 0), side=side, reason="zero_amount")
+
+def _with_labels(results: dict, bank_index: pd.Index, broker_index: pd.Index) -> dict:
+    """Out-of-core row ids are positions; map them back to the frames' row labels."""
+    for df in results.values():
+        for col, index in (("bank_row_id", bank_index), ("broker_row_id", broker_index)):
+            if col in df.columns:
+                df[col] = df[col].map(lambda pos: index[int(pos)] if pd.notna(pos) else pos)
+    return results
+
+def parse_files(side: str, paths: List[str], config: dict,
+                metrics: Optional[RunMetrics] = None) -> Tuple[pd.DataFrame, int]:
+    """
+    Parse bank TXT / broker PDF files of one side and merge them without
+    cross-file duplicates. Returns (frame, duplicates dropped).
+    """
+    frames = []
+    for path in paths:
+        with _timed(metrics, f"parse_{side}"):
+            df = _parse_file(side, path, config)
+        record_parse(metrics, side, df)
+        frames.append((os.path.basename(path), df))
+    merged, dropped = merge_parsed(frames)
+    if metrics is not None:
+        metrics.add("duplicates_dropped", dropped, side=side)
+        metrics.add("rows_out", len(merged), output=side)
+    return merged, dropped
+
+def _parse_file(side: str, path: str, config: dict) -> pd.DataFrame:
+    if side == 'bank':
+        from parsers.bank_txt_parser import parse_bank_file
+        return parse_bank_file(
+            path,
+            workers=int(config.get('bank_parse_workers', 0)),
+            chunk_blocks=int(config.get('bank_parse_chunk_blocks', 5000)),
+        )
+    if side == 'broker':
+        from parsers.broker_pdf_parser import parse_broker_pdf
+        return parse_broker_pdf(path)
+    raise ValueError(f"Unknown side: {side!r} (expected 'bank' or 'broker')")
+
+def reconcile_files(bank_paths: List[str], broker_paths: List[str], config: dict,
+                    progress=None, cancel=None, metrics: Optional[RunMetrics] = None) -> Tuple[dict, TwoSidedMatcher]:
+    """Parse both sides from disk and reconcile them."""
+    bank_df, _ = parse_files('bank', bank_paths, config, metrics=metrics)
+    broker_df, _ = parse_files('broker', broker_paths, config, metrics=metrics)
+    return reconcile_frames(bank_df, broker_df, config, progress=progress, cancel=cancel,
+                            allow_out_of_core=True, metrics=metrics)
+
+def reconcile_out_of_core(bank_sources: list, broker_sources: list, config: dict,
+                          progress=None, cancel=None):
+    """
+    Reconcile parsed rows (Parquet / CSV files or frames) through the
+    out-of-core backend (engine.outofcore). Returns (results, matcher).
+    """
+    from .outofcore import OutOfCoreMatcher
+
+    matcher = OutOfCoreMatcher(bank_sources, broker_sources, config, progress=progress, cancel=cancel)
+    return matcher.run(), matcher
+
+def write_results(results: dict, out_dir: str, formats=("csv",), config: dict = None) -> List[str]:
+    """Write the result frames into out_dir (CSV per frame by default). Returns the paths written."""
+    from utils.export import export_results
+
+    config = config or {}
+    written = export_results(
+        results, out_dir, formats,
+        workers=int(config.get('export_workers', 4)),
+        chunk_rows=int(config.get('export_chunk_rows', 50000)),
+    )
+    return [path for paths in written.values() for path in paths]
@@ -0,0 +1,295 @@
+"""
+Cost-based execution planner for one side of a reconciliation.
+
+From cheap statistics (row counts, rows per bank date, ref fill rate, amount
+cardinality, sampled amount selectivity) it estimates, per bank-date
+partition, the cost of each candidate join and picks the cheapest:
+
+    nested      compare every bank row with every broker row (tiny inputs)
+    sort_merge  binary search over broker rows sorted by date (default)
+    hash_join   hash on amount buckets, then the date window: only pairs
+                within tolerance are emitted (dense days, many distinct amounts)
+
+and, with `fuzzy_engine: auto`, whether the partition's fuzzy pass is blocked
+through the n-gram shortlist instead of scoring every candidate. The run as a
+whole goes out of core when the estimated candidate set exceeds the memory
+budget. The joins give the same matches; blocked fuzzy scores only the top-k
+shortlisted rows.
+
+Costs are in rough relative units (COSTS), not seconds; the plan and its
+estimates are logged (logger "recon.planner") so a bad choice can be traced
+to the estimate that caused it.
+"""
+import hashlib
+import importlib.util
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .candidates import HASH_JOIN, JOIN_STRATEGIES, NESTED, SORT_MERGE, bank_tolerances
+from utils.business_days import BusinessCalendar, day_numbers
+from utils.refs import canonical_ref_keys
+
+log = logging.getLogger("recon.planner")
+
+IN_MEMORY = 'in_memory'
+OUT_OF_CORE = 'out_of_core'
+PAIRWISE = 'pairwise'
+BLOCKED_FUZZY = 'blocked_fuzzy'
+
+# Relative cost of one unit of work
+COSTS = {
+    'compare': 1.0,      # one vectorized date comparison (nested scan)
+    'probe': 3.0,        # one binary-search step
+    'pair': 40.0,        # one candidate pair carried through the graph and the 1:1 stages
+    'fuzzy': 400.0,      # one token_set_ratio scoring
+    'ngram_row': 150.0,  # indexing or querying one row of the n-gram index
+    'subset_item': 200.0, # one pool row offered to the SPLIT/BULK subset search
+}
+# Approximate memory per candidate pair (graph columns + views) and per input row
+PAIR_BYTES = 96
+ROW_BYTES = 512
+# Rows sampled for the ref fill rate and amount selectivity
+SAMPLE_ROWS = 2048
+
+@dataclass
+class PartitionPlan:
+    """Choice for the bank rows of one date (business-day ordinal with a calendar)."""
+    day: float
+    bank_rows: int
+    broker_rows: int             # broker rows in the partition's date window
+    amount_cardinality: float    # distinct bank amounts / bank rows
+    join: str
+    fuzzy: str
+    est_pairs: float             # candidate pairs the chosen join emits
+    est_cost: float
+    join_costs: Dict[str, float] = field(default_factory=dict)
+
+@dataclass
+class MatchPlan:
+    """
+    Plan for one side. row_join / row_blocked are per bank row (position),
+    as consumed by build_candidate_graph and the fuzzy stage.
+    """
+    side: str
+    strategy: str                # IN_MEMORY or OUT_OF_CORE
+    stats: dict
+    partitions: List[PartitionPlan]
+    row_join: np.ndarray
+    row_blocked: np.ndarray
+    hash_tolerance: float
+    est_pairs: float
+    est_memory_mb: float
+    est_cost: float
+    planning_ms: float
+
+    def join_counts(self) -> Dict[str, int]:
+        """Bank rows per join strategy."""
+        counts = {s: 0 for s in JOIN_STRATEGIES}
+        for p in self.partitions:
+            counts[p.join] += p.bank_rows
+        return counts
+
+    def candidates_salt(self) -> str:
+        """Stage cache salt: which rows were hash-joined, and at what tolerance."""
+        hashed = np.flatnonzero(self.row_join == HASH_JOIN)
+        if not len(hashed):
+            return ""
+        return _digest(hashed.tobytes() + repr(self.hash_tolerance).encode())
+
+    def fuzzy_salt(self) -> str:
+        blocked = np.flatnonzero(self.row_blocked)
+        return _digest(blocked.tobytes()) if len(blocked) else ""
+
+    def summary(self) -> str:
+        joins = ", ".join(f"{name} {n}" for name, n in self.join_counts().items() if n)
+        s = self.stats
+        return (
+            f"{self.side} plan: {self.strategy}; {s['bank_rows']} bank / {s['broker_rows']} broker rows, "
+            f"{len(self.partitions)} date partitions (max {s['max_bank_rows_per_day']} bank rows/day); "
+            f"joins: {joins or 'none'}; fuzzy blocked for {int(self.row_blocked.sum())} rows; "
+            f"est {self.est_pairs:,.0f} pairs, {self.est_memory_mb:,.1f} MB, cost {self.est_cost:,.0f}; "
+            f"ref fill {s['ref_fill_rate']:.2f}, amount cardinality {s['amount_cardinality']:.2f}, "
+            f"selectivity {s['amount_selectivity']:.2g}; planned in {self.planning_ms:.1f} ms"
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """One row per date partition with the chosen strategies and estimates."""
+        rows = []
+        for p in self.partitions:
+            row = {"side": self.side, "day": p.day, "bank_rows": p.bank_rows, "broker_rows": p.broker_rows,
+                   "amount_cardinality": p.amount_cardinality, "join": p.join, "fuzzy": p.fuzzy,
+                   "est_pairs": p.est_pairs, "est_cost": p.est_cost}
+            row.update({f"cost_{name}": cost for name, cost in p.join_costs.items()})
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def _sample(n: int) -> np.ndarray:
+    """Evenly spaced positions, at most SAMPLE_ROWS of them."""
+    return np.unique(np.linspace(0, n - 1, min(n, SAMPLE_ROWS)).astype(np.int64)) if n else np.zeros(0, np.int64)
+
+def _ref_fill(refs: pd.Series) -> float:
+    pos = _sample(len(refs))
+    if not len(pos):
+        return 0.0
+    values = refs.iloc[pos].tolist()
+    return sum(1 for r in values if canonical_ref_keys(r)) / len(values)
+
+def _selectivity(bank_amount: np.ndarray, tolerance: np.ndarray, broker_amount: np.ndarray) -> float:
+    """Sampled share of broker rows within a bank row's tolerance (ignoring dates)."""
+    pos = _sample(len(bank_amount))
+    if not len(pos) or not len(broker_amount):
+        return 0.0
+    amounts = np.sort(broker_amount)
+    a, tol = bank_amount[pos], tolerance[pos]
+    hits = np.searchsorted(amounts, a + tol, side='right') - np.searchsorted(amounts, a - tol, side='left')
+    return float(hits.mean()) / len(amounts)
+
+def plan_side(bank_df: pd.DataFrame, broker_df: pd.DataFrame, config: dict, side: str = 'CR',
+              amount_col: str = 'credit', calendar: Optional[BusinessCalendar] = None) -> Optional[MatchPlan]:
+    """
+    Plan one side from its (normalized) bank and broker frames. Returns None
+    when config `planner.enabled` is off.
+    """
+    cfg = config.get('planner', {}) or {}
+    if not cfg.get('enabled', True):
+        return None
+    started = time.perf_counter()
+    window = int(config.get('date_window_days', 2))
+    allowed = [s for s in cfg.get('joins', JOIN_STRATEGIES) if s in JOIN_STRATEGIES] or [SORT_MERGE]
+    n_bank, n_broker = len(bank_df), len(broker_df)
+
+    bank_amount = bank_df['amount'].abs().to_numpy(dtype=np.float64)
+    broker_amount = np.abs(broker_df[amount_col].to_numpy(dtype=np.float64))
+    is_ips = bank_df['narration'].map(lambda n: "IPS" in str(n).upper()).to_numpy(dtype=bool)
+    tolerances = bank_tolerances(pd.DataFrame({'amount': bank_amount, 'is_ips': is_ips}), config)
+    hash_tolerance = float(tolerances.max()) if n_bank else 0.0
+
+    bank_days = day_numbers(bank_df['txn_date'])
+    broker_days = day_numbers(broker_df['txn_date'])
+    if calendar is not None:
+        bank_days = calendar.ordinals_from_days(bank_days)
+        broker_days = calendar.ordinals_from_days(broker_days)
+
+    ref_fill = _ref_fill(bank_df['ref_no'])
+    broker_ref_fill = _ref_fill(broker_df['transaction_ref'])
+    selectivity = _selectivity(bank_amount, tolerances, broker_amount)
+    hash_selectivity = _selectivity(bank_amount, np.full(n_bank, hash_tolerance), broker_amount)
+
+    # Partitions: bank rows by date; broker rows in each date's window by binary search
+    dated = np.flatnonzero(~np.isnan(bank_days))
+    days, inverse, n_b = np.unique(bank_days[dated], return_inverse=True, return_counts=True)
+    broker_sorted = np.sort(broker_days[~np.isnan(broker_days)])
+    undated = int(np.isnan(broker_days).sum())
+    n_w = (np.searchsorted(broker_sorted, days + window, side='right')
+           - np.searchsorted(broker_sorted, days - window, side='left') + undated)
+    distinct = pd.Series(bank_amount[dated]).groupby(inverse).nunique().to_numpy() if len(dated) else n_b
+    cardinality = distinct / np.maximum(n_b, 1)
+
+    # Repeated amounts on a day (IPS batches) make amount hits more likely than the global sample says
+    skew = np.minimum(1.0 / np.maximum(cardinality, 1e-9), n_b)
+    window_pairs = n_b * n_w
+    hash_pairs = np.minimum(window_pairs, window_pairs * hash_selectivity * skew)
+    tol_pairs = np.minimum(window_pairs, window_pairs * selectivity * skew)
+    # Rows left after EXACT: roughly those whose refs cannot meet a broker ref
+    residue = n_b * (1.0 - ref_fill * broker_ref_fill)
+    log_n = np.log2(n_broker + 2)
+    subset_enabled = bool(config.get('subset_enabled', True))
+
+    join_costs = {
+        NESTED: n_b * n_broker * COSTS['compare'] + window_pairs * COSTS['pair'],
+        SORT_MERGE: n_b * 2 * log_n * COSTS['probe'] + window_pairs * COSTS['pair'],
+        # Three bucket probes; SPLIT/BULK later rebuild the whole window for the residue
+        HASH_JOIN: (n_b * 6 * log_n * COSTS['probe'] + hash_pairs * COSTS['pair']
+                    + (residue * n_w * COSTS['pair'] if subset_enabled else 0.0)),
+    }
+    costs = np.vstack([join_costs[s] for s in allowed]) if len(days) else np.zeros((len(allowed), 0))
+    choice = costs.argmin(axis=0) if len(days) else np.zeros(0, dtype=np.int64)
+    chosen = [allowed[i] for i in choice]
+    hashed = np.array(chosen, dtype=object) == HASH_JOIN
+    pairs = np.where(hashed, hash_pairs, window_pairs)
+    # Window pairs rebuilt for the residue of hash-joined dates, held next to the main graph
+    rebuilt = np.where(hashed, residue * n_w, 0.0) if subset_enabled else 0.0 * n_b
+    # SPLIT/BULK search: the same whichever join ran, but it belongs in the estimate
+    pool = np.minimum(n_w, int(config.get('subset_max_pool', 300)))
+    subset_cost = residue * pool * COSTS['subset_item'] if subset_enabled else 0.0 * n_b
+
+    # Fuzzy: score every in-tolerance candidate, or only the n-gram shortlist
+    engine = config.get('fuzzy_engine', 'pairwise')
+    top_k = int(config.get('ngram_top_k', 10))
+    pairwise_cost = residue * (tol_pairs / np.maximum(n_b, 1)) * COSTS['fuzzy']
+    blocked_cost = residue * (COSTS['ngram_row'] + top_k * COSTS['fuzzy'])
+    if not config.get('similarity_enabled', False) or engine == 'pairwise':
+        blocked = np.zeros(len(days), dtype=bool)
+    elif engine == 'ngram':
+        blocked = np.ones(len(days), dtype=bool)
+    else: # auto: block the partitions where it pays, if the index build is paid back too
+        blocked = blocked_cost < pairwise_cost
+        savings = float((pairwise_cost - blocked_cost)[blocked].sum())
+        if savings <= n_broker * COSTS['ngram_row'] or importlib.util.find_spec("scipy") is None:
+            blocked[:] = False
+    fuzzy_cost = np.where(blocked, blocked_cost, pairwise_cost) if config.get('similarity_enabled', False) else 0 * n_b
+
+    row_join = np.full(n_bank, SORT_MERGE, dtype=object)
+    row_blocked = np.zeros(n_bank, dtype=bool)
+    if len(dated):
+        row_join[dated] = np.array(chosen, dtype=object)[inverse]
+        row_blocked[dated] = blocked[inverse]
+
+    partitions = [
+        PartitionPlan(
+            day=float(days[i]), bank_rows=int(n_b[i]), broker_rows=int(n_w[i]),
+            amount_cardinality=float(cardinality[i]), join=chosen[i],
+            fuzzy=BLOCKED_FUZZY if blocked[i] else PAIRWISE, est_pairs=float(pairs[i]),
+            est_cost=float(costs[choice[i], i] + fuzzy_cost[i] + subset_cost[i]),
+            join_costs={s: float(costs[j, i]) for j, s in enumerate(allowed)},
+        )
+        for i in range(len(days))
+    ]
+
+    est_pairs = float(pairs.sum())
+    est_memory_mb = ((est_pairs + float(np.sum(rebuilt))) * PAIR_BYTES + (n_bank + n_broker) * ROW_BYTES) / 2**20
+    est_cost = sum(p.est_cost for p in partitions) + n_broker * log_n * COSTS['probe']
+    if blocked.any():
+        est_cost += n_broker * COSTS['ngram_row']
+    budget = cfg.get('memory_budget_mb')
+    strategy = OUT_OF_CORE if budget is not None and est_memory_mb > float(budget) else IN_MEMORY
+
+    stats = {
+        "bank_rows": n_bank,
+        "broker_rows": n_broker,
+        "partitions": len(days),
+        "max_bank_rows_per_day": int(n_b.max()) if len(n_b) else 0,
+        "mean_bank_rows_per_day": float(n_b.mean()) if len(n_b) else 0.0,
+        "max_broker_rows_per_window": int(n_w.max()) if len(n_w) else 0,
+        "ref_fill_rate": ref_fill,
+        "broker_ref_fill_rate": broker_ref_fill,
+        "amount_cardinality": float(len(np.unique(bank_amount)) / n_bank) if n_bank else 0.0,
+        "amount_selectivity": selectivity,
+        "hash_selectivity": hash_selectivity,
+    }
+    return MatchPlan(
+        side=side, strategy=strategy, stats=stats, partitions=partitions,
+        row_join=row_join, row_blocked=row_blocked, hash_tolerance=hash_tolerance,
+        est_pairs=est_pairs, est_memory_mb=est_memory_mb, est_cost=est_cost,
+        planning_ms=(time.perf_counter() - started) * 1000,
+    )
+
+def log_plan(plan: MatchPlan):
+    """Summary at INFO, one line per partition at DEBUG."""
+    log.info(plan.summary())
+    if log.isEnabledFor(logging.DEBUG):
+        for p in plan.partitions:
+            costs = ", ".join(f"{name}={cost:,.0f}" for name, cost in p.join_costs.items())
+            log.debug(
+                f"{plan.side} day {p.day:.0f}: {p.bank_rows} bank / {p.broker_rows} broker rows, "
+                f"cardinality {p.amount_cardinality:.2f} -> {p.join} + {p.fuzzy}, "
+                f"est {p.est_pairs:,.0f} pairs ({costs})"
+            )
@@ -0,0 +1,44 @@
+import pandas as pd
+from typing import List
+from .rules import preprocess_text
+from normalize.common import FrameCache, frame_hash
+
+# Suffix for the cached processed-string column, e.g. narration -> narration_proc
+PROCESSED_SUFFIX = "_proc"
+
+_PROCESSED_CACHE = FrameCache()
+
+def processed_column(col: str) -> str:
+    return col + PROCESSED_SUFFIX
+
+def with_processed_columns(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    Return df with a `<col>_proc` column (sorted unique tokens) for each text column.
+    Each distinct value is processed once, and the result is cached per frame
+    content so the candidate loop never re-tokenizes the same narration.
+    """
+    todo = [c for c in columns if c in df.columns and processed_column(c) not in df.columns]
+    if not todo or df.empty:
+        return df
+
+    key = ",".join(todo) + ":" + frame_hash(df)
+    cached = _PROCESSED_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    new_cols = {}
+    for col in todo:
+        values = df[col].tolist()
+        lookup = {}
+        processed = []
+        for v in values:
+            # NaN/None are not hashable-equal to themselves; process them directly
+            if isinstance(v, str):
+                if v not in lookup:
+                    lookup[v] = preprocess_text(v)
+                processed.append(lookup[v])
+            else:
+                processed.append(preprocess_text(v))
+        new_cols[processed_column(col)] = pd.Series(processed, index=df.index, dtype=object)
+
+    return _PROCESSED_CACHE.put(key, df.assign(**new_cols))
@@ -0,0 +1,27 @@
+from collections import defaultdict
+from typing import Iterable, List, Tuple, Any
+from utils.refs import canonical_ref_keys
+
+class RefIndex:
+    """
+    Hash index from every canonical ref variant to broker row labels.
+    Lets exact-ref matching catch format differences (slash suffixes, CDS/CZ,
+    case, separators, leading zeros) with dict lookups instead of fuzzy scoring.
+    """
+    def __init__(self, rows: Iterable[Tuple[Any, Any]]):
+        self._index = defaultdict(list)
+        self._order = {}
+        for pos, (label, ref) in enumerate(rows):
+            self._order[label] = pos
+            for key in canonical_ref_keys(ref):
+                self._index[key].append(label)
+
+    def lookup_keys(self, keys: List[str]) -> List[Any]:
+        """Row labels sharing any of the keys, in original row order."""
+        hits = set()
+        for key in keys:
+            hits.update(self._index.get(key, ()))
+        return sorted(hits, key=self._order.__getitem__)
+
+    def lookup(self, ref) -> List[Any]:
+        return self.lookup_keys(canonical_ref_keys(ref))
@@ -1,12 +1,14 @@
 from datetime import date, timedelta
 from typing import Optional
-from rapidfuzz import fuzz
 
-def within_date_window(d1: date, d2: date, window_days: int = 2) -> bool:
-    """Check if d2 is within d1 ± window_days"""
+def within_date_window(d1: date, d2: date, window_days: int = 2, calendar=None) -> bool:
+    """
+    Check if d2 is within d1 ± window_days (business days if a
+    utils.business_days.BusinessCalendar is given).
+    """
     if not d1 or not d2:
         return False
-    delta = abs((d1 - d2).days)
+    delta = calendar.gap(d1, d2) if calendar is not None else abs((d1 - d2).days)
     return delta <= window_days
 
 def compute_tolerance(bank_amount: float, narration: str, config: dict) -> float:
@@ -41,6 +43,29 @@ def check_similarity(s1: str, s2: str, threshold: float = 0.85) -> bool:
     if not s1 or not s2:
         return False
     
+    from rapidfuzz import fuzz # only loaded when fuzzy matching actually runs
+    
     # token_set_ratio is good for partial overlap like "BNKFT-PMS" vs "PMS charge"
     score = fuzz.token_set_ratio(str(s1), str(s2)) / 100.0
     return score >= threshold
+
+def preprocess_text(s) -> str:
+    """
+    Reduce a string to its sorted, de-duplicated whitespace tokens.
+    token_set_ratio only looks at the token sets, so scoring the processed
+    forms gives exactly the same result as scoring the raw strings.
+    """
+    if s is None or (isinstance(s, str) and not s):
+        return ""
+    return " ".join(sorted(set(str(s).split())))
+
+def check_processed_similarity(p1: str, p2: str, threshold: float = 0.85) -> bool:
+    """
+    Same as check_similarity, but for strings already run through preprocess_text.
+    """
+    if not p1 or not p2:
+        return False
+    
+    from rapidfuzz import fuzz
+    score = fuzz.token_set_ratio(p1, p2, score_cutoff=threshold * 100.0) / 100.0
+    return score >= threshold
@@ -0,0 +1,92 @@
+import dataclasses
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List
+
+import numpy as np
+import pandas as pd
+
+# Config keys each pipeline stage depends on. A stage's cache key chains the
+# previous stage's key, so changing a key re-runs that stage and everything after it.
+STAGE_CONFIG_KEYS = {
+    'candidates': ['date_window_days', 'calendar'],
+    'exact': ['tolerance'],
+    'amount': ['tolerance'],
+    'memo': ['memo'],
+    'fuzzy': ['similarity_enabled', 'similarity_threshold', 'fuzzy_engine',
+              'ngram_top_k', 'ngram_size', 'ngram_block_size'],
+    'subset': ['subset_enabled', 'subset_max_items', 'subset_max_pool'],
+}
+
+def stage_key(parent_key: str, stage: str, config: dict, keys: List[str] = None) -> str:
+    """Key for a stage result: parent key + stage name + the config values it reads."""
+    keys = STAGE_CONFIG_KEYS[stage] if keys is None else keys
+    relevant = {k: config.get(k) for k in keys}
+    payload = json.dumps([parent_key, stage, relevant], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+def estimate_bytes(value) -> int:
+    """Rough in-memory size of a stage result (arrays / frames by their buffers, containers recursively)."""
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(index=True, deep=False)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return sys.getsizeof(value) + sum(estimate_bytes(getattr(value, f.name)) for f in dataclasses.fields(value))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_bytes(k) + estimate_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_bytes(v) for v in value)
+    return sys.getsizeof(value)
+
+class StageCache:
+    """
+    LRU of per-stage results keyed by stage_key, bounded by entry count and by
+    the estimated bytes of the results held (estimate_bytes); a result larger
+    than max_bytes on its own is returned but not kept.
+    Values are treated as immutable (stages copy their input state).
+    Thread-safe: lookups and evictions hold a lock, stages compute outside it
+    (two threads missing the same key both compute; the second result wins).
+    """
+    def __init__(self, maxsize: int = 64, max_bytes: int = 512 * 2 ** 20):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # key -> (value, bytes)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+        value = compute()
+        size = estimate_bytes(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while len(self._entries) > self.maxsize or self.bytes > self.max_bytes:
+                self.bytes -= self._entries.popitem(last=False)[1][1]
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+# Process-wide cache shared by every Matcher run (Streamlit reruns included)
+STAGE_CACHE = StageCache()
@@ -0,0 +1,190 @@
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from .candidates import CandidateGraph
+from .subset_sum import find_subset
+
+@dataclass
+class MatchState:
+    """
+    Cumulative output of the matching stages, in positional row numbers.
+    matches: (match_type, bank_positions, broker_positions) in the order found.
+    fuzzy_calls: bank position -> similarity checks the FUZZY stage made for it.
+    """
+    matches: List[Tuple[str, tuple, tuple]] = field(default_factory=list)
+    bank_done: set = field(default_factory=set)
+    broker_used: set = field(default_factory=set)
+    fuzzy_calls: Dict[int, int] = field(default_factory=dict)
+
+    def copy(self) -> "MatchState":
+        return MatchState(list(self.matches), set(self.bank_done), set(self.broker_used), dict(self.fuzzy_calls))
+
+    def add(self, match_type: str, bank_positions: tuple, broker_positions: tuple):
+        self.matches.append((match_type, tuple(bank_positions), tuple(broker_positions)))
+        self.bank_done.update(bank_positions)
+        self.broker_used.update(broker_positions)
+
+class PairView:
+    """
+    Candidate pairs admissible under one config: date gap <= window and,
+    if tolerances are given, amount delta <= the bank row's tolerance.
+    Pairs stay grouped by bank row in broker order.
+    """
+    def __init__(self, graph: CandidateGraph, date_window: int, tolerances: Optional[np.ndarray] = None):
+        pairs = graph.pairs
+        bank_pos = pairs['bank_pos'].to_numpy()
+        mask = pairs['date_gap'].to_numpy() <= date_window
+        if tolerances is not None:
+            mask &= pairs['amount_delta'].to_numpy() <= tolerances[bank_pos]
+
+        self.pair_idx = np.flatnonzero(mask) # rows of graph.pairs
+        self.b = bank_pos[mask]
+        self.r = pairs['broker_pos'].to_numpy()[mask]
+        self.ref_match = pairs['ref_match'].to_numpy()[mask]
+        self.date_gap = pairs['date_gap'].to_numpy()[mask]
+
+        self.blocks: Dict[int, Tuple[int, int]] = {}
+        if len(self.b):
+            starts = np.flatnonzero(np.r_[True, self.b[1:] != self.b[:-1]])
+            ends = np.r_[starts[1:], len(self.b)]
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                self.blocks[int(self.b[start])] = (start, end)
+
+    def bank_rows(self) -> List[int]:
+        return list(self.blocks.keys())
+
+    def open_pairs(self, bank_pos: int, state: MatchState) -> List[int]:
+        """View indices of this bank row's pairs whose broker row is still free."""
+        start, end = self.blocks.get(bank_pos, (0, 0))
+        used = state.broker_used
+        return [i for i in range(start, end) if self.r[i] not in used]
+
+def exact_rows(view: PairView, state: MatchState, rows: Iterable[int]):
+    """EXACT: canonical ref overlap + amount within tolerance, first broker row wins. Mutates state."""
+    for bank_pos in rows:
+        if bank_pos in state.bank_done:
+            continue
+        for i in view.open_pairs(bank_pos, state):
+            if view.ref_match[i]:
+                state.add('EXACT', (bank_pos,), (int(view.r[i]),))
+                break
+
+def amount_rows(view: PairView, state: MatchState, rows: Iterable[int]):
+    """REF_MISMATCH: exactly one free broker row within tolerance. Several -> ambiguous, left for fuzzy."""
+    for bank_pos in rows:
+        if bank_pos in state.bank_done:
+            continue
+        open_rows = view.open_pairs(bank_pos, state)
+        if len(open_rows) == 1:
+            state.add('REF_MISMATCH', (bank_pos,), (int(view.r[open_rows[0]]),))
+
+def memo_rows(view: PairView, state: MatchState, rows: Iterable[int], targets: Callable[[int], set],
+              broker_fingerprints: list):
+    """
+    MEMO: first free broker row within tolerance whose particulars fingerprint
+    the counterparty memo links to this bank row. Mutates state.
+    targets(bank_pos) -> set of linked broker fingerprints
+    """
+    for bank_pos in rows:
+        if bank_pos in state.bank_done:
+            continue
+        linked = targets(bank_pos)
+        if not linked:
+            continue
+        for i in view.open_pairs(bank_pos, state):
+            if broker_fingerprints[view.r[i]] in linked:
+                state.add('MEMO', (bank_pos,), (int(view.r[i]),))
+                break
+
+def fuzzy_rows(view: PairView, state: MatchState, rows: Iterable[int], is_similar: Callable[[int, int], bool],
+               shortlist: Optional[List[list]] = None):
+    """
+    FUZZY: first free broker row within tolerance whose ref or narration is
+    similar enough. With a shortlist (n-gram engine), only shortlisted broker
+    rows are scored, best first; rows whose shortlist entry is None score all
+    their candidates. Mutates state.
+    is_similar(bank_pos, broker_pos) -> bool
+    """
+    for bank_pos in rows:
+        if bank_pos in state.bank_done:
+            continue
+        brokers = [int(view.r[i]) for i in view.open_pairs(bank_pos, state)]
+        if shortlist is not None and shortlist[bank_pos] is not None:
+            allowed = set(brokers)
+            brokers = [r for r in shortlist[bank_pos] if r in allowed]
+        calls = 0
+        for broker_pos in brokers:
+            calls += 1
+            if is_similar(bank_pos, broker_pos):
+                state.add('FUZZY', (bank_pos,), (broker_pos,))
+                break
+        if calls:
+            state.fuzzy_calls[bank_pos] = state.fuzzy_calls.get(bank_pos, 0) + calls
+
+# Whole-stage forms: copy the input state and process every bank row in order.
+# Processing the same rows chunk by chunk through *_rows gives identical results.
+
+def stage_exact(view: PairView, state: MatchState) -> MatchState:
+    state = state.copy()
+    exact_rows(view, state, view.bank_rows())
+    return state
+
+def stage_amount(view: PairView, state: MatchState) -> MatchState:
+    state = state.copy()
+    amount_rows(view, state, view.bank_rows())
+    return state
+
+def stage_fuzzy(view: PairView, state: MatchState, is_similar: Callable[[int, int], bool],
+                shortlist: Optional[List[list]] = None) -> MatchState:
+    state = state.copy()
+    fuzzy_rows(view, state, view.bank_rows(), is_similar, shortlist)
+    return state
+
+def stage_subset(view: PairView, state: MatchState, bank_amount: np.ndarray, broker_amount: np.ndarray,
+                 tolerances: np.ndarray, max_items: int = 3, max_pool: int = 300) -> MatchState:
+    """
+    Many-to-one matching over rows left unmatched by the 1:1 stages.
+    SPLIT: one bank row = several broker rows (client deposited once).
+    BULK:  one broker row = several bank rows.
+    broker_amount is the broker column of the side being matched (credit / debit).
+    view must be date-window only (no tolerance filter). Pools are capped at
+    max_pool rows, nearest dates first.
+    """
+    state = state.copy()
+
+    # One bank row -> several broker rows
+    for bank_pos in view.bank_rows():
+        if bank_pos in state.bank_done:
+            continue
+        pool = [i for i in view.open_pairs(bank_pos, state) if broker_amount[view.r[i]] > 0]
+        pool.sort(key=lambda i: view.date_gap[i])
+        group = find_subset(
+            float(bank_amount[bank_pos]),
+            [(int(view.r[i]), abs(float(broker_amount[view.r[i]]))) for i in pool[:max_pool]],
+            float(tolerances[bank_pos]), max_items
+        )
+        if group:
+            state.add('SPLIT', (bank_pos,), tuple(group))
+
+    # One broker row -> several bank rows
+    by_broker: Dict[int, List[int]] = {}
+    for i in range(len(view.b)):
+        if view.b[i] not in state.bank_done and view.r[i] not in state.broker_used:
+            by_broker.setdefault(int(view.r[i]), []).append(i)
+    for broker_pos in sorted(by_broker):
+        if broker_amount[broker_pos] <= 0:
+            continue
+        pool = [i for i in by_broker[broker_pos] if view.b[i] not in state.bank_done]
+        if len(pool) < 2:
+            continue
+        pool.sort(key=lambda i: view.date_gap[i])
+        pool = pool[:max_pool]
+        group = find_subset(
+            abs(float(broker_amount[broker_pos])),
+            [(int(view.b[i]), float(bank_amount[view.b[i]])) for i in pool],
+            max(float(tolerances[view.b[i]]) for i in pool), max_items
+        )
+        if group:
+            state.add('BULK', tuple(sorted(group)), (broker_pos,))
+
+    return state
@@ -0,0 +1,85 @@
+from bisect import bisect_left, bisect_right
+from typing import Any, List, Optional, Tuple
+
+def _half_sums(items: List[Tuple[Any, float]], max_size: int, limit: float):
+    """
+    All index-combinations of size 1..max_size whose sum stays <= limit.
+    items must be sorted by amount ascending, so any combination that
+    overshoots lets us skip everything that extends it.
+    Returns a list of (sum, combo) sorted by sum.
+    """
+    out = []
+    n = len(items)
+
+    def extend(start: int, room: int, total: float, combo: tuple):
+        for i in range(start, n):
+            t = total + items[i][1]
+            if t > limit:
+                break # Sorted ascending: every later item overshoots too
+            c = combo + (i,)
+            out.append((t, c))
+            if room > 1:
+                extend(i + 1, room - 1, t, c)
+
+    extend(0, max_size, 0.0, ())
+    out.sort(key=lambda x: x[0])
+    return out
+
+def find_subset(target: float, items: List[Tuple[Any, float]], tolerance: float,
+                max_items: int = 3) -> Optional[List[Any]]:
+    """
+    Find 2..max_items items whose amounts sum to target within tolerance.
+    items: (key, amount) pairs, amounts positive.
+    Prefers the fewest items, then the smallest |delta|.
+    Returns the matching keys, or None.
+
+    Meet-in-the-middle: every k-subset (k <= max_items) is a "left" half of
+    ceil(k/2) items plus a "right" half drawn only from higher positions, so
+    we enumerate halves of at most ceil(max_items/2) items once and pair
+    them with a binary search over the sorted half-sums.
+    """
+    if max_items < 2 or target <= 0:
+        return None
+    hi_limit = target + tolerance
+
+    # Sorted-amount pruning: nothing larger than the target can be in a set
+    pool = sorted(((k, a) for k, a in items if 0 < a <= hi_limit), key=lambda x: x[1])
+    if len(pool) < 2:
+        return None
+    # Cheap bound: even the largest max_items amounts can't reach the target
+    if sum(a for _, a in pool[-max_items:]) < target - tolerance:
+        return None
+
+    half = (max_items + 1) // 2
+    halves = _half_sums(pool, half, hi_limit)
+    sums = [s for s, _ in halves]
+
+    best = None # (size, |delta|, combo)
+    for left_sum, left in halves:
+        # Left alone (size >= 2) is already a candidate set
+        if len(left) >= 2 and abs(target - left_sum) <= tolerance:
+            cand = (len(left), abs(target - left_sum), left)
+            if best is None or cand[:2] < best[:2]:
+                best = cand
+
+        room = max_items - len(left)
+        if room <= 0:
+            continue
+        lo = bisect_left(sums, target - tolerance - left_sum)
+        hi = bisect_right(sums, target + tolerance - left_sum)
+        last = left[-1]
+        for j in range(lo, hi):
+            right_sum, right = halves[j]
+            # Right half must sit strictly after the left half (disjoint, counted once)
+            if len(right) > room or right[0] <= last:
+                continue
+            combo = left + right
+            cand = (len(combo), abs(target - left_sum - right_sum), combo)
+            if best is None or cand[:2] < best[:2]:
+                best = cand
+        if best is not None and best[0] == 2 and best[1] == 0:
+            break # Can't do better than an exact pair
+
+    if best is None:
+        return None
+    return [pool[i][0] for i in best[2]]
@@ -0,0 +1,126 @@
+import copy
+import itertools
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+from .candidates import CandidateGraph, build_candidate_graph, bank_tolerances
+from .matcher import SIDE_COLUMNS, split_sides
+from utils.business_days import BusinessCalendar
+from .stages import MatchState, PairView, stage_exact, stage_amount, stage_fuzzy
+
+def config_grid(base_config: dict, date_windows: List[int], thresholds: List[float],
+                ips_maxes: List[float], rtgs_flats: List[float]) -> List[dict]:
+    """Cartesian product of the swept settings on top of base_config."""
+    configs = []
+    for window, threshold, ips_max, rtgs_flat in itertools.product(date_windows, thresholds, ips_maxes, rtgs_flats):
+        cfg = copy.deepcopy(base_config)
+        cfg['date_window_days'] = int(window)
+        cfg['similarity_threshold'] = float(threshold)
+        cfg.setdefault('tolerance', {})
+        cfg['tolerance']['ips_max'] = float(ips_max)
+        cfg['tolerance']['rtgs_flat'] = float(rtgs_flat)
+        configs.append(cfg)
+    return configs
+
+def evaluate_config(graph: CandidateGraph, config: dict) -> dict:
+    """
+    Run Matcher's 1:1 stages for one config on a prebuilt candidate graph:
+    EXACT (ref + amount), then a unique amount candidate (REF_MISMATCH), then
+    the first candidate above the similarity threshold (FUZZY), using the
+    similarity scores stored in the graph.
+    The many-to-one subset pass and the n-gram shortlist are not modelled.
+    """
+    window = int(config.get('date_window_days', 2))
+    sim_enabled = config.get('similarity_enabled', False)
+    threshold = float(config.get('similarity_threshold', 0.85))
+
+    view = PairView(graph, window, bank_tolerances(graph.bank, config))
+    similarity = graph.pairs['similarity'].to_numpy()[view.pair_idx]
+    similar = {
+        (int(b), int(r)) for b, r, score in zip(view.b, view.r, similarity) if score >= threshold
+    }
+
+    state = stage_exact(view, MatchState())
+    state = stage_amount(view, state)
+    if sim_enabled:
+        state = stage_fuzzy(view, state, lambda b, r: (b, r) in similar)
+
+    counts = {'EXACT': 0, 'REF_MISMATCH': 0, 'FUZZY': 0}
+    for match_type, _, _ in state.matches:
+        counts[match_type] += 1
+
+    n_bank = len(graph.bank)
+    matched_bank = len(state.bank_done)
+    open_broker = int(sum(1 for pos in np.flatnonzero(graph.broker_amount > 0) if pos not in state.broker_used))
+    return {
+        "date_window_days": window,
+        "similarity_threshold": threshold,
+        "ips_max": float(config.get('tolerance', {}).get('ips_max', 10.0)),
+        "rtgs_flat": float(config.get('tolerance', {}).get('rtgs_flat', 100.0)),
+        "matched": counts['EXACT'] + counts['FUZZY'],
+        "exact": counts['EXACT'],
+        "fuzzy": counts['FUZZY'],
+        "partial": counts['REF_MISMATCH'],
+        "unmatched_bank": n_bank - matched_bank,
+        "unmatched_broker": open_broker,
+        # Every REF_MISMATCH partial raises one exception record in Matcher
+        "exceptions": counts['REF_MISMATCH'],
+        "match_rate": matched_bank / n_bank if n_bank else 0.0,
+    }
+
+def evaluate_sides(graphs: List[CandidateGraph], config: dict) -> dict:
+    """evaluate_config over one graph per side (CR / DR), with the counts added up."""
+    rows = [evaluate_config(graph, config) for graph in graphs]
+    out = dict(rows[0])
+    for key in ("matched", "exact", "fuzzy", "partial", "unmatched_bank", "unmatched_broker", "exceptions"):
+        out[key] = sum(row[key] for row in rows)
+    n_bank = sum(len(graph.bank) for graph in graphs)
+    out["match_rate"] = (n_bank - out["unmatched_bank"]) / n_bank if n_bank else 0.0
+    return out
+
+# Worker-side copy of the graphs, shipped once per process rather than per task
+_WORKER_GRAPHS = None
+
+def _init_worker(graphs: List[CandidateGraph]):
+    global _WORKER_GRAPHS
+    _WORKER_GRAPHS = graphs
+
+def _evaluate_in_worker(config: dict) -> dict:
+    return evaluate_sides(_WORKER_GRAPHS, config)
+
+def run_sweep(bank_df: pd.DataFrame, broker_df: pd.DataFrame, configs: List[dict],
+              max_workers: int = None) -> pd.DataFrame:
+    """
+    Build one candidate graph per side (CR rows vs broker credits, DR rows vs
+    broker debits, as in TwoSidedMatcher) at the widest window/tolerance in
+    the grid and evaluate every config against them (in a process pool for
+    larger grids). Returns one row of match/exception counts per config.
+    """
+    if not configs:
+        return pd.DataFrame()
+
+    widest_window = max(int(c.get('date_window_days', 2)) for c in configs)
+    widest_tol = max(
+        float(c.get('tolerance', {}).get('ips_max', 10.0)) + float(c.get('tolerance', {}).get('rtgs_flat', 100.0))
+        for c in configs
+    )
+    with_similarity = any(c.get('similarity_enabled', False) for c in configs)
+    calendar = BusinessCalendar.from_config(configs[0])
+    sides = split_sides(bank_df, broker_df, configs[0].get('match_sides', list(SIDE_COLUMNS)))
+    graphs = [
+        build_candidate_graph(bank_part, broker_part, widest_window, widest_tol, with_similarity,
+                              amount_col=SIDE_COLUMNS[side], calendar=calendar)
+        for side, (bank_part, broker_part) in sides.items()
+    ]
+    if not graphs:
+        return pd.DataFrame()
+
+    workers = max_workers or min(len(configs), os.cpu_count() or 1)
+    if workers <= 1 or len(configs) < 4:
+        rows = [evaluate_sides(graphs, cfg) for cfg in configs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(graphs,)) as pool:
+            rows = list(pool.map(_evaluate_in_worker, configs))
+    return pd.DataFrame(rows)
@@ -1,35 +1,53 @@
+import numpy as np
 import pandas as pd
+from .common import NORMALIZED_CACHE, frame_hash, needs_string_cast, needs_float_cast
+
+BANK_COLUMNS = ["txn_date", "ref_no", "amount", "dr_cr", "narration"]
 
 def normalize_bank_data(df: pd.DataFrame) -> pd.DataFrame:
     """
     Standardize Bank DataFrame columns to canonical schema:
     txn_date (date)
     ref_no (string)
-    amount (numeric)
-    dr_cr (string) - inferred or default
+    amount (numeric, signed: negative for DR)
+    dr_cr (string) - 'CR' or 'DR', from the column if given, else the amount's sign
     narration (string)
+
+    The input frame is never modified. The result is a copy-on-write view
+    cached per input hash, so re-running on the same upload is free.
     """
     if df.empty:
-        return pd.DataFrame(columns=["txn_date", "ref_no", "amount", "dr_cr", "narration"])
+        return pd.DataFrame(columns=BANK_COLUMNS)
+
+    key = "bank:" + frame_hash(df)
+    cached = NORMALIZED_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    # Shallow copy: new columns / re-casts land here, not in the session frame
+    out = df.copy(deep=False)
     
     # Ensure columns exist
     required = ["txn_date", "ref_no", "amount", "narration"]
     for col in required:
-        if col not in df.columns:
-            df[col] = None
+        if col not in out.columns:
+            out[col] = None
             
-    # Normalize types
-    df['ref_no'] = df['ref_no'].astype(str)
-    df['amount'] = pd.to_numeric(df['amount'], errors='coerce').fillna(0.0)
+    # Normalize types (only where the dtype is actually off)
+    if needs_string_cast(out['ref_no']):
+        out['ref_no'] = out['ref_no'].astype(str)
+    if needs_float_cast(out['amount']):
+        out['amount'] = pd.to_numeric(out['amount'], errors='coerce').fillna(0.0)
     
-    # Infer DR/CR if not present
-    # For this specific bank statement, usually lines are Credits (deposits) or Debits (withdrawals).
-    # But the raw parser just gives absolute amount.
-    # We'll leave dr_cr empty or infer from narration if needed (e.g. "WITHDRAWAL").
-    # For now, we'll assume CR (Deposit) if not specified, because we are reconciling against 
-    # Broker "Credit" (Receipts). Bank Statement "Credit" = Money In.
-    # PROMPT SAYS: "CR = inflow to PMS" (which means Bank Credit).
-    if 'dr_cr' not in df.columns:
-        df['dr_cr'] = 'CR' # Default assumption for matching against Broker Receipts
+    # Amounts are signed: CR (money in, matched against broker credits) is
+    # positive, DR (money out, matched against broker debits) negative.
+    # Parsers mark debits by sign; an explicit dr_cr column wins over the sign.
+    sign_dr = out['amount'] < 0
+    if 'dr_cr' not in out.columns:
+        out['dr_cr'] = np.where(sign_dr, 'DR', 'CR')
+    else:
+        labels = out['dr_cr'].fillna('').astype(str).str.strip().str.upper()
+        out['dr_cr'] = np.where(labels.isin(['DR', 'CR']), labels, np.where(sign_dr, 'DR', 'CR'))
+    out['amount'] = np.where(out['dr_cr'] == 'DR', -out['amount'].abs(), out['amount'].abs())
         
-    return df[["txn_date", "ref_no", "amount", "dr_cr", "narration"]]
+    return NORMALIZED_CACHE.put(key, out[BANK_COLUMNS])
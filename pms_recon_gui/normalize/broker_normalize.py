@@ -1,4 +1,7 @@
 import pandas as pd
+from .common import NORMALIZED_CACHE, frame_hash, needs_string_cast, needs_float_cast
+
+BROKER_COLUMNS = ["txn_date", "transaction_ref", "credit", "debit", "particulars", "settlement_date"]
 
 def normalize_broker_data(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -9,26 +12,43 @@ def normalize_broker_data(df: pd.DataFrame) -> pd.DataFrame:
     debit (numeric)
     particulars (string)
     settlement_date (date)
+
+    The input frame is never modified. The result is a copy-on-write view
+    cached per input hash, so re-running on the same upload is free.
     """
     if df.empty:
-        cols = ["txn_date", "transaction_ref", "credit", "debit", "particulars", "settlement_date"]
-        return pd.DataFrame(columns=cols)
+        return pd.DataFrame(columns=BROKER_COLUMNS)
+
+    key = "broker:" + frame_hash(df)
+    cached = NORMALIZED_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    # Shallow copy: new columns / re-casts land here, not in the session frame
+    out = df.copy(deep=False)
 
     # Ensure columns exist
     required = ["txn_date", "transaction_ref", "credit", "debit", "particulars"]
     for col in required:
-        if col not in df.columns:
+        if col not in out.columns:
             if col in ['credit', 'debit']:
-                df[col] = 0.0
+                out[col] = 0.0
             else:
-                df[col] = None
+                out[col] = None
                 
-    if 'settlement_date' not in df.columns:
-        df['settlement_date'] = df['txn_date']
+    if 'settlement_date' not in out.columns:
+        out['settlement_date'] = out['txn_date']
         
-    # Clean types
-    df['transaction_ref'] = df['transaction_ref'].astype(str).str.strip()
-    df['credit'] = pd.to_numeric(df['credit'], errors='coerce').fillna(0.0)
-    df['debit'] = pd.to_numeric(df['debit'], errors='coerce').fillna(0.0)
+    # Clean types (only where the dtype is actually off)
+    refs = out['transaction_ref']
+    recast = needs_string_cast(refs)
+    if recast:
+        refs = refs.astype(str)
+    stripped = refs.str.strip()
+    if recast or not stripped.equals(refs):
+        out['transaction_ref'] = stripped
+    for col in ['credit', 'debit']:
+        if needs_float_cast(out[col]):
+            out[col] = pd.to_numeric(out[col], errors='coerce').fillna(0.0)
     
-    return df[["txn_date", "transaction_ref", "credit", "debit", "particulars", "settlement_date"]]
+    return NORMALIZED_CACHE.put(key, out[BROKER_COLUMNS])
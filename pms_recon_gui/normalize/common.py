@@ -0,0 +1,68 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import pandas as pd
+
+def enable_copy_on_write():
+    """
+    Turn on pandas copy-on-write so column subsets are lazy views.
+    The option is process-wide, so it is set by the entry points (app pages,
+    cli.py, service.py and its workers, watcher.py), not on import.
+    pandas >= 3.0 always runs in this mode (and deprecates the option).
+    """
+    if int(pd.__version__.split('.')[0]) < 3:
+        pd.set_option('mode.copy_on_write', True)
+
+def frame_hash(df: pd.DataFrame) -> str:
+    """
+    Content hash of a DataFrame (index, columns and values).
+    Used as a cache key so identical uploads map to the same entry.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(list(df.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()
+
+def needs_string_cast(series: pd.Series) -> bool:
+    """True if the column is not already a null-free string column."""
+    return not pd.api.types.is_string_dtype(series) or bool(series.isna().any())
+
+def needs_float_cast(series: pd.Series) -> bool:
+    """True if the column is not already a null-free float column."""
+    return not pd.api.types.is_float_dtype(series) or bool(series.isna().any())
+
+class FrameCache:
+    """
+    Small LRU of normalized frames keyed by input content hash.
+    Cached frames are shared between callers, so treat them as read-only
+    (copy-on-write makes accidental writes land on a private copy).
+    Safe to share between threads (the two matching sides, background jobs).
+    """
+    def __init__(self, maxsize: int = 8):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        with self._lock:
+            df = self._entries.get(key)
+            if df is not None:
+                self._entries.move_to_end(key)
+            return df
+
+    def put(self, key: str, df: pd.DataFrame) -> pd.DataFrame:
+        with self._lock:
+            self._entries[key] = df
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return df
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Shared by bank and broker normalizers (keys are prefixed by side)
+NORMALIZED_CACHE = FrameCache()
@@ -1,16 +1,17 @@
 import streamlit as st
-import pandas as pd
 import sys
 import os
-from io import StringIO
-import tempfile
+import time
+import hashlib
 
 # Add parent dir to path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
 
-from parsers.bank_txt_parser import parse_bank_statement
-from parsers.broker_pdf_parser import parse_broker_pdf
 from utils.session import init_session
+from utils.jobs import BackgroundJob
+from parsers.uploads import parse_bank_upload, parse_broker_upload, parse_uploads
 
 st.set_page_config(page_title="Upload Files", page_icon="📂", layout="wide")
 
@@ -18,23 +19,73 @@ init_session()
 
 st.title("📂 Upload Files")
 
+# Background parse jobs, one per side; both run concurrently on the worker pool
+jobs = st.session_state['parse_jobs']
+
+def start_parse(side: str, uploaded: list, parse_fn, **options) -> BackgroundJob:
+    """Submit a parse job for these uploads unless the same files are already parsed/parsing."""
+    files = [(f.name, f.getvalue()) for f in uploaded]
+    digest = hashlib.sha1()
+    for name, raw in files:
+        digest.update(hashlib.sha1(raw).digest())
+    digest = digest.hexdigest()
+    job = jobs.get(side)
+    if job is not None and job.key == digest:
+        return job
+    if job is not None:
+        job.cancel() # Different files replaced the ones being parsed
+    st.session_state[f'{side}_df'] = None
+    # All files of one side are parsed in parallel and merged without cross-file duplicates
+    job = BackgroundJob(side, parse_uploads, files, parse_fn, key=digest, **options)
+    jobs[side] = job
+    return job
+
+def job_result(side: str, job: BackgroundJob, unit: str):
+    """Render progress / cancel / errors for a job; return its merged DataFrame once finished."""
+    if job.running:
+        st.progress(job.fraction, text=f"Parsing... {job.done_units}/{job.total_units or '?'} {unit}")
+        if st.button("Cancel", key=f"cancel_{side}"):
+            job.cancel()
+            st.rerun()
+        return None
+    if job.cancelled:
+        st.warning("Parsing cancelled. Re-upload the files to try again.")
+        return None
+    if job.error is not None:
+        st.error(f"Error parsing {side} file: {job.error}")
+        st.code(job.error_traceback)
+        return None
+    
+    df, dropped = job.result()
+    st.session_state[f'{side}_df'] = df
+    st.caption(f"Parsed in {job.finished - job.started:.1f}s")
+    if dropped:
+        st.info(f"Dropped {dropped} duplicate rows repeated across overlapping files.")
+    return df
+
 col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("Bank Statement (TXT)")
-    bank_file = st.file_uploader("Upload .TXT File", type=['txt'])
-    if bank_file:
-        stringio = StringIO(bank_file.getvalue().decode("utf-8"))
-        content = stringio.read()
-        
+    bank_files = st.file_uploader("Upload .TXT File(s)", type=['txt'], accept_multiple_files=True)
+    if bank_files:
         # Show a sneak peek of raw content for debugging
         with st.expander("👀 View Raw File Content (First 500 chars)"):
-            st.text(content[:500])
+            for bank_file in bank_files:
+                st.caption(bank_file.name)
+                st.text(bank_file.getvalue()[:500].decode("utf-8", errors="replace"))
         
-        try:
-            df = parse_bank_statement(content)
-            st.session_state['bank_df'] = df
-            
+        config = st.session_state.get('config', {})
+        job = start_parse('bank', bank_files, parse_bank_upload,
+                          file_workers=int(config.get('parse_workers', 0)),
+                          workers=int(config.get('bank_parse_workers', 0)),
+                          chunk_blocks=int(config.get('bank_parse_chunk_blocks', 5000)))
+        df = job_result('bank', job, "blocks" if len(bank_files) == 1 else "files")
+        
+        if df is not None:
+            from parsers.bank_txt_parser import RawStatement
+            # Rows keep byte offsets only; the upload bytes back the raw drill-down
+            st.session_state['bank_raw'] = {f.name: RawStatement(f.getvalue()) for f in bank_files}
             if df.empty:
                  st.warning("⚠️ File loaded but 0 valid rows parsed. Please check the file format. Expected: 'Date Ref Amount Narration'")
                  st.info("Ensure dates are DD/MM/YYYY and columns are space-separated.")
@@ -42,31 +93,17 @@ with col1:
                 st.success(f"Loaded {len(df)} rows.")
                 st.dataframe(df.head(20), use_container_width=True)
                 st.info(f"Date Range: {df['txn_date'].min()} to {df['txn_date'].max()}")
-                
-        except Exception as e:
-            st.error(f"Error parsing bank file: {e}")
 
 with col2:
     st.subheader("Broker Ledger (PDF)")
-    broker_file = st.file_uploader("Upload .PDF File", type=['pdf'])
-    if broker_file:
-        # Save to temp file because pdfplumber needs a path (usually)
-        # Actually pdfplumber.open can take a file-like object? 
-        # Yes, plain file object works.
-        try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                tmp.write(broker_file.getvalue())
-                tmp_path = tmp.name
-            
-            df = parse_broker_pdf(tmp_path)
-            st.session_state['broker_df'] = df
-            
-            # Clean up temp file
-            try:
-                os.remove(tmp_path)
-            except:
-                pass
-                
+    broker_files = st.file_uploader("Upload .PDF File(s)", type=['pdf'], accept_multiple_files=True)
+    if broker_files:
+        # pdfplumber reads the uploaded bytes directly, no temp file needed
+        job = start_parse('broker', broker_files, parse_broker_upload,
+                          file_workers=int(st.session_state.get('config', {}).get('parse_workers', 0)))
+        df = job_result('broker', job, "pages" if len(broker_files) == 1 else "files")
+        
+        if df is not None:
             st.success(f"Loaded {len(df)} rows.")
             
             # Check for missing critical columns
@@ -80,12 +117,12 @@ with col2:
             else:
                 st.dataframe(df.head(20), use_container_width=True)
                 st.info(f"Date Range: {df['txn_date'].min()} to {df['txn_date'].max()}")
-                
-        except Exception as e:
-            st.error(f"Error parsing broker file: {e}")
-            import traceback
-            st.write(traceback.format_exc())
 
 st.markdown("---")
 if st.session_state.get('bank_df') is not None and st.session_state.get('broker_df') is not None:
     st.success("✅ Both files loaded! Go to **Configuration** or **Reconcile** page.")
+
+# Poll running jobs: rerun the script until every parse has finished
+if any(job.running for job in jobs.values()):
+    time.sleep(0.3)
+    st.rerun()
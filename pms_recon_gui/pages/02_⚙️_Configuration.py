@@ -2,7 +2,9 @@ import streamlit as st
 import sys
 import os
 
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
 
 from utils.session import init_session
 
@@ -21,12 +23,27 @@ config = st.session_state['config']
 
 st.header("Matching Rules")
 
+st.subheader("↔️ Sides")
+side_labels = {"CR": "Bank credits ↔ broker credits", "DR": "Bank debits ↔ broker debits"}
+match_sides = st.multiselect(
+    "Reconcile",
+    list(side_labels),
+    default=config.get('match_sides', list(side_labels)),
+    format_func=side_labels.get,
+    help="Each side is matched as an independent partition; both run in parallel.",
+)
+
 st.subheader("📅 Date Window")
 date_window = st.number_input(
     "Allowed Date Difference (Days)", 
     min_value=0, max_value=30, 
     value=config.get('date_window_days', 2)
 )
+business_days = st.checkbox(
+    "Count business days only",
+    value=config.get('calendar', {}).get('enabled', False),
+    help="Skips the weekend days and holidays listed under calendar: in config.yml.",
+)
 
 st.subheader("🔍 Fuzzy Matching")
 sim_enabled = st.checkbox("Enable Similarity Matching", value=config.get('similarity_enabled', True))
@@ -36,6 +53,37 @@ sim_threshold = st.slider(
     value=config.get('similarity_threshold', 0.85),
     step=0.01
 )
+engines = ["auto", "pairwise", "ngram"]
+fuzzy_engine = st.selectbox(
+    "Fuzzy Engine",
+    engines,
+    index=engines.index(config.get('fuzzy_engine', 'pairwise')),
+    help="'ngram' shortlists the top-k broker rows with a char n-gram index before scoring (for large ledgers); "
+         "'auto' lets the planner shortlist only the dates where that is cheaper.",
+)
+ngram_top_k = st.number_input(
+    "N-gram Top-K Candidates",
+    min_value=1, max_value=100,
+    value=config.get('ngram_top_k', 10)
+)
+
+memo_enabled = st.checkbox(
+    "Use learned counterparty links before fuzzy matching",
+    value=config.get('memo', {}).get('enabled', False),
+    help="Links are learned from exact matches of earlier runs and stored in "
+         f"{config.get('memo', {}).get('path', 'the memo file')}.",
+)
+
+st.subheader("🧩 Split / Bulk Matching")
+subset_enabled = st.checkbox(
+    "Match one bank row against several broker rows (and vice versa)",
+    value=config.get('subset_enabled', True)
+)
+subset_max_items = st.number_input(
+    "Max Rows per Group",
+    min_value=2, max_value=6,
+    value=config.get('subset_max_items', 3)
+)
 
 st.header("💰 Tolerance Settings")
 
@@ -53,9 +101,16 @@ with col2:
 # Save button logic (implicit in session state update)
 if st.button("Save Configuration", type="primary"):
     new_config = config.copy()
+    new_config['match_sides'] = match_sides
     new_config['date_window_days'] = date_window
+    new_config['calendar'] = {**new_config.get('calendar', {}), 'enabled': business_days}
     new_config['similarity_enabled'] = sim_enabled
     new_config['similarity_threshold'] = sim_threshold
+    new_config['fuzzy_engine'] = fuzzy_engine
+    new_config['ngram_top_k'] = ngram_top_k
+    new_config['memo'] = {**new_config.get('memo', {}), 'enabled': memo_enabled}
+    new_config['subset_enabled'] = subset_enabled
+    new_config['subset_max_items'] = subset_max_items
     
     if 'tolerance' not in new_config:
         new_config['tolerance'] = {}
@@ -67,3 +122,64 @@ if st.button("Save Configuration", type="primary"):
     st.session_state['config'] = new_config
     st.success("Configuration updated for this session!")
     st.json(new_config)
+
+st.divider()
+st.header("🧪 What-if Sweep")
+st.caption(
+    "Evaluates a grid of settings against one candidate graph built at the widest window/tolerance, "
+    "without running a full reconciliation per setting. Split/bulk matching is not included."
+)
+
+def parse_grid(text, cast):
+    return sorted({cast(v.strip()) for v in text.split(",") if v.strip()})
+
+s1, s2 = st.columns(2)
+with s1:
+    sweep_windows = st.text_input("Date Windows (days)", "0, 1, 2, 3, 5")
+    sweep_thresholds = st.text_input("Similarity Thresholds", "0.75, 0.8, 0.85, 0.9")
+with s2:
+    sweep_ips = st.text_input("IPS Max Values (NPR)", f"5, {config.get('tolerance', {}).get('ips_max', 10.0)}, 15")
+    sweep_rtgs = st.text_input("RTGS Flat Values (NPR)", f"50, {config.get('tolerance', {}).get('rtgs_flat', 100.0)}, 200")
+
+if st.button("Run Sweep"):
+    if st.session_state.get('bank_df') is None or st.session_state.get('broker_df') is None:
+        st.error("Missing Data! Please upload files in Page 01.")
+    else:
+        from normalize.bank_normalize import normalize_bank_data
+        from normalize.broker_normalize import normalize_broker_data
+        from engine.sweep import config_grid, run_sweep
+        
+        try:
+            configs = config_grid(
+                {**config, 'similarity_enabled': sim_enabled},
+                parse_grid(sweep_windows, int),
+                parse_grid(sweep_thresholds, float),
+                parse_grid(sweep_ips, float),
+                parse_grid(sweep_rtgs, float),
+            )
+        except ValueError as e:
+            st.error(f"Invalid sweep values: {e}")
+            st.stop()
+        
+        with st.spinner(f"Evaluating {len(configs)} configurations..."):
+            sweep = run_sweep(
+                normalize_bank_data(st.session_state['bank_df']),
+                normalize_broker_data(st.session_state['broker_df']),
+                configs,
+            )
+        st.session_state['sweep_results'] = sweep
+
+if st.session_state.get('sweep_results') is not None:
+    sweep = st.session_state['sweep_results']
+    st.markdown("#### Match Rate (best over tolerance settings)")
+    st.dataframe(
+        sweep.pivot_table(index="date_window_days", columns="similarity_threshold", values="match_rate", aggfunc="max"),
+        use_container_width=True,
+    )
+    st.markdown("#### Exceptions (fewest over tolerance settings)")
+    st.dataframe(
+        sweep.pivot_table(index="date_window_days", columns="similarity_threshold", values="exceptions", aggfunc="min"),
+        use_container_width=True,
+    )
+    with st.expander("All configurations"):
+        st.dataframe(sweep.sort_values("match_rate", ascending=False), use_container_width=True)
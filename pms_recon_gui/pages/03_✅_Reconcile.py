@@ -2,13 +2,15 @@ import streamlit as st
 import pandas as pd
 import sys
 import os
+import time
+import uuid
 
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
 
-from normalize.bank_normalize import normalize_bank_data
-from normalize.broker_normalize import normalize_broker_data
-from engine.matcher import Matcher
 from utils.session import init_session
+from utils.jobs import BackgroundJob
 
 st.set_page_config(page_title="Reconcile", page_icon="✅", layout="wide")
 
@@ -16,22 +18,70 @@ init_session()
 
 st.title("✅ Run Reconciliation")
 
+# Uploads still parsing in the background -> wait, then enable the button
+parsing = [side for side, job in st.session_state['parse_jobs'].items() if job.running]
+if parsing:
+    st.info(f"⏳ Still parsing: {', '.join(parsing)}. The button enables when parsing finishes.")
+    st.button("🚀 Run Reconciliation Process", type="primary", disabled=True)
+    time.sleep(0.5)
+    st.rerun()
+
 if st.session_state.get('bank_df') is None or st.session_state.get('broker_df') is None:
     st.error("Missing Data! Please upload files in Page 01.")
     st.stop()
 
+job = st.session_state['recon_job']
+
+if job is not None and job.running:
+    info = job.info
+    eta = info.get('eta')
+    st.progress(job.fraction, text=(
+        f"Matching ({info.get('stage', 'starting')})... {job.done_units}/{job.total_units or '?'} row-steps, "
+        f"{info.get('matches', 0)} matches so far" + (f", ~{eta:.0f}s left" if eta is not None else "")
+    ))
+    if st.button("Cancel", key="cancel_recon"):
+        job.cancel()
+    time.sleep(0.5)
+    st.rerun()
+
 if st.button("🚀 Run Reconciliation Process", type="primary"):
-    with st.spinner("Normalizing data..."):
-        bank_norm = normalize_bank_data(st.session_state['bank_df'])
-        broker_norm = normalize_broker_data(st.session_state['broker_df'])
-        
-    with st.spinner("Matching records..."):
-        matcher = Matcher(bank_norm, broker_norm, st.session_state.get('config', {}))
-        results = matcher.run()
+    # Engine imports are deferred so showing previous results stays cheap
+    from engine.pipeline import reconcile_frames
+    st.session_state['recon_job'] = BackgroundJob(
+        'reconcile', reconcile_frames,
+        st.session_state['bank_df'], st.session_state['broker_df'], dict(st.session_state.get('config', {}))
+    )
+    st.rerun()
+
+if job is not None and not job.running:
+    # Collect a finished job once; its results then live in session state
+    st.session_state['recon_job'] = None
+    if job.error is not None:
+        st.error(f"Reconciliation failed: {job.error}")
+        st.code(job.error_traceback)
+    elif not job.cancelled:
+        results, matcher = job.result()
         st.session_state['results'] = results
-        st.success("Reconciliation Complete!")
+        st.session_state['results_token'] = uuid.uuid4().hex
+        st.session_state['diagnostics'] = getattr(matcher, 'diagnostics', None)
+        if matcher.cancelled:
+            st.warning(f"Reconciliation cancelled after {job.finished - job.started:.1f}s. "
+                       "Showing the matches found so far; remaining rows are listed as not reached.")
+        else:
+            st.success(f"Reconciliation Complete! ({job.finished - job.started:.1f}s)")
+        if matcher.stages_run:
+            st.caption(f"Stages re-run: {', '.join(matcher.stages_run)} (others reused from the previous run)")
+        else:
+            st.caption("All stages reused from a previous run.")
+        plans = [p for p in getattr(matcher, 'plans', dict)().values() if p is not None]
+        if plans:
+            with st.expander("Execution plan"):
+                for plan in plans:
+                    st.caption(plan.summary())
+                st.dataframe(pd.concat([plan.to_frame() for plan in plans], ignore_index=True),
+                             use_container_width=True)
 
-if 'results' in st.session_state:
+if st.session_state.get('results') is not None:
     res = st.session_state['results']
     matched = res['matched']
     unmatched = res['unmatched']
@@ -56,8 +106,51 @@ if 'results' in st.session_state:
     with tab2:
         st.dataframe(unmatched, use_container_width=True)
         
+        # Drill-down: original statement text of an unmatched bank row
+        bank_df = st.session_state.get('bank_df')
+        raws = st.session_state.get('bank_raw') or {} # source file name -> RawStatement
+        if (raws and bank_df is not None and 'raw_start' in bank_df.columns
+                and 'bank_row_id' in unmatched.columns):
+            # NaN-padded (broker rows) -> float column; labels are parser row numbers
+            bank_ids = [int(i) for i in unmatched['bank_row_id'].dropna()]
+            if bank_ids:
+                row_id = st.selectbox("🔎 Show source text of bank row", bank_ids)
+                if row_id in bank_df.index:
+                    row = bank_df.loc[row_id]
+                    raw = raws.get(row.get('source_file'))
+                    if raw is not None:
+                        st.caption(row['source_file'])
+                        st.code(raw.row_block(row), language=None)
+        
     with tab3:
         st.dataframe(partial, use_container_width=True)
         
     with tab4:
         st.dataframe(exceptions, use_container_width=True)
+
+    diagnostics = st.session_state.get('diagnostics')
+    if diagnostics is not None:
+        with st.expander("Candidate diagnostics (hot rows)"):
+            totals = diagnostics.totals()
+            d1, d2, d3 = st.columns(3)
+            d1.metric("Date-window candidates", f"{totals['date_candidates']:,}")
+            d2.metric("In-tolerance candidates", f"{totals['amount_candidates']:,}")
+            d3.metric("Fuzzy comparisons", f"{totals['fuzzy_comparisons']:,}")
+
+            histograms = diagnostics.histograms()
+            st.caption("Bank rows per candidate-count bucket")
+            st.bar_chart(diagnostics.histogram_table())
+
+            top_n = int(st.session_state['config'].get('diagnostics_top_n', 20))
+            hot_rows = diagnostics.hot_rows(top_n)
+            hot_patterns = diagnostics.hot_patterns(top_n)
+            st.caption(f"Top {top_n} bank rows by fuzzy comparisons")
+            st.dataframe(hot_rows, use_container_width=True)
+            st.caption("Narrations / amounts behind the most comparisons")
+            st.dataframe(hot_patterns, use_container_width=True)
+
+            c1, c2, c3 = st.columns(3)
+            for col, name, df in ((c1, "histograms", histograms), (c2, "hot_rows", hot_rows),
+                                  (c3, "hot_patterns", hot_patterns)):
+                col.download_button(f"Download {name}.csv", df.to_csv(index=False).encode('utf-8'),
+                                    file_name=f"{name}.csv", mime="text/csv", key=f"diag_{name}")
@@ -1,10 +1,14 @@
 import streamlit as st
-import pandas as pd
 import os
 import sys
+import tempfile
+import time
 
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
 from utils.session import init_session
+from utils.jobs import BackgroundJob
 
 st.set_page_config(page_title="Export Reports", page_icon="📤")
 
@@ -12,57 +16,114 @@ init_session()
 
 st.title("📤 Export Reports")
 
-if 'results' not in st.session_state:
+if st.session_state.get('results') is None:
     st.warning("No results found. Please run reconciliation first.")
     st.stop()
 
 res = st.session_state['results']
+config = st.session_state.get('config', {})
 
-st.markdown("Download the reconciliation reports below.")
+MIME = {
+    ".csv": "text/csv",
+    ".parquet": "application/octet-stream",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".zip": "application/zip",
+}
+LABELS = {"csv": "CSV (one file per report)", "parquet": "Parquet (one file per report)",
+          "xlsx": "Excel workbook (one sheet per report)", "zip": "Zipped bundle of CSVs"}
 
-col1, col2 = st.columns(2)
+st.markdown("Pick the formats you need and build them; files are written in the background.")
 
-def to_csv(df):
-    return df.to_csv(index=False).encode('utf-8')
+formats = st.multiselect("Formats", list(LABELS), default=["xlsx", "zip"], format_func=LABELS.get)
 
-with col1:
-    st.download_button(
-        label="Download Matched.csv",
-        data=to_csv(res['matched']),
-        file_name="matched.csv",
-        mime="text/csv",
-    )
-    st.download_button(
-        label="Download Partial.csv",
-        data=to_csv(res['partial']),
-        file_name="partial.csv",
-        mime="text/csv",
+def start_export(out_dir: str, scratch=None):
+    """scratch: TemporaryDirectory behind out_dir, removed once the files are read back."""
+    # Export engine (and openpyxl / pyarrow) only load once an export is requested
+    from utils.export import export_results
+    st.session_state['exports'] = None
+    st.session_state['export_job'] = BackgroundJob(
+        'export', export_results, res, out_dir,
+        formats=tuple(formats),
+        workers=int(config.get('export_workers', 4)),
+        chunk_rows=int(config.get('export_chunk_rows', 50000)),
+        key=(st.session_state['results_token'], out_dir, scratch),
     )
 
+def read_back(files: dict) -> dict:
+    """{format: [(file name, bytes)]} of an export's files."""
+    downloads = {}
+    for fmt, paths in files.items():
+        for path in paths:
+            with open(path, "rb") as f:
+                downloads.setdefault(fmt, []).append((os.path.basename(path), f.read()))
+    return downloads
+
+job = st.session_state['export_job']
+
+if job is not None and job.running:
+    st.progress(job.fraction, text=(
+        f"Writing {job.info.get('artifact', '...')} ({job.done_units}/{job.total_units or '?'} files)"
+    ))
+    if st.button("Cancel", key="cancel_export"):
+        job.cancel()
+    time.sleep(0.5)
+    st.rerun()
+
+col1, col2 = st.columns(2)
+with col1:
+    if st.button("Build Downloads", type="primary", disabled=not formats):
+        scratch = tempfile.TemporaryDirectory(prefix="recon_export_")
+        start_export(scratch.name, scratch)
+        st.rerun()
 with col2:
+    if st.button("Save to ./out Folder (Local Mode Only)", disabled=not formats):
+        start_export(os.path.abspath("out"))
+        st.rerun()
+
+if job is not None and not job.running:
+    # Collect a finished export once; its file list then lives in session state
+    st.session_state['export_job'] = None
+    results_token, out_dir, scratch = job.key
+    try:
+        if job.error is not None:
+            st.error(f"Export failed: {job.error}")
+        elif job.cancelled:
+            st.warning("Export cancelled.")
+        elif scratch is not None:
+            # Downloads are served from memory; the build dir goes right away
+            st.session_state['exports'] = {'results_token': results_token, 'out_dir': None,
+                                           'downloads': read_back(job.result())}
+        else:
+            st.session_state['exports'] = {'results_token': results_token, 'out_dir': out_dir,
+                                           'files': job.result()}
+    finally:
+        if scratch is not None:
+            scratch.cleanup()
+
+exports = st.session_state['exports']
+if exports is not None and exports['results_token'] != st.session_state['results_token']:
+    # Built from an earlier reconciliation run
+    st.session_state['exports'] = exports = None
+
+def download_button(fmt: str, name: str, data):
     st.download_button(
-        label="Download Unmatched.csv",
-        data=to_csv(res['unmatched']),
-        file_name="unmatched.csv",
-        mime="text/csv",
-    )
-    st.download_button(
-        label="Download Exceptions.csv",
-        data=to_csv(res['exceptions']),
-        file_name="exceptions.csv",
-        mime="text/csv",
+        label=f"Download {name}",
+        data=data,
+        file_name=name,
+        mime=MIME.get(os.path.splitext(name)[1], "application/octet-stream"),
+        key=f"download_{fmt}_{name}",
     )
 
-st.info("Files will be downloaded to your browser's default download location. To save to 'out/' folder automatically, click below (Local Mode Only).")
-
-if st.button("Save All to ./out Folder"):
-    out_dir = "out"
-    if not os.path.exists(out_dir):
-        os.makedirs(out_dir)
-        
-    res['matched'].to_csv(f"{out_dir}/matched.csv", index=False)
-    res['unmatched'].to_csv(f"{out_dir}/unmatched.csv", index=False)
-    res['partial'].to_csv(f"{out_dir}/partial.csv", index=False)
-    res['exceptions'].to_csv(f"{out_dir}/exceptions.csv", index=False)
-    
-    st.success(f"Files saved to {os.path.abspath(out_dir)}")
+if exports is not None and exports['out_dir'] is None:
+    st.success("Downloads ready.")
+    for fmt, files in exports['downloads'].items():
+        for name, data in files:
+            download_button(fmt, name, data)
+elif exports is not None:
+    st.success(f"Files saved to {exports['out_dir']}")
+    for fmt, paths in exports['files'].items():
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                download_button(fmt, os.path.basename(path), f)
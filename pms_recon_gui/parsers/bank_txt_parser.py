@@ -1,15 +1,65 @@
 import pandas as pd
+import mmap
+from datetime import date
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union
 import sys
 import os
 
-# Add project root to path for imports
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Add project root to path for imports (once, not on every Streamlit rerun)
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
 
 from utils.dates import parse_date
 from utils.refs import clean_ref_no
 
+class RawStatement:
+    """
+    Source bytes of a bank statement: an mmap of the file on disk, or the
+    uploaded bytes. Parsed rows keep only (raw_start, raw_end) byte offsets of
+    their transaction block, and the original text is sliced out on demand.
+    """
+    def __init__(self, buffer, encoding: str = "utf-8"):
+        self.buffer = buffer
+        self.encoding = encoding
+        self._file = None
+
+    @classmethod
+    def open(cls, path: str, encoding: str = "utf-8") -> "RawStatement":
+        """Memory-map a statement file (read-only). Close it when done."""
+        f = open(path, "rb")
+        try:
+            # mmap cannot map an empty file
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        except Exception:
+            f.close()
+            raise
+        raw = cls(buffer, encoding)
+        raw._file = f
+        return raw
+
+    def block(self, start: int, end: int) -> str:
+        """Exact source text of one block."""
+        return self.buffer[int(start):int(end)].decode(self.encoding, errors="replace")
+
+    def row_block(self, row) -> str:
+        """Source text of a parsed row (anything with raw_start / raw_end)."""
+        return self.block(row['raw_start'], row['raw_end'])
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 def is_start_line(line: str) -> bool:
     """
     Check if a line marks the start of a transaction.
@@ -63,65 +113,110 @@ def find_ref_candidate(tokens: List[str]) -> Optional[str]:
                  
     return None
 
-def parse_bank_block(block_lines: List[str]) -> Optional[Dict[str, Any]]:
+# Precompiled token patterns for tokenize_block
+_ASCII_DIGIT = re.compile(r'[0-9]').search
+
+def _has_digit(token: str) -> bool:
+    """any(c.isdigit() for c in token), with a regex fast path for ASCII tokens."""
+    if token.isascii():
+        return _ASCII_DIGIT(token) is not None
+    return any(c.isdigit() for c in token)
+_DATE_TOKEN = re.compile(r'(\d{2})/(\d{2})/(\d{4})').fullmatch
+
+def _token_date(token: str) -> Optional[date]:
+    """parse_date with a fast path for the DD/MM/YYYY tokens of statement headers."""
+    m = _DATE_TOKEN(token)
+    if m:
+        try:
+            return date(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+        except ValueError:
+            pass
+    return parse_date(token)
+
+_SIDE_MARKERS = ("DR", "CR")
+_NEGATIVE_AMOUNT = re.compile(r'-(.+)|(.+)-|\((.+)\)').fullmatch
+
+def signed_amount(token: str) -> Optional[float]:
     """
-    Parse a multiline block representing one transaction.
-    Line 0 is the Header line.
+    Statement amount as a float, negative for debits written as -1,000.00,
+    1,000.00- or (1,000.00). None if the token is not a number.
     """
-    if not block_lines:
+    m = _NEGATIVE_AMOUNT(token)
+    sign = 1.0
+    if m:
+        token = next(g for g in m.groups() if g is not None)
+        sign = -1.0
+    try:
+        return sign * float(token.replace(',', ''))
+    except ValueError:
         return None
-    
-    header = block_lines[0]
-    tokens = header.strip().split()
+
+def tokenize_block(block_lines: List[str]) -> Optional[Tuple[date, float, Optional[str], List[str]]]:
+    """
+    Split a block into (date, amount, ref token, text tokens) in one pass.
+    The amount is signed: debits (see signed_amount, or a trailing "DR"
+    token) are negative.
+    Same rules as find_ref_candidate / extract_amount: the first slash-ref
+    (with a digit) or CDS- token wins, else the first long (> 6) token with a
+    digit; the header contributes everything between date and amount, and
+    "~Date" / "summary" sub-lines are skipped.
+    """
+    tokens = block_lines[0].split()
     
     # 1. Date (Token 1 typically, Token 0 is Index)
-    # Pattern: "2 28/08/2025 ..."
     if len(tokens) < 2:
         return None
-        
-    date_val = parse_date(tokens[1])
-    if not date_val:
-        # Fallback: maybe Index is huge or missing? Check Token 0
-        date_val = parse_date(tokens[0])
-        
+    date_val = _token_date(tokens[1]) or _token_date(tokens[0])
     if not date_val:
         return None # Can't identify date
         
-    # 2. Amount (Last token of header)
-    amount = extract_amount(header)
-    if amount is None:
-        amount = 0.0 # Should flag error?
+    # 2. Amount (Last token of header, or the one before a trailing DR/CR marker)
+    marker = tokens[-1].upper() if len(tokens) > 3 else ""
+    if marker in _SIDE_MARKERS:
+        amount = signed_amount(tokens[-2]) or 0.0
+        if marker == "DR":
+            amount = -abs(amount)
+        amount_tokens = 2
+    else:
+        amount = signed_amount(tokens[-1])
+        if amount is None:
+            amount = 0.0 # Should flag error?
+        amount_tokens = 1
         
-    # 3. Reference & Narration
-    # We scan all tokens in Header (excluding Index, Date, Amount) 
-    # AND all tokens in sub-lines.
-    
-    all_text_tokens = []
-    
-    # Header text (skip index, date, amount)
-    # Index=0, Date=1. Amount=Last.
-    # Be careful with indices.
-    header_content = tokens[2:-1] if len(tokens) > 3 else [] 
-    all_text_tokens.extend(header_content)
-    
-    # Sublines
+    # 3. Text tokens: header (skip index, date, amount) + sub-lines, classified once
+    text_tokens = tokens[2:-amount_tokens] if len(tokens) > 2 + amount_tokens else []
     for line in block_lines[1:]:
-        sub_tokens = line.strip().split()
-        if sub_tokens:
-             # Check if this line is just a "summary" or "~Date" noise?
-             # User image has "~Date" or "summary"
-             if "~Date" in line or "summary" in line:
-                 continue
-             all_text_tokens.extend(sub_tokens)
-             
-    # Strategy: Find best Ref token, rest is Narration.
-    ref_token = find_ref_candidate(all_text_tokens)
+        if "~Date" in line or "summary" in line:
+            continue
+        text_tokens.extend(line.split())
+        
+    ref_token = long_token = None
+    for t in text_tokens:
+        if ('/' in t and _has_digit(t)) or t.startswith('CDS-'):
+            ref_token = t
+            break
+        if long_token is None and len(t) > 6 and '/' not in t and _has_digit(t):
+            long_token = t
+    if ref_token is None:
+        ref_token = long_token
+        
+    return date_val, amount, ref_token, text_tokens
+
+def parse_bank_block(block_lines: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Parse a multiline block representing one transaction.
+    Line 0 is the Header line.
+    """
+    if not block_lines:
+        return None
     
-    # If Ref found, remove it from text to form narration?
-    # Or keep it in narration too? Usually harmless.
+    tokenized = tokenize_block(block_lines)
+    if tokenized is None:
+        return None
+    date_val, amount, ref_token, text_tokens = tokenized
     
-    narration_parts = [t for t in all_text_tokens if t != ref_token]
-    narration = " ".join(narration_parts)
+    # Ref found -> the rest is Narration
+    narration = " ".join([t for t in text_tokens if t != ref_token])
     
     # Clean ref
     ref_no = clean_ref_no(ref_token) if ref_token else "UNKNOWN"
@@ -130,48 +225,165 @@ def parse_bank_block(block_lines: List[str]) -> Optional[Dict[str, Any]]:
         "txn_date": date_val,
         "ref_no": ref_no,
         "amount": amount,
+        "dr_cr": "DR" if amount < 0 else "CR",
         "narration": narration,
-        "raw_line": header # Store main line for reference
     }
 
-def parse_bank_statement(file_content: str) -> pd.DataFrame:
+def iter_lines(buffer, encoding: str = "utf-8"):
+    """Yield (start, end, text) for each line of a byte buffer; end includes the newline."""
+    pos, size = 0, len(buffer)
+    while pos < size:
+        nl = buffer.find(b"\n", pos)
+        end = size if nl == -1 else nl + 1
+        yield pos, end, buffer[pos:end].decode(encoding, errors="replace").rstrip("\r\n")
+        pos = end
+
+def split_blocks(buffer, encoding: str = "utf-8") -> List[Tuple[int, int, List[str]]]:
     """
-    Parses the content of a Bank TXT file (Block-based).
+    Group lines into transaction blocks: (start, end, lines) per block, with
+    byte offsets from the block's header line to the end of its last
+    non-blank line. Lines before the first header are ignored.
     """
-    lines = file_content.splitlines()
     blocks = []
     current_block = []
+    start = end = 0
     
-    for line in lines:
+    for line_start, line_end, line in iter_lines(buffer, encoding):
         if not line.strip():
             continue
             
         if is_start_line(line):
             # Finish previous block
             if current_block:
-                blocks.append(current_block)
+                blocks.append((start, end, current_block))
             # Start new block
             current_block = [line]
-        else:
+            start = line_start
+        elif current_block:
             # Append to current block (if active)
-            if current_block:
-                current_block.append(line)
+            current_block.append(line)
+        else:
+            continue
+        end = line_end
                 
     # Append last block
     if current_block:
-        blocks.append(current_block)
-        
-    # Process blocks
+        blocks.append((start, end, current_block))
+    return blocks
+
+# Header lines in the raw bytes, for the parallel boundary pass. Same shape as
+# is_start_line, with whitespace kept inside the line ([^\S\n]).
+BLOCK_START = re.compile(rb'^[^\S\n]*\d+[^\S\n]+\d{2}/\d{2}/\d{4}', re.MULTILINE)
+
+def find_block_starts(buffer) -> List[int]:
+    """Byte offsets of every transaction header line (one regex scan, no decoding)."""
+    return [m.start() for m in BLOCK_START.finditer(buffer)]
+
+def parse_blocks(blocks: List[Tuple[int, int, List[str]]], base: int = 0,
+                 progress=None, cancel=None) -> List[Dict[str, Any]]:
+    """parse_bank_block over split_blocks output; offsets are shifted by base."""
     data = []
-    for block in blocks:
+    total = len(blocks)
+    step = max(1, total // 100) # report ~100 times, not per block
+    for i, (start, end, block) in enumerate(blocks):
+        if i % step == 0:
+            if cancel is not None:
+                cancel.check()
+            if progress is not None:
+                progress(i, total)
         parsed = parse_bank_block(block)
         if parsed:
+            parsed['raw_start'] = base + start
+            parsed['raw_end'] = base + end
             data.append(parsed)
+    return data
+
+def _parse_chunk(task) -> List[Dict[str, Any]]:
+    """
+    Worker: parse one block-aligned byte range [start, end).
+    The range comes from the file (path, mapped again in the worker) or as bytes.
+    """
+    path, data, start, end = task
+    if path is not None:
+        with RawStatement.open(path) as raw:
+            data = raw.buffer[start:end]
+    return parse_blocks(split_blocks(data), base=start)
+
+def _parse_parallel(buffer, starts: List[int], workers: int, chunk_blocks: int, path: Optional[str] = None,
+                    progress=None, cancel=None) -> List[Dict[str, Any]]:
+    """
+    Cut the buffer at every chunk_blocks-th header and parse the chunks in a
+    spawned process pool (callers include Streamlit worker threads), in order.
+    cancel is checked while waiting on each chunk; on cancel the pool is left
+    without waiting for the chunks still running.
+    """
+    from utils.jobs import process_pool, wait_cancellable
+
+    bounds = starts[::chunk_blocks] + [len(buffer)]
+    tasks = [
+        (path, None if path else bytes(buffer[lo:hi]), lo, hi)
+        for lo, hi in zip(bounds[:-1], bounds[1:])
+    ]
+    data = []
+    pool = process_pool(workers)
+    futures = [pool.submit(_parse_chunk, task) for task in tasks]
+    try:
+        for i, future in enumerate(futures):
+            data.extend(wait_cancellable(future, cancel))
+            if progress is not None:
+                progress(min(len(starts), (i + 1) * chunk_blocks), len(starts))
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return data
+
+def parse_bank_statement(file_content: Union[str, bytes, mmap.mmap], progress=None, cancel=None,
+                         workers: int = 1, chunk_blocks: int = 5000, path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Parses the content of a Bank TXT file (Block-based).
+    file_content: text, or the raw bytes / mmap (see RawStatement). Each row
+    gets raw_start / raw_end byte offsets of its block in the UTF-8 bytes.
+    progress: optional callback(blocks_done, blocks_total)
+    cancel: optional token whose check() raises to abort between blocks
+    workers: processes for statements with more than chunk_blocks blocks
+    (None/0 = all cores). Blocks are independent, so the file is cut at
+    header lines into chunks of chunk_blocks blocks; rows keep file order.
+    path: the file behind file_content, so workers map it themselves
+    instead of receiving copies of the bytes.
+    df.attrs['parse_stats'] holds {"blocks", "rejected_blocks"}: blocks found
+    and blocks parse_bank_block returned None for.
+    """
+    if isinstance(file_content, str):
+        file_content = file_content.encode("utf-8")
+
+    workers = workers if workers else (os.cpu_count() or 1)
+    starts = find_block_starts(file_content) if workers > 1 else []
+    if len(starts) > chunk_blocks:
+        data = _parse_parallel(file_content, starts, min(workers, -(-len(starts) // chunk_blocks)),
+                               chunk_blocks, path, progress, cancel)
+        total = len(starts)
+    else:
+        blocks = split_blocks(file_content)
+        data = parse_blocks(blocks, progress=progress, cancel=cancel)
+        total = len(blocks)
+        if progress is not None:
+            progress(len(blocks), len(blocks))
             
     df = pd.DataFrame(data)
     if not df.empty:
         df['txn_date'] = pd.to_datetime(df['txn_date']).dt.date
         df['amount'] = df['amount'].astype(float)
         df['ref_no'] = df['ref_no'].astype(str)
+        df['raw_start'] = df['raw_start'].astype('int64')
+        df['raw_end'] = df['raw_end'].astype('int64')
+    df.attrs['parse_stats'] = {"blocks": total, "rejected_blocks": total - len(data)}
         
     return df
+
+def parse_bank_file(path: str, progress=None, cancel=None, workers: int = 1,
+                    chunk_blocks: int = 5000) -> pd.DataFrame:
+    """Parse a statement file through an mmap (no full read into a str)."""
+    with RawStatement.open(path) as raw:
+        return parse_bank_statement(raw.buffer, progress=progress, cancel=cancel,
+                                    workers=workers, chunk_blocks=chunk_blocks, path=path)
@@ -1,12 +1,13 @@
-import pdfplumber
 import pandas as pd
 import re
 import sys
 import os
 from typing import Optional
 
-# Add project root to path for imports
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Add project root to path for imports (once, not on every Streamlit rerun)
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
 
 from utils.dates import parse_date
 
@@ -15,6 +16,8 @@ def get_raw_pdf_tables(pdf_path: str):
     Returns the raw tables extracted by pdfplumber without any processing.
     Used for debugging.
     """
+    import pdfplumber # heavy (pdfminer); only load when a PDF is actually parsed
+    
     all_rows = []
     with pdfplumber.open(pdf_path) as pdf:
         for page in pdf.pages:
@@ -52,14 +55,24 @@ def extract_ref_from_particulars(particulars: str) -> Optional[str]:
         return match.group(1).strip()
     return None
 
-def parse_broker_pdf(pdf_path: str) -> pd.DataFrame:
+def parse_broker_pdf(pdf_path, progress=None, cancel=None) -> pd.DataFrame:
     """
     Parse Broker PDF using pdfplumber.
+    pdf_path: path or binary file-like object
+    progress: optional callback(pages_done, pages_total)
+    cancel: optional token whose check() raises to abort between pages
     """
+    import pdfplumber # heavy (pdfminer); only load when a PDF is actually parsed
+    
     rows = []
     
     with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
+        total_pages = len(pdf.pages)
+        for page_no, page in enumerate(pdf.pages):
+            if cancel is not None:
+                cancel.check()
+            if progress is not None:
+                progress(page_no, total_pages)
             tables = page.extract_tables()
             for table in tables:
                 # Append raw rows
@@ -68,6 +81,9 @@ def parse_broker_pdf(pdf_path: str) -> pd.DataFrame:
                     clean_row = [str(cell).replace('\n', ' ').strip() if cell else '' for cell in row]
                     rows.append(clean_row)
 
+        if progress is not None:
+            progress(total_pages, total_pages)
+
     # Convert all gathered rows to DataFrame
     df = pd.DataFrame(rows)
     
@@ -102,6 +118,7 @@ def parse_broker_pdf(pdf_path: str) -> pd.DataFrame:
     
     # Post-processing
     final_data = []
+    skipped = 0
     
     for idx, row in df.iterrows():
         # Skip header repetition or empty
@@ -113,6 +130,7 @@ def parse_broker_pdf(pdf_path: str) -> pd.DataFrame:
              particulars = str(row['particulars'])
         
         if not particulars:
+            skipped += 1
             continue
             
         # Parse Amount
@@ -154,6 +172,7 @@ def parse_broker_pdf(pdf_path: str) -> pd.DataFrame:
         # Add to list
         # Filter out rows that are just headers or junk
         if not txn_date and credit == 0 and debit == 0:
+            skipped += 1
             continue
             
         final_data.append({
@@ -167,5 +186,11 @@ def parse_broker_pdf(pdf_path: str) -> pd.DataFrame:
     res_df = pd.DataFrame(final_data)
     # Filter rows with no meaningful amount
     res_df = res_df[(res_df['debit'] != 0) | (res_df['credit'] != 0)]
+    # Read by the metrics export (utils.metrics)
+    res_df.attrs['parse_stats'] = {
+        "table_rows": len(df),
+        "skipped_rows": skipped,
+        "zero_amount_rows": len(final_data) - len(res_df),
+    }
     
     return res_df
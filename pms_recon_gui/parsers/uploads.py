@@ -0,0 +1,90 @@
+import io
+import sys
+import os
+from typing import List, Tuple
+
+# Add project root to path for imports (once, not on every Streamlit rerun)
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+def parse_bank_upload(raw: bytes, progress=None, cancel=None, workers: int = 1, chunk_blocks: int = 5000):
+    """
+    Parse uploaded bank TXT bytes (UTF-8). Signature fits utils.jobs.BackgroundJob.
+    Rows carry byte offsets into raw; wrap it in RawStatement for drill-down.
+    Large statements are parsed in `workers` processes (see parse_bank_statement).
+    """
+    from parsers.bank_txt_parser import parse_bank_statement
+    return parse_bank_statement(raw, progress=progress, cancel=cancel, workers=workers, chunk_blocks=chunk_blocks)
+
+def parse_broker_upload(raw: bytes, progress=None, cancel=None):
+    """Parse uploaded broker PDF bytes in memory (no temp file needed)."""
+    from parsers.broker_pdf_parser import parse_broker_pdf
+    return parse_broker_pdf(io.BytesIO(raw), progress=progress, cancel=cancel)
+
+# Bookkeeping columns that do not identify a transaction
+PROVENANCE_COLUMNS = ("source_file", "raw_start", "raw_end")
+
+def merge_parsed(frames: List[Tuple[str, "pd.DataFrame"]]) -> Tuple["pd.DataFrame", int]:
+    """
+    Concatenate parsed files in order, tagging rows with source_file, and drop
+    rows repeated across files (overlapping statement periods).
+    Rows are identified by a content hash of their parsed fields. A row seen
+    n times in one file and m times in another is kept max(n, m) times, so
+    genuine repeats inside one statement survive.
+    Returns (merged frame, rows dropped).
+    """
+    import numpy as np
+    import pandas as pd
+
+    parts = [df.assign(source_file=name) for name, df in frames if df is not None and not df.empty]
+    if not parts:
+        return pd.DataFrame(), 0
+    file_no = pd.Series(np.repeat(np.arange(len(parts)), [len(p) for p in parts]))
+    merged = pd.concat(parts, ignore_index=True)
+
+    content = [c for c in merged.columns if c not in PROVENANCE_COLUMNS]
+    hashes = pd.util.hash_pandas_object(merged[content], index=False).reset_index(drop=True)
+    # (hash, n-th occurrence within its own file) is unique per transaction
+    occurrence = hashes.groupby([file_no, hashes]).cumcount()
+    duplicate = pd.DataFrame({'hash': hashes, 'occurrence': occurrence}).duplicated()
+
+    dropped = int(duplicate.sum())
+    return merged[~duplicate.to_numpy()].reset_index(drop=True), dropped
+
+def parse_uploads(files: List[Tuple[str, bytes]], parse_fn, progress=None, cancel=None,
+                  file_workers: int = 0, **options) -> Tuple["pd.DataFrame", int]:
+    """
+    Parse several uploads of one side with parse_fn(raw, **options) and merge
+    them with merge_parsed. Signature fits utils.jobs.BackgroundJob.
+    One file is parsed here with its own progress reporting; several are
+    parsed one per spawned process (file_workers, 0 = all cores), progress
+    in files; cancel is checked while waiting on each file.
+    Returns (merged frame, duplicate rows dropped).
+    """
+    if len(files) == 1:
+        name, raw = files[0]
+        return merge_parsed([(name, parse_fn(raw, progress=progress, cancel=cancel, **options))])
+
+    from utils.jobs import process_pool, wait_cancellable
+
+    if 'workers' in options:
+        options = {**options, 'workers': 1} # files are the unit of parallelism here
+    workers = min(len(files), file_workers or os.cpu_count() or 1)
+    frames = []
+    pool = process_pool(workers)
+    futures = [pool.submit(parse_fn, raw, **options) for _, raw in files]
+    try:
+        for i, ((name, _), future) in enumerate(zip(files, futures)):
+            if progress is not None:
+                progress(i, len(files))
+            # Checks cancel while a large file is still parsing, not only between files
+            frames.append((name, wait_cancellable(future, cancel)))
+    except BaseException:
+        # Return at once: queued files are dropped, running ones finish in the background
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    if progress is not None:
+        progress(len(files), len(files))
+    return merge_parsed(frames)
@@ -0,0 +1,352 @@
+"""
+Local reconciliation service: a JSON job API in front of a pool of warm
+worker processes that have the parsers, pdfplumber, rapidfuzz and the
+Matcher imported and config.yml loaded before the first job arrives.
+
+    python service.py [--port 8765 | --socket /tmp/recon.sock] [--workers 4] [--max-pending 64]
+
+Endpoints (JSON in / out):
+    POST   /jobs               {"kind": "parse", "side": "bank"|"broker", "paths": [...]}
+                               {"kind": "reconcile", "bank_paths": [...], "broker_paths": [...],
+                                "config": {...overrides}, "out_dir": "optional/dir"}
+                               -> 202 {"job_id": ...}, 429 when max-pending jobs are queued,
+                               415 unless Content-Type is application/json
+    GET    /jobs               status of every known job
+    GET    /jobs/<id>          status of one job
+    GET    /jobs/<id>/result   result once done (409 while queued/running)
+    DELETE /jobs/<id>          cancel a job that has not started yet
+    GET    /health             worker count and queue depth
+Paths are read by the service itself, so it is meant for localhost use only.
+"config" may only override the matching settings in OVERRIDABLE_KEYS (no
+file locations), and "out_dir" is resolved inside --out-root (jobs may not
+write results unless the service was started with one).
+"""
+import argparse
+import copy
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.abspath(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+# --- Worker side -------------------------------------------------------------
+
+# Config loaded once per worker process by _warm_worker
+_WORKER_CONFIG = {}
+
+def _warm_worker(config_path):
+    """Pool initializer: pay the import and config cost once per process."""
+    global _WORKER_CONFIG
+    import pandas # noqa: F401
+    import rapidfuzz # noqa: F401
+    import pdfplumber # noqa: F401
+    import engine.pipeline # noqa: F401 (Matcher, normalizers, parsers)
+    import parsers.bank_txt_parser # noqa: F401
+    import parsers.broker_pdf_parser # noqa: F401
+    from normalize.common import enable_copy_on_write
+    from utils.config import load_config
+    enable_copy_on_write()
+    _WORKER_CONFIG = load_config(config_path)
+
+def _ping() -> int:
+    return os.getpid()
+
+# Config keys a job may override: matching settings only, nothing that names a file or directory
+OVERRIDABLE_KEYS = frozenset({
+    'date_window_days', 'similarity_enabled', 'similarity_threshold', 'fuzzy_engine',
+    'ngram_top_k', 'ngram_size', 'ngram_block_size', 'subset_enabled', 'subset_max_items',
+    'subset_max_pool', 'tolerance', 'calendar', 'match_sides', 'match_chunk_size', 'planner',
+})
+
+def _job_config(overrides: dict) -> dict:
+    # Jobs are the unit of parallelism here: no nested parse pools inside a worker
+    config = copy.deepcopy(_WORKER_CONFIG)
+    config['bank_parse_workers'] = 1
+    config.update(overrides)
+    return config
+
+def _frame_records(df) -> list:
+    return json.loads(df.to_json(orient="records", date_format="iso", default_handler=str))
+
+def _parse_job(side: str, paths: list, overrides: dict) -> dict:
+    from engine.pipeline import parse_files
+    from utils.metrics import run_metrics
+
+    config = _job_config(overrides)
+    with run_metrics("parse", config, side=side) as metrics:
+        df, dropped = parse_files(side, paths, config, metrics=metrics)
+    return {"rows": len(df), "duplicates_dropped": dropped, "records": _frame_records(df)}
+
+def _reconcile_job(bank_paths: list, broker_paths: list, overrides: dict, out_dir: str = None) -> dict:
+    from engine.pipeline import reconcile_files, write_results
+    from utils.metrics import run_metrics
+
+    config = _job_config(overrides)
+    with run_metrics("reconcile", config) as metrics:
+        # Each worker keeps its own stage cache, so repeated runs on the same files are cheap
+        results, matcher = reconcile_files(bank_paths, broker_paths, config, metrics=metrics)
+        payload = {
+            "summary": {name: len(df) for name, df in results.items()},
+            "stages_run": matcher.stages_run,
+            "results": {name: _frame_records(df) for name, df in results.items()},
+        }
+        if out_dir:
+            with metrics.stage("export"):
+                payload["files"] = write_results(results, out_dir, config=config)
+    return payload
+
+# --- Service side ------------------------------------------------------------
+
+class JobService:
+    """
+    Job table over a ProcessPoolExecutor of warm workers.
+    At most max_pending jobs may be queued or running; finished jobs are
+    kept (oldest dropped first) up to keep_finished.
+    """
+    def __init__(self, workers: int = None, max_pending: int = 64, keep_finished: int = 500,
+                 config_path: str = None, out_root: str = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.out_root = os.path.realpath(out_root) if out_root else None
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_warm_worker, initargs=(config_path,)
+        )
+        self.jobs = {}
+        # Re-entrant: a future that is already done runs its callback inside submit()
+        self._lock = threading.RLock()
+
+    def warm_up(self):
+        """Start every worker now rather than on the first jobs."""
+        for future in [self.pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(1 for job in self.jobs.values() if not job["future"].done())
+
+    def _overrides(self, request: dict) -> dict:
+        overrides = request.get("config") or {}
+        if not isinstance(overrides, dict):
+            raise ValueError("config must be an object")
+        refused = sorted(set(overrides) - OVERRIDABLE_KEYS)
+        if refused:
+            raise ValueError(f"config keys not overridable per job: {', '.join(refused)}")
+        return overrides
+
+    def _out_dir(self, out_dir):
+        """out_dir resolved inside out_root (ValueError outside it, or without an out_root)."""
+        if not out_dir:
+            return None
+        if self.out_root is None:
+            raise ValueError("out_dir needs the service to be started with --out-root")
+        path = os.path.realpath(os.path.join(self.out_root, str(out_dir)))
+        if os.path.commonpath([path, self.out_root]) != self.out_root:
+            raise ValueError(f"out_dir must be inside the service's out root: {out_dir!r}")
+        return path
+
+    def submit(self, request: dict) -> str:
+        kind = request.get("kind")
+        if kind == "parse":
+            if request.get("side") not in ("bank", "broker"):
+                raise ValueError("parse jobs need side: 'bank' or 'broker'")
+            fn, args = _parse_job, (request["side"], list(request.get("paths") or []), self._overrides(request))
+            if not args[1]:
+                raise ValueError("parse jobs need paths")
+        elif kind == "reconcile":
+            bank_paths = list(request.get("bank_paths") or [])
+            broker_paths = list(request.get("broker_paths") or [])
+            if not bank_paths or not broker_paths:
+                raise ValueError("reconcile jobs need bank_paths and broker_paths")
+            fn, args = _reconcile_job, (bank_paths, broker_paths, self._overrides(request),
+                                        self._out_dir(request.get("out_dir")))
+        else:
+            raise ValueError(f"Unknown job kind: {kind!r} (expected 'parse' or 'reconcile')")
+
+        with self._lock:
+            if self.pending() >= self.max_pending:
+                raise OverflowError(f"{self.max_pending} jobs already pending")
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {
+                "id": job_id, "kind": kind, "submitted": time.time(), "finished": None,
+                "future": self.pool.submit(fn, *args),
+            }
+            self.jobs[job_id]["future"].add_done_callback(lambda _f, j=job_id: self._finished(j))
+            self._trim()
+        return job_id
+
+    def _finished(self, job_id: str):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job["finished"] = time.time()
+
+    def _job(self, job_id: str) -> dict:
+        """The job's entry (KeyError if unknown or dropped from the finished-job history)."""
+        with self._lock:
+            return self.jobs[job_id]
+
+    def _trim(self):
+        """Drop the oldest finished jobs beyond keep_finished (caller holds the lock)."""
+        done = [j for j in self.jobs.values() if j["future"].done()]
+        for job in sorted(done, key=lambda j: j["submitted"])[:max(0, len(done) - self.keep_finished)]:
+            del self.jobs[job["id"]]
+
+    def all_status(self) -> list:
+        with self._lock:
+            job_ids = list(self.jobs)
+        out = []
+        for job_id in job_ids:
+            try:
+                out.append(self.status(job_id))
+            except KeyError: # dropped meanwhile
+                pass
+        return out
+
+    def status(self, job_id: str) -> dict:
+        with self._lock:
+            job = dict(self.jobs[job_id])
+        future = job["future"]
+        if future.cancelled():
+            state = "cancelled"
+        elif future.done():
+            state = "failed" if future.exception() is not None else "done"
+        else:
+            state = "running" if future.running() else "queued"
+        out = {"id": job_id, "kind": job["kind"], "status": state,
+               "submitted": job["submitted"], "finished": job["finished"]}
+        if state == "failed":
+            exc = future.exception()
+            out["error"] = f"{type(exc).__name__}: {exc}"
+            out["traceback"] = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+        return out
+
+    def result(self, job_id: str):
+        return self._job(job_id)["future"].result(timeout=0)
+
+    def cancel(self, job_id: str) -> bool:
+        return self._job(job_id)["future"].cancel()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    service: JobService = None # set on the server-specific subclass
+
+    def address_string(self):
+        # Unix sockets have no peer address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def _send(self, code: int, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_path(self):
+        """('<id>', tail) for /jobs/<id>[/tail], else None."""
+        parts = self.path.strip("/").split("/")
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            return parts[1], (parts[2] if len(parts) == 3 else "")
+        return None
+
+    def do_GET(self):
+        service = self.service
+        if self.path.rstrip("/") == "/health":
+            return self._send(200, {"workers": service.workers, "pending": service.pending(),
+                                    "max_pending": service.max_pending})
+        if self.path.rstrip("/") == "/jobs":
+            return self._send(200, service.all_status())
+        target = self._job_path()
+        if target is None or target[1] not in ("", "result"):
+            return self._send(404, {"error": "not found"})
+        job_id, tail = target
+        try:
+            status = service.status(job_id)
+        except KeyError: # unknown, or dropped from the finished-job history
+            return self._send(404, {"error": "not found"})
+        if tail == "":
+            return self._send(200, status)
+        if status["status"] in ("queued", "running"):
+            return self._send(409, status)
+        if status["status"] != "done":
+            return self._send(410 if status["status"] == "cancelled" else 500, status)
+        return self._send(200, {**status, "result": service.result(job_id)})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self._send(404, {"error": "not found"})
+        # Browsers cannot send this content type cross-site without a CORS preflight (which is never answered)
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            return self._send(415, {"error": "Content-Type must be application/json"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            job_id = self.service.submit(request)
+        except OverflowError as exc:
+            return self._send(429, {"error": str(exc)})
+        except (ValueError, TypeError, KeyError) as exc:
+            return self._send(400, {"error": str(exc)})
+        return self._send(202, {"job_id": job_id})
+
+    def do_DELETE(self):
+        target = self._job_path()
+        if target is None or target[1]:
+            return self._send(404, {"error": "not found"})
+        try:
+            cancelled = self.service.cancel(target[0])
+            status = self.service.status(target[0])
+        except KeyError:
+            return self._send(404, {"error": "not found"})
+        return self._send(200 if cancelled else 409, status)
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def make_server(service: JobService, host: str = "127.0.0.1", port: int = 8765, socket_path: str = None):
+    handler = type("BoundJobRequestHandler", (JobRequestHandler,), {"service": service})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", dest="socket_path", help="serve on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=0, help="warm worker processes (0 = all cores)")
+    parser.add_argument("--max-pending", type=int, default=64, help="queued + running jobs before 429")
+    parser.add_argument("--config", dest="config_path", help="config.yml for the workers")
+    parser.add_argument("--out-root", help="directory reconcile jobs' out_dir is resolved in (default: no out_dir)")
+    args = parser.parse_args(argv)
+
+    service = JobService(args.workers or None, args.max_pending, config_path=args.config_path,
+                         out_root=args.out_root)
+    service.warm_up()
+    server = make_server(service, args.host, args.port, args.socket_path)
+    where = args.socket_path or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Reconciliation service on {where} with {service.workers} warm workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import pytest
+import pandas as pd
 from datetime import date
 import sys
 import os
@@ -47,3 +48,94 @@ def test_multiple_blocks():
     assert df.iloc[0]['amount'] == 100.00
     assert df.iloc[1]['amount'] == 200.00
     assert "Narration2" in df.iloc[1]['narration']
+
+def test_rows_point_to_raw_blocks(tmp_path):
+    from parsers.bank_txt_parser import RawStatement, parse_bank_file
+    
+    content = (
+        "Statement header\n"
+        "2    28/08/2025    478322208/12390    1,046,729.56\n"
+        "     BNKFT-PMS\n"
+        "\n"
+        "3    29/08/2025    Ref2/1        200.00\n"
+    )
+    path = tmp_path / "statement.TXT"
+    path.write_text(content, encoding="utf-8")
+    
+    df = parse_bank_file(str(path))
+    assert 'raw_line' not in df.columns
+    with RawStatement.open(str(path)) as raw:
+        assert raw.row_block(df.iloc[0]) == (
+            "2    28/08/2025    478322208/12390    1,046,729.56\n"
+            "     BNKFT-PMS\n"
+        )
+        assert raw.row_block(df.iloc[1]) == "3    29/08/2025    Ref2/1        200.00\n"
+    
+    # Same offsets when parsing the bytes / text directly
+    assert list(parse_bank_statement(content)['raw_start']) == list(df['raw_start'])
+
+def test_parallel_parse_matches_serial(tmp_path):
+    from parsers.bank_txt_parser import parse_bank_file, find_block_starts
+    
+    lines = ["Statement header"]
+    for i in range(40):
+        lines.append(f"{i + 1}    {1 + i % 28:02d}/08/2025    REF{i:04d}/1    {100 + i}.00")
+        if i % 3 == 0:
+            lines.append(f"     NARR-{i}")
+        if i % 5 == 0:
+            lines.append("")
+    content = "\n".join(lines) + "\n"
+    path = tmp_path / "statement.TXT"
+    path.write_text(content, encoding="utf-8")
+    
+    assert len(find_block_starts(content.encode())) == 40
+    serial = parse_bank_statement(content)
+    parallel = parse_bank_file(str(path), workers=2, chunk_blocks=7)
+    in_memory = parse_bank_statement(content.encode(), workers=2, chunk_blocks=7)
+    pd.testing.assert_frame_equal(serial, parallel)
+    pd.testing.assert_frame_equal(serial, in_memory)
+
+def test_parallel_parse_can_be_cancelled():
+    from utils.jobs import CancelToken, JobCancelled
+    
+    content = "".join(f"{i + 1}    01/08/2025    REF{i:04d}/1    {100 + i}.00\n" for i in range(40))
+    token = CancelToken()
+    seen = []
+    def progress(done, total):
+        seen.append(done)
+        token.cancel() # after the first chunk
+    with pytest.raises(JobCancelled):
+        parse_bank_statement(content, workers=2, chunk_blocks=7, progress=progress, cancel=token)
+    assert seen == [7]
+
+@pytest.mark.parametrize("tokens", [
+    ["BNKFT-PMS", "478322208/12390"],
+    ["Narration2", "CDS-215769794"],
+    ["7201251101CZ", "PMS-CIPS"],
+    ["A/B", "ABCDEFG", "ABCDEF1"],
+    ["Share", "apply:", "JHEL", ":", "10"],
+])
+def test_tokenizer_ref_priority_matches_find_ref_candidate(tokens):
+    from parsers.bank_txt_parser import tokenize_block, find_ref_candidate
+    
+    header = "2    28/08/2025    " + " ".join(tokens) + "    5.00"
+    txn_date, amount, ref_token, text_tokens = tokenize_block([header, "     ~Date 01/01/2025"])
+    assert txn_date == date(2025, 8, 28)
+    assert amount == 5.00
+    assert text_tokens == tokens
+    assert ref_token == find_ref_candidate(tokens)
+
+@pytest.mark.parametrize("amount_text, amount, dr_cr", [
+    ("1,000.00", 1000.0, "CR"),
+    ("-1,000.00", -1000.0, "DR"),
+    ("1,000.00-", -1000.0, "DR"),
+    ("(1,000.00)", -1000.0, "DR"),
+    ("1,000.00    DR", -1000.0, "DR"),
+    ("1,000.00    CR", 1000.0, "CR"),
+])
+def test_signed_amounts(amount_text, amount, dr_cr):
+    content = f"2    28/08/2025    478322208/12390    {amount_text}\n"
+    row = parse_bank_statement(content).iloc[0]
+    assert row['amount'] == amount
+    assert row['dr_cr'] == dr_cr
+    assert row['ref_no'] == "478322208"
@@ -0,0 +1,51 @@
+import sys
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.business_days import BusinessCalendar
+from engine.rules import within_date_window
+from engine.matcher import Matcher
+
+def test_ordinals_skip_weekends_and_holidays():
+    cal = BusinessCalendar(["sat", "sun"], ["2025-09-03"])
+    fri, sat, mon = date(2025, 8, 29), date(2025, 8, 30), date(2025, 9, 1)
+    assert cal.gap(fri, mon) == 1
+    assert cal.gap(date(2025, 9, 2), date(2025, 9, 4)) == 1 # across the holiday
+    ords = cal.ordinals([sat, mon, None])
+    assert ords[0] == ords[1] and np.isnan(ords[2]) # weekend rolls to the next business day
+    assert not cal.is_business_day(sat) and cal.is_business_day(mon)
+    
+    # Dates far outside the first table extend it without changing earlier ordinals
+    before = cal.ordinals([fri])[0]
+    cal.ordinals([date(2031, 1, 1)])
+    assert cal.ordinals([fri])[0] == before
+
+def test_window_check_uses_calendar():
+    cal = BusinessCalendar(["saturday"])
+    fri, sun = date(2025, 8, 29), date(2025, 8, 31)
+    assert not within_date_window(fri, sun, 1)
+    assert within_date_window(fri, sun, 1, calendar=cal)
+
+def test_unknown_weekday_rejected():
+    with pytest.raises(ValueError):
+        BusinessCalendar(["funday"])
+
+def test_matcher_window_counts_business_days():
+    bank = pd.DataFrame([(date(2025, 9, 1), "X", 500.0, "CR", "Deposit")],
+                        columns=["txn_date", "ref_no", "amount", "dr_cr", "narration"])
+    broker = pd.DataFrame([(date(2025, 8, 29), "Y", 500.0, 0.0, "Receipt")],
+                          columns=["txn_date", "transaction_ref", "credit", "debit", "particulars"])
+    config = {'date_window_days': 1, 'similarity_enabled': False, 'subset_enabled': False}
+    
+    calendar_days = Matcher(bank, broker, config, cache=None).run()
+    assert calendar_days['matched'].empty and calendar_days['partial'].empty
+    
+    business = {**config, 'calendar': {'enabled': True, 'weekend_days': ['saturday', 'sunday']}}
+    res = Matcher(bank, broker, business, cache=None).run()
+    assert res['partial'].iloc[0]['broker_row_id'] == 0
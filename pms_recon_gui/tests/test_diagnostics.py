@@ -0,0 +1,73 @@
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from engine.matcher import Matcher, TwoSidedMatcher
+
+CONFIG = {
+    'date_window_days': 2,
+    'similarity_enabled': True,
+    'similarity_threshold': 0.85,
+    'fuzzy_engine': 'pairwise',
+    'subset_enabled': False,
+    'memo': {'enabled': False},
+    'tolerance': {'ips_max': 10.0, 'rtgs_flat': 100.0, 'rtgs_threshold': 2000000.0},
+}
+
+def ledgers():
+    # Five identical "CASH DEPOSIT 100000" rows against six same-amount receipts: a hot pattern
+    day = date(2025, 8, 28)
+    bank = pd.DataFrame({
+        "txn_date": [day] * 5 + [date(2025, 8, 1), date(2025, 9, 20)],
+        "ref_no": ["UNKNOWN"] * 5 + ["478322208", "R2"],
+        "amount": [100000.0] * 5 + [750.0, 42.0],
+        "dr_cr": "CR",
+        "narration": ["CASH DEPOSIT"] * 5 + ["BNKFT-PMS", "Nothing"],
+    })
+    broker = pd.DataFrame({
+        "txn_date": [day] * 6 + [date(2025, 8, 1)],
+        "transaction_ref": [f"X{i}" for i in range(6)] + ["478322208"],
+        "credit": [100000.0] * 6 + [750.0],
+        "debit": 0.0,
+        "particulars": [f"receipt client {i}" for i in range(6)] + ["Received"],
+    })
+    return bank, broker
+
+def test_counts_per_bank_row():
+    bank, broker = ledgers()
+    matcher = Matcher(bank, broker, CONFIG, cache=None)
+    matcher.run()
+    rows = matcher.diagnostics.rows.set_index('bank_row_id')
+
+    assert rows.loc[0, 'date_candidates'] == 6 and rows.loc[0, 'amount_candidates'] == 6
+    assert rows.loc[5, 'date_candidates'] == 1 and rows.loc[5, 'match_type'] == 'EXACT'
+    assert rows.loc[6, 'date_candidates'] == 0 and pd.isna(rows.loc[6, 'match_type'])
+    # Ambiguous amounts go to fuzzy, which scores every free receipt and finds none similar
+    assert rows.loc[0, 'fuzzy_comparisons'] == 6
+    assert rows.loc[[5, 6], 'fuzzy_comparisons'].sum() == 0
+
+def test_hot_rows_patterns_histograms_and_export(tmp_path):
+    bank, broker = ledgers()
+    matcher = TwoSidedMatcher(bank, broker, CONFIG, cache=None)
+    matcher.run()
+    diagnostics = matcher.diagnostics
+
+    assert diagnostics.totals()['fuzzy_comparisons'] == 30
+    assert set(diagnostics.hot_rows(3)['bank_row_id']) <= {0, 1, 2, 3, 4}
+    patterns = diagnostics.hot_patterns()
+    top = patterns[patterns['kind'] == 'narration'].iloc[0]
+    assert top['value'] == "CASH DEPOSIT" and top['share_of_fuzzy'] == 1.0
+
+    hist = diagnostics.histograms()
+    fuzzy = hist[hist['metric'] == 'fuzzy_comparisons'].set_index('bucket')['rows']
+    assert fuzzy.to_dict() == {"0": 2, "4-7": 5}
+    assert list(diagnostics.histogram_table().index) == ["0", "1", "4-7"]
+
+    paths = diagnostics.export(str(tmp_path), top_n=2)
+    assert sorted(os.path.basename(p) for p in paths) == [
+        "candidates.csv", "histograms.csv", "hot_patterns.csv", "hot_rows.csv"]
+    assert len(pd.read_csv(tmp_path / "hot_rows.csv")) == 2
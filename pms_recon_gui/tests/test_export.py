@@ -0,0 +1,78 @@
+import io
+import os
+import sys
+import zipfile
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from engine.exceptions import ExceptionCode
+from utils.export import _flat, export_results, write_csv
+from utils.jobs import BackgroundJob, CancelToken, JobCancelled
+
+def sample_results(n=25):
+    matched = pd.DataFrame({
+        "match_id": [f"m{i}" for i in range(n)],
+        "bank_row_id": [[i, i + 1] if i % 5 == 0 else i for i in range(n)],
+        "date": pd.date_range("2025-08-01", periods=n),
+        "bank_amount": [100.0 + i for i in range(n)],
+    })
+    matched.loc[3, "date"] = pd.NaT
+    exceptions = pd.DataFrame({"code": [ExceptionCode.REF_MISMATCH], "description": ["Ref mismatch"]})
+    return {"matched": matched, "unmatched": pd.DataFrame(), "partial": matched.head(2), "exceptions": exceptions}
+
+def test_chunked_csv_matches_single_write():
+    df = sample_results()["matched"]
+    buf = io.StringIO()
+    write_csv(df, buf, chunk_rows=4)
+    expected = df.assign(bank_row_id=df["bank_row_id"].map(str)).to_csv(index=False)
+    assert buf.getvalue() == expected
+    # Group ids make the whole id column text, not text mixed with ints
+    assert {type(v) for v in _flat(df)["bank_row_id"]} == {str}
+
+def test_export_csv_xlsx_and_bundle(tmp_path):
+    from openpyxl import load_workbook
+
+    results = sample_results()
+    job = BackgroundJob('export', export_results, results, str(tmp_path),
+                        formats=("csv", "xlsx", "zip"), chunk_rows=7)
+    written = job.result()
+
+    assert [os.path.basename(p) for p in written["csv"]] == [
+        "matched.csv", "partial.csv", "unmatched.csv", "exceptions.csv"]
+    assert job.done_units == job.total_units == 6
+    assert pd.read_csv(tmp_path / "matched.csv")["bank_amount"].tolist() == results["matched"]["bank_amount"].tolist()
+    assert pd.read_csv(tmp_path / "exceptions.csv")["code"].tolist() == ["E-003"]
+
+    wb = load_workbook(written["xlsx"][0], read_only=True)
+    assert wb.sheetnames == ["matched", "partial", "unmatched", "exceptions"]
+    rows = list(wb["matched"].values)
+    assert rows[0] == ("match_id", "bank_row_id", "date", "bank_amount")
+    assert len(rows) == 26 and rows[1][1] == "[0, 1]" and rows[4][2] is None
+
+    with zipfile.ZipFile(written["zip"][0]) as zf:
+        assert sorted(zf.namelist()) == sorted(
+            ["matched.csv", "partial.csv", "unmatched.csv", "exceptions.csv", "reconciliation.xlsx"])
+        assert zf.read("matched.csv").decode() == (tmp_path / "matched.csv").read_text()
+
+def test_parquet_round_trip_with_group_ids(tmp_path):
+    pytest.importorskip("pyarrow")
+    results = sample_results()
+    written = export_results(results, str(tmp_path), formats=("parquet",), chunk_rows=7)
+    back = pd.read_parquet(written["parquet"][0])
+    # SPLIT / BULK groups next to 1:1 ids: one text column
+    assert back["bank_row_id"].tolist()[:2] == ["[0, 1]", "1"]
+    assert back["bank_amount"].tolist() == results["matched"]["bank_amount"].tolist()
+
+def test_cancelled_export_removes_its_files(tmp_path):
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(JobCancelled):
+        export_results(sample_results(), str(tmp_path), formats=("csv", "xlsx"), cancel=token)
+    assert os.listdir(tmp_path) == []
+
+def test_unknown_format_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        export_results(sample_results(), str(tmp_path), formats=("pdf",))
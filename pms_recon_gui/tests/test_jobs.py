@@ -0,0 +1,75 @@
+import pytest
+import threading
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.jobs import BackgroundJob, JobCancelled
+from parsers.uploads import parse_bank_upload
+
+def test_bank_parse_job_reports_progress():
+    content = b"""
+    2    28/08/2025    478322208/12390    1,046,729.56
+         BNKFT-PMS
+    3    29/08/2025    Ref2/1        200.00
+    """
+    job = BackgroundJob('bank', parse_bank_upload, content)
+    df = job.result()
+    
+    assert len(df) == 2
+    assert job.done_units == job.total_units == 2
+    assert job.fraction == 1.0
+    assert not job.running and not job.cancelled and job.error is None
+
+def test_job_cancellation():
+    started = threading.Event()
+    
+    def slow(progress=None, cancel=None):
+        started.set()
+        while True:
+            cancel.check()
+    
+    job = BackgroundJob('slow', slow)
+    started.wait(5)
+    job.cancel()
+    with pytest.raises(JobCancelled):
+        job.result()
+    assert job.cancelled
+    assert job.error is None
+
+def test_multi_file_parse_drops_overlap():
+    from parsers.uploads import parse_uploads
+    
+    jan = b"""
+    1    30/08/2025    478322208/12390    1,000.00
+         BNKFT-PMS
+    2    31/08/2025    CDS-215769794    5.00
+    3    31/08/2025    CDS-215769794    5.00
+    """
+    feb = b"""
+    1    31/08/2025    CDS-215769794    5.00
+    2    01/09/2025    Ref2/1        200.00
+    """
+    job = BackgroundJob('bank', parse_uploads, [("jan.txt", jan), ("feb.txt", feb)], parse_bank_upload,
+                        file_workers=2, workers=1)
+    df, dropped = job.result()
+    
+    # The 31/08 row appears twice in jan (kept twice) and once in feb (dropped)
+    assert dropped == 1
+    assert list(df['amount']) == [1000.0, 5.0, 5.0, 200.0]
+    assert list(df['source_file']) == ["jan.txt"] * 3 + ["feb.txt"]
+    assert job.done_units == job.total_units == 2
+
+def test_multi_file_parse_cancels_while_a_file_is_parsing():
+    import time
+    from parsers.uploads import parse_uploads
+    from utils.jobs import CancelToken
+    
+    token = CancelToken()
+    threading.Timer(0.5, token.cancel).start()
+    started = time.perf_counter()
+    with pytest.raises(JobCancelled):
+        # time.sleep stands in for a parse_fn stuck on one large file
+        parse_uploads([("a.txt", 3), ("b.txt", 3)], time.sleep, cancel=token, file_workers=2)
+    assert time.perf_counter() - started < 2.5
@@ -0,0 +1,210 @@
+import pytest
+import pandas as pd
+import numpy as np
+from datetime import date
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from engine.matcher import Matcher
+
+CONFIG = {
+    'date_window_days': 2,
+    'similarity_enabled': True,
+    'similarity_threshold': 0.85,
+    'tolerance': {'ips_min': 2.0, 'ips_max': 10.0, 'rtgs_flat': 100.0, 'rtgs_threshold': 2000000.0},
+}
+
+def make_bank(rows):
+    return pd.DataFrame(rows, columns=["txn_date", "ref_no", "amount", "dr_cr", "narration"])
+
+def make_broker(rows):
+    df = pd.DataFrame(rows, columns=["txn_date", "transaction_ref", "credit", "debit", "particulars"])
+    df['settlement_date'] = df['txn_date']
+    return df
+
+def test_exact_ref_mismatch_fuzzy_and_unmatched():
+    bank = make_bank([
+        (date(2025, 8, 28), "478322208", 1000.0, "CR", "BNKFT-PMS"),
+        (date(2025, 8, 29), "UNKNOWN", 500.0, "CR", "Deposit by client"),
+        (date(2025, 9, 1), "X1", 750.0, "CR", "CASH DEPOSIT RAM"),
+        (date(2025, 9, 20), "999", 42.0, "CR", "Nothing"),
+    ])
+    broker = make_broker([
+        (date(2025, 8, 28), "478322208", 1000.0, 0.0, "Received in BANK"),
+        (date(2025, 8, 30), "ABC", 500.0, 0.0, "Received"),
+        (date(2025, 9, 2), "Y2", 750.0, 0.0, "CASH DEPOSIT RAM"),
+        (date(2025, 9, 2), "Y3", 750.0, 0.0, "Other receipt"),
+        (date(2025, 9, 5), "Z", 10.0, 0.0, "Orphan receipt"),
+    ])
+    res = Matcher(bank, broker, CONFIG).run()
+    
+    matched = res['matched']
+    assert set(matched['match_type']) == {'EXACT', 'FUZZY'}
+    exact = matched[matched['match_type'] == 'EXACT'].iloc[0]
+    assert exact['bank_row_id'] == 0 and exact['broker_row_id'] == 0
+    fuzzy = matched[matched['match_type'] == 'FUZZY'].iloc[0]
+    assert fuzzy['bank_row_id'] == 2 and fuzzy['broker_row_id'] == 2
+    
+    partial = res['partial']
+    assert len(partial) == 1
+    assert partial.iloc[0]['bank_row_id'] == 1 and partial.iloc[0]['broker_row_id'] == 1
+    
+    unmatched = res['unmatched']
+    assert 3 in set(unmatched['bank_row_id'].dropna())
+    assert {3, 4} <= set(unmatched['broker_row_id'].dropna())
+
+def test_ips_tolerance_allows_small_delta():
+    bank = make_bank([(date(2025, 8, 28), "111", 995.0, "CR", "IPS TRANSFER")])
+    broker = make_broker([(date(2025, 8, 28), "111", 1000.0, 0.0, "Received")])
+    res = Matcher(bank, broker, CONFIG).run()
+    assert len(res['matched']) == 1
+    assert res['matched'].iloc[0]['delta'] == -5.0
+
+def test_ngram_engine_confirms_shortlist():
+    pytest.importorskip("scipy")
+    bank = make_bank([(date(2025, 9, 1), "X1", 750.0, "CR", "CASH DEPOSIT RAM")])
+    broker = make_broker([
+        (date(2025, 9, 2), "Y3", 750.0, 0.0, "Other receipt"),
+        (date(2025, 9, 2), "Y2", 750.0, 0.0, "CASH DEPOSIT RAM"),
+    ])
+    config = {**CONFIG, 'fuzzy_engine': 'ngram', 'ngram_top_k': 1}
+    res = Matcher(bank, broker, config).run()
+    assert len(res['matched']) == 1
+    assert res['matched'].iloc[0]['broker_row_id'] == 1
+    assert res['matched'].iloc[0]['match_type'] == 'FUZZY'
+
+def test_exact_match_on_ref_variants():
+    bank = make_bank([
+        (date(2025, 9, 8), "CDS-215769794", 5.0, "CR", "Share apply"),
+        (date(2025, 11, 2), "72012511010096CZ", 1504.0, "CR", "Dividend"),
+    ])
+    broker = make_broker([
+        (date(2025, 9, 8), "215769794", 5.0, 0.0, "Refund"),
+        (date(2025, 11, 2), "72012511010096", 1504.0, 0.0, "Cash dividend"),
+    ])
+    config = {**CONFIG, 'similarity_enabled': False}
+    res = Matcher(bank, broker, config).run()
+    assert list(res['matched']['match_type']) == ['EXACT', 'EXACT']
+    assert res['partial'].empty
+
+def test_split_and_bulk_groups():
+    bank = make_bank([
+        (date(2025, 9, 1), "A", 1000.0, "CR", "Deposit"),
+        (date(2025, 9, 10), "B", 300.0, "CR", "Deposit part"),
+        (date(2025, 9, 10), "C", 200.0, "CR", "Deposit part"),
+    ])
+    broker = make_broker([
+        (date(2025, 9, 1), "P", 600.0, 0.0, "Receipt one"),
+        (date(2025, 9, 2), "Q", 400.0, 0.0, "Receipt two"),
+        (date(2025, 9, 11), "R", 500.0, 0.0, "Bulk receipt"),
+    ])
+    config = {**CONFIG, 'similarity_enabled': False}
+    res = Matcher(bank, broker, config).run()
+    
+    matched = res['matched'].set_index('match_type')
+    assert matched.loc['SPLIT', 'bank_row_id'] == [0]
+    assert sorted(matched.loc['SPLIT', 'broker_row_id']) == [0, 1]
+    assert sorted(matched.loc['BULK', 'bank_row_id']) == [1, 2]
+    assert matched.loc['BULK', 'broker_row_id'] == [2]
+    assert res['unmatched'].empty
+
+def test_stage_cache_reruns_only_affected_stages():
+    from engine.stage_cache import StageCache
+    
+    bank = make_bank([(date(2025, 9, 1), "X1", 750.0, "CR", "CASH DEPOSIT RAM")])
+    broker = make_broker([
+        (date(2025, 9, 2), "Y3", 750.0, 0.0, "Other receipt"),
+        (date(2025, 9, 2), "Y2", 750.0, 0.0, "CASH DEPOSIT RAM"),
+    ])
+    cache = StageCache()
+    
+    first = Matcher(bank, broker, CONFIG, cache=cache)
+    first.run()
+    assert first.stages_run == ['candidates', 'exact', 'amount', 'fuzzy', 'subset']
+    
+    fuzzy_only = Matcher(bank, broker, {**CONFIG, 'similarity_threshold': 0.99}, cache=cache)
+    fuzzy_only.run()
+    assert fuzzy_only.stages_run == ['fuzzy', 'subset']
+    
+    tolerance = {**CONFIG, 'tolerance': {**CONFIG['tolerance'], 'ips_max': 5.0}}
+    from_amount = Matcher(bank, broker, tolerance, cache=cache)
+    res = from_amount.run()
+    assert from_amount.stages_run == ['exact', 'amount', 'fuzzy', 'subset']
+    assert res['matched'].iloc[0]['broker_row_id'] == 1
+
+def test_stage_cache_bounded_by_bytes_across_threads():
+    from concurrent.futures import ThreadPoolExecutor
+    from engine.stage_cache import StageCache
+
+    cache = StageCache(maxsize=64, max_bytes=10_000)
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda i: cache.get_or_compute(f"k{i % 20}", lambda: np.zeros(500)), range(400)))
+    assert cache.bytes <= 10_000 and len(cache._entries) == 2 # 4000 bytes each
+    assert cache.get_or_compute("big", lambda: np.zeros(5000)).shape == (5000,)
+    assert "big" not in cache._entries # over max_bytes on its own: returned, not kept
+
+def test_chunked_run_reports_progress_and_can_be_cancelled():
+    from utils.jobs import CancelToken
+    
+    bank = make_bank([(date(2025, 9, 1), f"REF{i:03d}", 100.0 * (i + 1), "CR", "Deposit") for i in range(6)])
+    broker = make_broker([(date(2025, 9, 1), f"REF{i:03d}", 100.0 * (i + 1), 0.0, "Receipt") for i in range(6)])
+    config = {**CONFIG, 'match_chunk_size': 2}
+    
+    reports = []
+    full = Matcher(bank, broker, config, cache=None,
+                   progress=lambda done, total, **info: reports.append((done, total, info))).run()
+    assert len(full['matched']) == 6
+    assert reports[-1][0] == reports[-1][1] == 6 * 5
+    assert [r[2]['stage'] for r in reports[:4]] == ['candidates', 'exact', 'exact', 'exact']
+    assert reports[-1][2]['matches'] == 6
+    
+    # Cancel after the first EXACT chunk: its matches survive, the rest are "not reached"
+    token = CancelToken()
+    def progress(done, total, **info):
+        if info['stage'] == 'exact':
+            token.cancel()
+    matcher = Matcher(bank, broker, config, cache=None, progress=progress, cancel=token)
+    res = matcher.run()
+    assert matcher.cancelled
+    assert list(res['matched']['bank_row_id']) == [0, 1]
+    assert set(res['unmatched']['reason']) == {"Not reached (run cancelled)"}
+
+def test_two_sided_matches_debits_against_broker_debits():
+    from engine.matcher import TwoSidedMatcher
+    
+    bank = make_bank([
+        (date(2025, 9, 1), "REF001", 100.0, "CR", "Deposit"),
+        (date(2025, 9, 2), "REF002", -250.0, "DR", "Payout to client"),
+        (date(2025, 9, 3), "REF003", -70.0, "DR", "Fee"),
+    ])
+    broker = make_broker([
+        (date(2025, 9, 1), "REF001", 100.0, 0.0, "Receipt"),
+        (date(2025, 9, 2), "REF002", 0.0, 250.0, "Payment"),
+        (date(2025, 9, 9), "Q", 0.0, 5.0, "Orphan payment"),
+    ])
+    updates = []
+    matcher = TwoSidedMatcher(bank, broker, CONFIG, cache=None, progress=lambda d, t, **info: updates.append((d, t)))
+    res = matcher.run()
+    
+    matched = res['matched'].set_index('side')
+    assert matched.loc['CR', 'bank_row_id'] == 0 and matched.loc['CR', 'broker_row_id'] == 0
+    assert matched.loc['DR', 'bank_row_id'] == 1 and matched.loc['DR', 'broker_row_id'] == 1
+    assert matched.loc['DR', 'bank_amount'] == matched.loc['DR', 'broker_amount'] == 250.0
+    
+    unmatched = res['unmatched']
+    assert set(unmatched['side']) == {'DR'}
+    assert set(unmatched['bank_row_id'].dropna()) == {2}
+    assert set(unmatched['broker_row_id'].dropna()) == {2}
+    assert 'Broker Debit' in unmatched.dropna(subset=['broker_row_id']).iloc[0]['reason']
+    assert updates[-1][0] == updates[-1][1] == 3 * 5
+    assert sorted(matcher.stages_run)[:2] == ['CR amount', 'CR candidates']
+
+def test_credit_only_sides():
+    from engine.matcher import TwoSidedMatcher
+    
+    bank = make_bank([(date(2025, 9, 2), "REF002", -250.0, "DR", "Payout")])
+    broker = make_broker([(date(2025, 9, 2), "REF002", 0.0, 250.0, "Payment")])
+    res = TwoSidedMatcher(bank, broker, {**CONFIG, 'match_sides': ['CR']}, cache=None).run()
+    assert all(df.empty for df in res.values())
@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+import time
+from datetime import date
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from engine.matcher import Matcher
+from engine.memo import CounterpartyMemo, ref_prefix, text_fingerprint
+
+CONFIG = {
+    'date_window_days': 2,
+    'similarity_enabled': True,
+    'similarity_threshold': 0.85,
+    'tolerance': {'ips_max': 10.0, 'rtgs_flat': 100.0, 'rtgs_threshold': 2000000.0},
+}
+
+def make_bank(rows):
+    return pd.DataFrame(rows, columns=["txn_date", "ref_no", "amount", "dr_cr", "narration"])
+
+def make_broker(rows):
+    return pd.DataFrame(rows, columns=["txn_date", "transaction_ref", "credit", "debit", "particulars"])
+
+def test_fingerprints_ignore_month_specific_tokens():
+    assert text_fingerprint("Deposit RAM SHARMA 12/08/2025 ch-00123") == text_fingerprint("ram sharma DEPOSIT 11/09/2025")
+    assert text_fingerprint("12/08/2025 1,000") is None
+    assert ref_prefix("00-478 322/208") == "478322"
+    assert ref_prefix("UNKNOWN") is None and ref_prefix("12") is None
+
+def test_memo_ages_out_and_caps_entries(tmp_path):
+    memo = CounterpartyMemo(str(tmp_path / "memo.json"), max_entries=2, max_age_days=30, max_targets=1)
+    day = 86400
+    start = time.time() - 50 * day
+    memo.learn([(["n:A"], "X")], now=start)
+    memo.learn([(["n:B"], "Y"), (["n:B"], "Z")], now=start + 10 * day)
+    assert memo.targets(["n:A", "n:B"]) == {"X", "Z"} # B keeps only its newest target
+    memo.learn([(["n:C"], "W")], now=start + 20 * day)
+    assert set(memo.entries) == {"n:B", "n:C"} # cap: least recently seen key dropped
+    memo.prune(now=start + 45 * day)
+    assert set(memo.entries) == {"n:C"} # B not seen for more than 30 days
+    
+    memo.save()
+    loaded = CounterpartyMemo(str(tmp_path / "memo.json"), max_age_days=60)
+    loaded.load()
+    assert loaded.entries == memo.entries and loaded.digest() == memo.digest()
+    assert json.loads((tmp_path / "memo.json").read_text())["version"] == CounterpartyMemo.VERSION
+
+def test_learned_link_matches_next_month_without_fuzzy(tmp_path):
+    path = str(tmp_path / "memo.json")
+    config = {**CONFIG, 'memo': {'enabled': True, 'path': path}}
+    
+    # Month 1: the ref matches exactly, which teaches narration -> particulars
+    bank = make_bank([(date(2025, 8, 5), "478322208", 5000.0, "CR", "BNKFT RAM SHARMA 0805")])
+    broker = make_broker([(date(2025, 8, 5), "478322208", 5000.0, 0.0, "Received from Ram Sharma (RS01) 05/08")])
+    Matcher(bank, broker, config, cache=None, memo=CounterpartyMemo.from_config(config)).run()
+    assert os.path.exists(path)
+    
+    # Month 2: new ref, two same-amount candidates; only the memo knows which one
+    bank = make_bank([(date(2025, 9, 5), "999000111", 5000.0, "CR", "BNKFT RAM SHARMA 0905")])
+    broker = make_broker([
+        (date(2025, 9, 5), "A1", 5000.0, 0.0, "Received from Hari Prasad (HP02)"),
+        (date(2025, 9, 5), "A2", 5000.0, 0.0, "Received from Ram Sharma (RS01) 05/09"),
+    ])
+    memo = CounterpartyMemo.from_config(config)
+    learned = {k: dict(v) for k, v in memo.entries.items()}
+    matcher = Matcher(bank, broker, config, cache=None, memo=memo)
+    
+    def no_fuzzy(*args):
+        raise AssertionError("fuzzy scoring should not run for memo hits")
+    matcher._similarity_fn = lambda: no_fuzzy
+    res = matcher.run()
+    
+    row = res['matched'].iloc[0]
+    assert row['match_type'] == 'MEMO' and row['broker_row_id'] == 1
+    assert 'memo' in matcher.stages_run
+    # MEMO matches are not learned back: the link keeps its month-1 timestamp
+    assert memo.entries == learned
@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from engine.pipeline import parse_files, reconcile_frames
+from utils.metrics import RunMetrics, run_metrics
+
+CONFIG = {
+    'date_window_days': 2,
+    'similarity_enabled': False,
+    'subset_enabled': False,
+    'memo': {'enabled': False},
+    'bank_parse_workers': 1,
+}
+
+def test_textfile_and_jsonl_written_per_run(tmp_path):
+    config = {'metrics': {'dir': str(tmp_path)}}
+    for _ in range(2):
+        with run_metrics("reconcile", config, account='ACME "1"') as metrics:
+            with metrics.stage("normalize"):
+                pass
+            metrics.add("exceptions", 2, code="E-003")
+            metrics.add("exceptions", 1, code="E-003")
+    with pytest.raises(RuntimeError):
+        with run_metrics("parse", config, side="bank"):
+            raise RuntimeError("boom")
+
+    prom = (tmp_path / "pms_recon_reconcile_ACME_1_.prom").read_text()
+    assert '# TYPE pms_recon_exceptions gauge' in prom
+    # Replaced, not appended: one series per label set, counts of the last run only
+    assert prom.count('pms_recon_exceptions{') == 1
+    assert 'pms_recon_exceptions{kind="reconcile",account="ACME \\"1\\"",code="E-003"} 3' in prom
+    assert 'pms_recon_stage_duration_seconds{kind="reconcile",account="ACME \\"1\\"",stage="normalize"}' in prom
+    assert 'pms_recon_run_success{kind="reconcile",account="ACME \\"1\\""} 1' in prom
+    assert 'pms_recon_run_success{kind="parse",side="bank"} 0' in (tmp_path / "pms_recon_parse_bank.prom").read_text()
+    if sys.platform != "win32":
+        assert 'pms_recon_peak_rss_bytes{kind="reconcile",account="ACME \\"1\\"",process="self"}' in prom
+
+    records = [json.loads(line) for line in (tmp_path / "metrics.jsonl").read_text().splitlines()]
+    assert [r["status"] for r in records] == ["ok", "ok", "failed"]
+    assert records[0]["metrics"]["exceptions"] == [{"labels": {"code": "E-003"}, "value": 3}]
+    assert not [p for p in os.listdir(tmp_path) if p.endswith(".tmp")]
+
+    with pytest.raises(ValueError):
+        RunMetrics("parse").add("no_such_metric", 1)
+
+def test_pipeline_records_parse_failures_and_result_counts(tmp_path):
+    statement = tmp_path / "statement.TXT"
+    statement.write_text(
+        "1    28/08/2025    478322208/12390    750.00\n     BNKFT-PMS\n"
+        "99999    31/02/2025    X/1    5.00\n"  # no date in the header: parse_bank_block rejects it
+        "3    28/08/2025    NOTHING    42.00\n"
+    )
+    metrics = RunMetrics("reconcile")
+    bank_df, _ = parse_files('bank', [str(statement)], CONFIG, metrics=metrics)
+    assert metrics.get("rows_in", input="bank_blocks") == 3
+    assert metrics.get("parse_failures", side="bank", reason="rejected_block") == 1
+    assert metrics.get("rows_out", output="bank") == 2
+
+    broker_df = pd.DataFrame({
+        "txn_date": [date(2025, 8, 28)],
+        "transaction_ref": ["478322208"],
+        "credit": [750.0],
+        "debit": [0.0],
+        "particulars": ["Received"],
+    })
+    results, _ = reconcile_frames(bank_df, broker_df, CONFIG, metrics=metrics)
+    assert metrics.get("rows_in", input="bank") == 2
+    assert metrics.get("matches", side="CR", match_type="EXACT") == 1
+    assert metrics.get("rows_out", output="unmatched") == len(results['unmatched'])
+    assert sum(metrics.values.get("exceptions", {}).values()) == len(results['exceptions'])
+    stages = {dict(k)["stage"] for k in metrics.values["stage_duration_seconds"]}
+    assert {"parse_bank", "normalize", "match", "match CR exact"} <= stages
@@ -0,0 +1,27 @@
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest.importorskip("scipy")
+
+from engine.ngram_index import NGramIndex
+
+def test_top_k_ranks_closest_text_first():
+    broker = [
+        "Received in BANK Reference No.: 478322208",
+        "Being Share Purchased GBIME",
+        "CASH DEPOSIT RAM BAHADUR",
+        "",
+    ]
+    index = NGramIndex(broker, n=3, block_size=2)
+    
+    res = index.top_k(["BNKFT-PMS 478322208", "cash deposit ram", "zzzz"], k=2)
+    
+    assert len(res) == 3
+    assert res[0][0] == 0
+    assert res[1][0] == 2
+    assert len(res[1]) <= 2
+    # No shared n-grams -> no candidates
+    assert len(res[2]) == 0
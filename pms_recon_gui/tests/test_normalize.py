@@ -0,0 +1,86 @@
+import pytest
+import pandas as pd
+from datetime import date
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from normalize.bank_normalize import normalize_bank_data
+from normalize.broker_normalize import normalize_broker_data
+from normalize.common import NORMALIZED_CACHE
+
+def test_bank_normalize_does_not_mutate_input():
+    df = pd.DataFrame({
+        "txn_date": [date(2025, 8, 28)],
+        "ref_no": ["478322208"],
+        "amount": ["1,000"],
+        "narration": ["BNKFT-PMS"],
+        "raw_line": ["2 28/08/2025 478322208 1,000"],
+    })
+    before = df.copy()
+    norm = normalize_bank_data(df)
+    
+    assert list(norm.columns) == ["txn_date", "ref_no", "amount", "dr_cr", "narration"]
+    assert norm.iloc[0]['dr_cr'] == 'CR'
+    pd.testing.assert_frame_equal(df, before)
+    assert 'dr_cr' not in df.columns
+
+def test_bank_normalize_signs_amounts_by_side():
+    df = pd.DataFrame({
+        "txn_date": [date(2025, 8, 28)] * 3,
+        "ref_no": ["A", "B", "C"],
+        "amount": [100.0, -50.0, 20.0],
+        "narration": ["in", "out", "out"],
+    })
+    norm = normalize_bank_data(df)
+    assert list(norm['dr_cr']) == ['CR', 'DR', 'CR']
+    
+    labelled = normalize_bank_data(df.assign(dr_cr=['cr', 'DR', 'DR']))
+    assert list(labelled['dr_cr']) == ['CR', 'DR', 'DR']
+    assert list(labelled['amount']) == [100.0, -50.0, -20.0]
+
+def test_broker_normalize_casts_and_strips():
+    df = pd.DataFrame({
+        "txn_date": [date(2025, 8, 28), date(2025, 8, 29)],
+        "transaction_ref": [" 478322208 ", None],
+        "particulars": ["Received", "Purchase"],
+        "credit": [100.0, None],
+        "debit": [0.0, 50.0],
+    })
+    norm = normalize_broker_data(df)
+    
+    assert norm.iloc[0]['transaction_ref'] == "478322208"
+    assert norm.iloc[1]['credit'] == 0.0
+    assert norm.iloc[0]['settlement_date'] == date(2025, 8, 28)
+    assert df.iloc[0]['transaction_ref'] == " 478322208 "
+
+def test_normalize_is_cached_per_content():
+    NORMALIZED_CACHE.clear()
+    df = pd.DataFrame({
+        "txn_date": [date(2025, 8, 28)],
+        "ref_no": ["1"],
+        "amount": [10.0],
+        "narration": ["X"],
+    })
+    first = normalize_bank_data(df)
+    assert normalize_bank_data(df.copy()) is first
+    
+    changed = df.assign(amount=[11.0])
+    assert normalize_bank_data(changed) is not first
+
+def test_frame_cache_bounded_across_threads():
+    from concurrent.futures import ThreadPoolExecutor
+    from normalize.common import FrameCache
+
+    cache = FrameCache(maxsize=4)
+    frame = pd.DataFrame({"a": [1]})
+    def touch(i):
+        key = f"k{i % 10}"
+        if cache.get(key) is None:
+            cache.put(key, frame)
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(touch, range(2000)))
+    assert len(cache._entries) == 4
+    cache.clear()
+    assert cache.get("k0") is None
@@ -0,0 +1,83 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from engine.pipeline import reconcile_frames, reconcile_out_of_core
+
+CONFIG = {
+    'date_window_days': 2,
+    'similarity_enabled': True,
+    'similarity_threshold': 0.85,
+    'subset_enabled': False, # not run by the out-of-core backend
+    'tolerance': {'ips_max': 10.0, 'rtgs_flat': 100.0, 'rtgs_threshold': 2000000.0},
+}
+
+def ledgers(n=300, seed=1):
+    rng = np.random.default_rng(seed)
+    start = date(2025, 1, 1)
+    days = rng.integers(0, 60, n)
+    amount = np.round(rng.uniform(100, 5000, n), 0) * np.where(rng.random(n) < 0.3, -1, 1)
+    bank = pd.DataFrame({
+        "txn_date": [start + timedelta(days=int(d)) for d in days],
+        "ref_no": [f"REF{i:05d}" if i % 3 else "UNKNOWN" for i in range(n)],
+        "amount": amount,
+        "narration": [("IPS " if i % 7 == 0 else "") + f"DEP CLIENT {i % 20}" for i in range(n)],
+    })
+    broker = pd.DataFrame({
+        "txn_date": [start + timedelta(days=int(d + k)) for d, k in zip(days, rng.integers(0, 3, n))],
+        "transaction_ref": [f"REF{i:05d}" if i % 4 else "X" for i in range(n)],
+        "credit": np.where(amount > 0, np.abs(amount) + (rng.random(n) < 0.1) * 5, 0.0),
+        "debit": np.where(amount < 0, np.abs(amount), 0.0),
+        "particulars": [f"client {i % 20} dep" for i in range(n)],
+    })
+    return bank, broker
+
+def keys(df, cols):
+    return sorted(map(tuple, df[cols].fillna(-1).astype(str).values.tolist())) if not df.empty else []
+
+def test_out_of_core_matches_in_memory_results(tmp_path):
+    bank, broker = ledgers()
+    bank.to_csv(tmp_path / "bank.csv", index=False)
+    # Broker split over two files: positions continue across them
+    broker.iloc[:120].to_csv(tmp_path / "broker_1.csv", index=False)
+    broker.iloc[120:].to_csv(tmp_path / "broker_2.csv", index=False)
+    
+    expected, _ = reconcile_frames(bank, broker, CONFIG)
+    workdir = tmp_path / "work"
+    config = {**CONFIG, 'outofcore': {'engine': 'sqlite', 'batch_rows': 50, 'workdir': str(workdir)}}
+    results, matcher = reconcile_out_of_core(
+        [str(tmp_path / "bank.csv")], [str(tmp_path / "broker_1.csv"), str(tmp_path / "broker_2.csv")], config
+    )
+    
+    assert matcher.engine == "sqlite" and not matcher.cancelled
+    pair_cols = ['side', 'bank_row_id', 'broker_row_id', 'match_type']
+    assert keys(results['matched'], pair_cols) == keys(expected['matched'], pair_cols)
+    assert keys(results['partial'], pair_cols) == keys(expected['partial'], pair_cols)
+    assert keys(results['unmatched'], ['side', 'bank_row_id', 'broker_row_id']) == \
+        keys(expected['unmatched'], ['side', 'bank_row_id', 'broker_row_id'])
+    assert len(results['exceptions']) == len(expected['exceptions'])
+    assert matcher.stats['CR']['candidate_pairs'] < len(bank) * 3
+    
+    # Same workdir again: a fresh store per run, nothing left behind
+    again, _ = reconcile_out_of_core([str(tmp_path / "bank.csv")], [str(tmp_path / "broker_1.csv")], config)
+    assert not again['matched'].empty
+    assert os.listdir(workdir) == []
+
+def test_temp_workdir_is_removed_and_unknown_engine_rejected(tmp_path, monkeypatch):
+    import tempfile
+    
+    bank, broker = ledgers(30)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    reconcile_out_of_core([bank], [broker], {**CONFIG, 'outofcore': {'engine': 'sqlite'}})
+    assert os.listdir(tmp_path) == []
+    
+    with pytest.raises(ValueError):
+        reconcile_out_of_core([bank], [broker], {**CONFIG, 'outofcore': {'engine': 'oracle'}})
+    with pytest.raises(ValueError):
+        reconcile_out_of_core([bank], [broker], {**CONFIG, 'outofcore': {'memory_limit': "1GB'; DROP TABLE bank; --"}})
@@ -0,0 +1,102 @@
+import logging
+import os
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from engine.candidates import HASH_JOIN, NESTED, SORT_MERGE
+from engine.matcher import Matcher
+from engine.pipeline import reconcile_frames
+from engine.planner import BLOCKED_FUZZY, plan_side
+
+CONFIG = {
+    'date_window_days': 2,
+    'similarity_enabled': True,
+    'similarity_threshold': 0.85,
+    'fuzzy_engine': 'pairwise',
+    'subset_enabled': True,
+    'memo': {'enabled': False},
+    'tolerance': {'ips_max': 10.0, 'rtgs_flat': 100.0, 'rtgs_threshold': 2000000.0},
+}
+
+def ledgers(n=400, days=20, seed=3):
+    rng = np.random.default_rng(seed)
+    start = date(2025, 3, 1)
+    day = rng.integers(0, days, n)
+    amount = np.round(rng.uniform(100, 3000, n), 0)
+    bank = pd.DataFrame({
+        "txn_date": [start + timedelta(days=int(d)) for d in day],
+        "ref_no": [f"R{i}" if i % 3 else "UNKNOWN" for i in range(n)],
+        "amount": amount,
+        "dr_cr": "CR",
+        "narration": [("IPS " if i % 5 == 0 else "") + f"CLIENT {i % 30}" for i in range(n)],
+    })
+    # Some deposits arrive as two broker receipts (SPLIT candidates)
+    split = amount * np.where(rng.random(n) < 0.05, 0.5, 1.0)
+    broker = pd.DataFrame({
+        "txn_date": [start + timedelta(days=int(d + k)) for d, k in zip(day, rng.integers(0, 2, n))],
+        "transaction_ref": [f"R{i}" if i % 4 else "N/A" for i in range(n)],
+        "credit": split + (rng.random(n) < 0.1) * 4,
+        "debit": 0.0,
+        "particulars": [f"client {i % 30}" for i in range(n)],
+    })
+    extra = broker[split != amount].copy()
+    return bank, pd.concat([broker, extra], ignore_index=True)
+
+def pairs(res):
+    return sorted(map(str, res['matched'][['bank_row_id', 'broker_row_id', 'match_type']].values.tolist()))
+
+@pytest.mark.parametrize("joins", [[NESTED], [HASH_JOIN]])
+def test_forced_joins_give_the_same_matches(joins):
+    bank, broker = ledgers()
+    baseline = Matcher(bank, broker, {**CONFIG, 'planner': {'enabled': False}}, cache=None).run()
+    matcher = Matcher(bank, broker, {**CONFIG, 'planner': {'joins': joins}}, cache=None)
+    res = matcher.run()
+
+    assert set(matcher.plan.row_join) == set(joins)
+    assert pairs(res) == pairs(baseline)
+    assert any(t in ('SPLIT', 'BULK') for t in res['matched']['match_type'])
+    assert len(res['unmatched']) == len(baseline['unmatched'])
+
+def test_planner_picks_joins_from_partition_shape():
+    # A hot day of many distinct amounts -> hash join; a batch of identical IPS amounts
+    # gains nothing from hashing -> sort-merge
+    hot_bank, hot_broker = ledgers(n=3000, days=1, seed=4)
+    batch_bank, batch_broker = ledgers(n=300, days=1, seed=5)
+    batch_bank['txn_date'] = batch_broker['txn_date'] = date(2025, 6, 20)
+    batch_bank['amount'] = batch_broker['credit'] = 500.0
+    plan = plan_side(pd.concat([hot_bank, batch_bank], ignore_index=True),
+                     pd.concat([hot_broker, batch_broker], ignore_index=True), CONFIG)
+    by_size = {p.bank_rows: p for p in plan.partitions}
+    assert by_size[3000].join == HASH_JOIN
+    assert by_size[300].join == SORT_MERGE and by_size[300].amount_cardinality < 0.01
+    assert plan.est_pairs < 3000 * 3000
+    assert len(plan.to_frame()) == len(plan.partitions)
+
+    # Scoring every identical-amount candidate costs more than an n-gram shortlist
+    auto = plan_side(batch_bank, batch_broker, {**CONFIG, 'fuzzy_engine': 'auto'})
+    assert auto.partitions[0].fuzzy == BLOCKED_FUZZY and auto.row_blocked.all()
+
+    # A handful of broker rows: no point sorting them
+    bank, broker = ledgers(n=200, days=40)
+    tiny = plan_side(bank, broker.iloc[:3], CONFIG)
+    assert set(tiny.row_join) == {NESTED}
+
+def test_plan_is_logged_and_out_of_core_over_budget(caplog):
+    bank, broker = ledgers(n=200)
+    bank.index = bank.index + 1000 # parser row labels, not positions
+    config = {**CONFIG, 'subset_enabled': False, 'planner': {'memory_budget_mb': 0},
+              'outofcore': {'engine': 'sqlite'}}
+    with caplog.at_level(logging.INFO, logger="recon.planner"):
+        results, matcher = reconcile_frames(bank, broker, config, allow_out_of_core=True)
+
+    assert matcher.engine == "sqlite"
+    assert "CR plan: out_of_core" in caplog.text
+    in_memory, _ = reconcile_frames(bank, broker, config)
+    assert pairs(results) == pairs(in_memory)
+    assert results['matched']['bank_row_id'].min() >= 1000
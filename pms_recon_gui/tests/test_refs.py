@@ -0,0 +1,49 @@
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.refs import clean_ref_no, canonical_ref_key, canonical_ref_keys
+from engine.ref_index import RefIndex
+
+def test_clean_ref_no():
+    assert clean_ref_no("478322208/12390") == "478322208"
+    assert clean_ref_no("  ") is None
+
+def test_canonical_ref_variants():
+    assert canonical_ref_key("cds-0215769794") == "CDS0215769794"
+    assert "215769794" in canonical_ref_keys("CDS-215769794")
+    assert "478322208" in canonical_ref_keys("478322208/12390")
+    assert "72012511010096" in canonical_ref_keys("72012511010096CZ")
+    assert canonical_ref_key("00 4783-22208") == "478322208"
+    assert canonical_ref_keys("UNKNOWN") == []
+    assert canonical_ref_keys(None) == []
+    assert canonical_ref_keys(float("nan")) == []
+
+def test_ref_index_lookup():
+    index = RefIndex([
+        (10, "215769794"),
+        (11, "478322208/12390"),
+        (12, None),
+        (13, "72012511010096"),
+    ])
+    assert index.lookup("CDS-215769794") == [10]
+    assert index.lookup("478322208") == [11]
+    assert index.lookup("72012511010096CZ") == [13]
+    assert index.lookup("UNKNOWN") == []
+
+def test_short_refs_still_match_exact():
+    from datetime import date
+    import pandas as pd
+    from engine.matcher import Matcher
+
+    assert canonical_ref_keys("x1") == ["X1"]
+    assert canonical_ref_keys("CDS-12") == ["CDS12"] # 2-character sub-key not emitted
+    assert canonical_ref_keys("N/A") == []
+    bank = pd.DataFrame([(date(2025, 9, 1), "X1", 750.0, "CR", "Deposit")],
+                        columns=["txn_date", "ref_no", "amount", "dr_cr", "narration"])
+    broker = pd.DataFrame([(date(2025, 9, 1), "X1", 750.0, 0.0, "Receipt")],
+                          columns=["txn_date", "transaction_ref", "credit", "debit", "particulars"])
+    res = Matcher(bank, broker, {'date_window_days': 2, 'similarity_enabled': False}).run()
+    assert list(res['matched']['match_type']) == ['EXACT']
@@ -42,3 +42,20 @@ def test_compute_tolerance():
 def test_similarity():
     assert check_similarity("BNKFT Ref123", "Ref123", 0.85) is True
     assert check_similarity("Totally Different", "Nothing Alike", 0.85) is False
+
+def test_processed_similarity_matches_raw():
+    from rapidfuzz import fuzz
+    from engine.rules import preprocess_text, check_processed_similarity
+    
+    pairs = [
+        ("BNKFT Ref123", "Ref123"),
+        ("PMS  CIPS PMS", "Received in BANK PMS"),
+        ("Totally Different", "Nothing Alike"),
+    ]
+    for s1, s2 in pairs:
+        p1, p2 = preprocess_text(s1), preprocess_text(s2)
+        assert fuzz.token_set_ratio(p1, p2) == fuzz.token_set_ratio(s1, s2)
+        assert check_processed_similarity(p1, p2, 0.85) == check_similarity(s1, s2, 0.85)
+    
+    assert preprocess_text(None) == ""
+    assert preprocess_text("b a  b") == "a b"
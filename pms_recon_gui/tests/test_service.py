@@ -0,0 +1,76 @@
+import pytest
+import json
+import threading
+import time
+import urllib.request
+import urllib.error
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from service import JobService, make_server
+from utils.config import load_config
+
+def call(base, method, path, payload=None, content_type="application/json"):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(base + path, data=data, method=method,
+                                 headers={"Content-Type": content_type})
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as err:
+        return err.code, json.loads(err.read())
+
+@pytest.fixture
+def base_url(tmp_path):
+    import yaml
+    config_path = tmp_path / "config.yml"
+    config_path.write_text(yaml.safe_dump({**load_config(), 'metrics': {'dir': str(tmp_path / "metrics")}}))
+    service = JobService(workers=1, max_pending=4, config_path=str(config_path), out_root=str(tmp_path / "out"))
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+def test_parse_job_round_trip(base_url, tmp_path):
+    path = tmp_path / "statement.TXT"
+    path.write_text("2    28/08/2025    478322208/12390    1,046,729.56\n     BNKFT-PMS\n")
+    
+    metrics_dir = tmp_path / "metrics"
+    code, body = call(base_url, "POST", "/jobs", {"kind": "parse", "side": "bank", "paths": [str(path)]})
+    assert code == 202
+    job_id = body["job_id"]
+    
+    for _ in range(600):
+        code, status = call(base_url, "GET", f"/jobs/{job_id}")
+        if status["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.1)
+    assert status["status"] == "done", status
+    
+    code, body = call(base_url, "GET", f"/jobs/{job_id}/result")
+    assert code == 200
+    assert body["result"]["rows"] == 1
+    assert body["result"]["records"][0]["ref_no"] == "478322208"
+    assert body["result"]["records"][0]["source_file"] == "statement.TXT"
+    assert (metrics_dir / "pms_recon_parse_bank.prom").exists()
+
+def test_bad_requests(base_url):
+    assert call(base_url, "POST", "/jobs", {"kind": "nope"})[0] == 400
+    assert call(base_url, "POST", "/jobs", {"kind": "reconcile", "bank_paths": ["a"]})[0] == 400
+    assert call(base_url, "GET", "/jobs/missing")[0] == 404
+    # Form posts (what a cross-site page can send without a preflight) are refused
+    assert call(base_url, "POST", "/jobs", {"kind": "parse", "side": "bank", "paths": ["a"]},
+                content_type="text/plain")[0] == 415
+    # Overrides may not name files; out_dir stays inside the out root
+    assert call(base_url, "POST", "/jobs", {"kind": "parse", "side": "bank", "paths": ["a"],
+                                            "config": {"memo": {"enabled": True, "path": "/tmp/x"}}})[0] == 400
+    reconcile = {"kind": "reconcile", "bank_paths": ["a"], "broker_paths": ["b"]}
+    assert call(base_url, "POST", "/jobs", {**reconcile, "out_dir": "../../elsewhere"})[0] == 400
+    assert call(base_url, "POST", "/jobs", {**reconcile, "out_dir": "/etc"})[0] == 400
+    code, health = call(base_url, "GET", "/health")
+    assert code == 200 and health["workers"] == 1
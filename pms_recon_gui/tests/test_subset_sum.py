@@ -0,0 +1,22 @@
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from engine.subset_sum import find_subset
+
+def test_prefers_fewest_items():
+    items = [('a', 30.0), ('b', 70.0), ('c', 50.0), ('d', 20.0)]
+    assert sorted(find_subset(100.0, items, 0.0, 3)) == ['a', 'b']
+
+def test_three_items_within_tolerance():
+    items = [('a', 30.0), ('b', 40.0), ('c', 31.0), ('d', 500.0)]
+    assert sorted(find_subset(100.5, items, 0.5, 3)) == ['a', 'b', 'c']
+    assert find_subset(100.5, items, 0.5, 2) is None
+
+def test_no_single_item_or_oversized_sets():
+    assert find_subset(100.0, [('a', 100.0)], 0.0, 3) is None
+    items = [('a', 25.0), ('b', 25.0), ('c', 25.0), ('d', 25.0)]
+    assert find_subset(100.0, items, 0.0, 3) is None
+    assert len(find_subset(100.0, items, 0.0, 4)) == 4
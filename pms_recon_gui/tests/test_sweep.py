@@ -0,0 +1,54 @@
+import pytest
+import random
+import pandas as pd
+from datetime import date, timedelta
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from engine.matcher import Matcher
+from engine.sweep import config_grid, run_sweep
+
+BASE = {
+    'similarity_enabled': True,
+    'subset_enabled': False,
+    'tolerance': {'ips_min': 2.0, 'rtgs_threshold': 2000000.0},
+}
+
+def random_ledgers(n=40, seed=7):
+    rng = random.Random(seed)
+    start = date(2025, 8, 1)
+    words = ["BNKFT", "PMS", "CIPS", "IPS", "CASH", "DEPOSIT", "RAM", "SITA", "Received"]
+    bank, broker = [], []
+    for i in range(n):
+        d = start + timedelta(days=rng.randint(0, 20))
+        amt = rng.choice([500.0, 1000.0, 2500000.0, round(rng.uniform(100, 9000), 2)])
+        narr = " ".join(rng.sample(words, 3))
+        ref = str(rng.randint(100000, 999999))
+        bank.append((d, ref if rng.random() < 0.6 else "UNKNOWN", amt, "CR", narr))
+        broker.append((
+            d + timedelta(days=rng.randint(-3, 3)),
+            ref if rng.random() < 0.5 else "X" + ref,
+            amt + rng.choice([0.0, 0.0, 5.0, 8.0, 60.0]),
+            0.0,
+            " ".join(rng.sample(words, 3)),
+        ))
+    bank_df = pd.DataFrame(bank, columns=["txn_date", "ref_no", "amount", "dr_cr", "narration"])
+    broker_df = pd.DataFrame(broker, columns=["txn_date", "transaction_ref", "credit", "debit", "particulars"])
+    broker_df['settlement_date'] = broker_df['txn_date']
+    return bank_df, broker_df
+
+def test_sweep_agrees_with_matcher():
+    bank, broker = random_ledgers()
+    configs = config_grid(BASE, [0, 2], [0.6, 0.9], [5.0, 10.0], [50.0, 100.0])
+    sweep = run_sweep(bank, broker, configs, max_workers=1)
+    assert len(sweep) == 16
+    
+    for cfg, (_, row) in zip(configs, sweep.iterrows()):
+        res = Matcher(bank, broker, cfg).run()
+        matched = res['matched']
+        n_exact = int((matched['match_type'] == 'EXACT').sum()) if len(matched) else 0
+        assert row['exact'] == n_exact
+        assert row['matched'] == len(matched)
+        assert row['partial'] == len(res['partial'])
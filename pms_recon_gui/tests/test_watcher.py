@@ -0,0 +1,87 @@
+import pytest
+import json
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from watcher import Debouncer, WatchDaemon, account_key
+
+def test_account_key():
+    assert account_key("bishal_yakha_bank_statement.TXT") == "bishal_yakha"
+    assert account_key("/in/Bishal_Yakha_Broker_Ledger.pdf") == "bishal_yakha"
+    assert account_key("misc.pdf") == "misc"
+
+def test_debouncer_waits_for_quiet_and_stable_size(tmp_path):
+    path = tmp_path / "a_bank.txt"
+    path.write_text("partial")
+    deb = Debouncer(delay=5)
+    deb.touch(str(path), now=100)
+    assert deb.ready(now=102) == []
+    path.write_text("partial, now complete") # still being written
+    assert deb.ready(now=106) == []
+    assert deb.ready(now=112) == [str(path)]
+    assert deb.ready(now=200) == []
+
+def wait_idle(daemon, now):
+    for _ in range(200):
+        daemon.poll(now)
+        if not daemon.parsing and not daemon.reconciling:
+            return
+        time.sleep(0.05)
+
+def test_daemon_parses_once_and_reconciles_when_both_sides_present(tmp_path):
+    inbox, outbox = tmp_path / "inbox", tmp_path / "outbox"
+    config = {'date_window_days': 2, 'similarity_enabled': False,
+              'watch': {'inboxes': [str(inbox)], 'out_dir': str(outbox), 'debounce_seconds': 1}}
+    daemon = WatchDaemon(config, pool=ThreadPoolExecutor(2))
+    daemon.scan()
+    (inbox / "acme_bank_aug.TXT").write_text("2    28/08/2025    478322208/12390    1,000.00\n     BNKFT-PMS\n")
+    
+    daemon.scan()
+    wait_idle(daemon, now=time.time() + 10)
+    assert list(daemon.parsed["acme"]["bank"]) == ["acme_bank_aug.TXT"]
+    assert "acme" in daemon.dirty and not daemon.reconciling # broker side still missing
+    
+    # Unchanged file is not parsed again
+    daemon.scan()
+    daemon.poll(now=time.time() + 20)
+    assert not daemon.parsing
+    
+    # Broker side arrives (a parsed frame stands in for the PDF here)
+    daemon.parsed["acme"]["broker"] = {"acme_broker.pdf": pd.DataFrame({
+        "txn_date": [date(2025, 8, 28)], "transaction_ref": ["478322208"],
+        "particulars": ["Received"], "debit": [0.0], "credit": [1000.0],
+    })}
+    wait_idle(daemon, now=time.time() + 30)
+    
+    summary = json.loads((outbox / "acme" / "summary.json").read_text())
+    assert summary["counts"]["matched"] == 1
+    assert summary["bank_files"] == ["acme_bank_aug.TXT"]
+    assert (outbox / "acme" / "matched.csv").exists()
+
+def test_deleted_files_are_dropped(tmp_path):
+    inbox = tmp_path / "inbox"
+    config = {'watch': {'inboxes': [str(inbox)], 'out_dir': str(tmp_path / "outbox"), 'debounce_seconds': 1}}
+    daemon = WatchDaemon(config, pool=ThreadPoolExecutor(2))
+    daemon.scan()
+    paths = [inbox / "acme_bank_aug.TXT", inbox / "acme_bank_sep.TXT"]
+    for path in paths:
+        path.write_text("2    28/08/2025    478322208/12390    1,000.00\n")
+    daemon.scan()
+    wait_idle(daemon, now=time.time() + 10)
+    assert sorted(daemon.parsed["acme"]["bank"]) == ["acme_bank_aug.TXT", "acme_bank_sep.TXT"]
+    
+    paths[0].unlink()
+    daemon.forget(str(paths[0]))
+    daemon.poll(now=time.time() + 20)
+    assert list(daemon.parsed["acme"]["bank"]) == ["acme_bank_sep.TXT"]
+    
+    paths[1].rename(tmp_path / "elsewhere.TXT") # moved out of the inbox
+    daemon.forget(str(paths[1]))
+    daemon.poll(now=time.time() + 30)
+    assert "acme" not in daemon.parsed and not daemon.seen
@@ -0,0 +1,108 @@
+from datetime import date
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.dates import parse_date
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+def day_numbers(values) -> np.ndarray:
+    """Dates -> float calendar day numbers since 1970-01-01 (NaN where missing/unparseable)."""
+    ts = pd.to_datetime(pd.Series(values).reset_index(drop=True), errors='coerce')
+    days = (ts - pd.Timestamp(1970, 1, 1)).dt.days
+    return days.to_numpy(dtype=np.float64, na_value=np.nan)
+
+def _weekday(name) -> int:
+    if isinstance(name, int):
+        return name
+    key = str(name).strip().lower()
+    for i, day in enumerate(WEEKDAYS):
+        if day.startswith(key) and len(key) >= 3:
+            return i
+    raise ValueError(f"Unknown weekday: {name!r}")
+
+class BusinessCalendar:
+    """
+    Business days = every day except the weekend days and holidays.
+    ordinals() maps dates to business-day ordinals (business days since
+    1970-01-01), via a cumulative table precomputed over the dates' range, so the
+    business-day gap between two dates is an integer subtraction. A weekend
+    or holiday takes the ordinal of the next business day (Saturday's deposit
+    is Sunday's / Monday's posting).
+    """
+    def __init__(self, weekend_days: Iterable = (5,), holidays: Iterable = ()):
+        self.weekend = sorted({_weekday(d) for d in weekend_days})
+        if len(self.weekend) == 7:
+            raise ValueError("Every weekday is a weekend day")
+        days = []
+        for h in holidays:
+            d = h if isinstance(h, date) else parse_date(str(h))
+            if d is None:
+                raise ValueError(f"Unparseable holiday: {h!r}")
+            days.append((d - date(1970, 1, 1)).days)
+        self.holidays = np.unique(np.asarray(days, dtype=np.int64))
+        self._holiday_set = set(self.holidays.tolist())
+        # Holidays that fall on working weekdays (the others are off anyway)
+        self._working_holidays = self.holidays[~np.isin((self.holidays + 3) % 7, self.weekend)]
+        # (first day number, exclusive cumulative business-day counts), swapped as one tuple
+        self._cover = (0, np.zeros(0, dtype=np.int64))
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["BusinessCalendar"]:
+        """Calendar for config['calendar'] (None when business days are not enabled)."""
+        cfg = config.get('calendar', {}) or {}
+        if not cfg.get('enabled', False):
+            return None
+        return cls(cfg.get('weekend_days', ['saturday']), cfg.get('holidays', []) or [])
+
+    def _business_before(self, n: int) -> int:
+        """Business days in [0, n) for day number n (negative for n < 0), in closed form."""
+        full, rem = divmod(n, 7)
+        count = full * (7 - len(self.weekend))
+        count += sum(1 for k in range(rem) if (k + 3) % 7 not in self.weekend)
+        h = self._working_holidays
+        return count - int(np.searchsorted(h, n) - np.searchsorted(h, 0))
+
+    def _table_for(self, lo: int, hi: int):
+        """(start, table) covering day numbers [lo, hi]; table[d - start] = business days before d."""
+        start, table = self._cover
+        if len(table) and start <= lo and hi < start + len(table):
+            return start, table
+        if len(table):
+            lo, hi = min(lo, start), max(hi, start + len(table) - 1)
+        lo, hi = lo - 366, hi + 366 # slack so nearby dates in later calls reuse the table
+        days = np.arange(lo, hi + 1, dtype=np.int64)
+        weekday = (days + 3) % 7 # 1970-01-01 was a Thursday (3)
+        business = ~np.isin(weekday, self.weekend) & ~np.isin(days, self.holidays)
+        # Anchored at 1970-01-01, so ordinals agree across tables / calls
+        table = self._business_before(lo) + np.concatenate([[0], np.cumsum(business)[:-1]]).astype(np.int64)
+        self._cover = (lo, table)
+        return lo, table
+
+    def ordinals_from_days(self, days: np.ndarray) -> np.ndarray:
+        """Calendar day numbers (float, NaN allowed) -> business-day ordinals (float, NaN kept)."""
+        out = np.full(len(days), np.nan)
+        ok = ~np.isnan(days)
+        if ok.any():
+            d = days[ok].astype(np.int64)
+            start, table = self._table_for(int(d.min()), int(d.max()))
+            out[ok] = table[d - start]
+        return out
+
+    def ordinals(self, values) -> np.ndarray:
+        return self.ordinals_from_days(day_numbers(values))
+
+    def is_business_day(self, d: date) -> bool:
+        n = (d - date(1970, 1, 1)).days
+        return (n + 3) % 7 not in self.weekend and n not in self._holiday_set
+
+    def gap(self, d1: date, d2: date) -> int:
+        """|business days between d1 and d2|."""
+        o = self.ordinals([d1, d2])
+        return int(abs(o[0] - o[1]))
+
+    def key(self) -> dict:
+        """Plain description for cache keys."""
+        return {"weekend": self.weekend, "holidays": self.holidays.tolist()}
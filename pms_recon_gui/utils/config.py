@@ -0,0 +1,21 @@
+import os
+import yaml
+from pathlib import Path
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def load_config(path: str = None) -> dict:
+    """
+    Load configuration from config.yml (no Streamlit needed: CLI, service, watcher).
+    Without a path, tries the working directory, its parent and the app root.
+    """
+    paths_to_try = [Path(path)] if path else [
+        Path("config.yml"),
+        Path("../config.yml"),
+        Path(os.path.join(ROOT_DIR, "config.yml"))
+    ]
+    for config_path in paths_to_try:
+        if config_path.exists():
+            with open(config_path, "r") as f:
+                return yaml.safe_load(f) or {}
+    return {}
@@ -1,4 +1,3 @@
-from dateutil import parser
 from datetime import datetime, date
 from typing import Optional
 
@@ -24,7 +23,8 @@ def parse_date(date_str: str) -> Optional[date]:
         pass
 
     try:
-        # Fallback to dateutil default parsing
+        # Fallback to dateutil default parsing (imported lazily: rarely reached)
+        from dateutil import parser
         dt = parser.parse(date_str, dayfirst=True)
         return dt.date()
     except (ValueError, TypeError):
@@ -0,0 +1,187 @@
+import io
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from enum import Enum
+from typing import Dict, List
+
+import pandas as pd
+
+# Result frames in the order they appear as files / sheets
+RESULT_NAMES = ("matched", "partial", "unmatched", "exceptions")
+FORMATS = ("csv", "parquet", "xlsx", "zip")
+BUNDLE_NAME = "reconciliation.zip"
+WORKBOOK_NAME = "reconciliation.xlsx"
+DEFAULT_CHUNK_ROWS = 50_000
+
+def _ordered(results: dict) -> list:
+    names = [n for n in RESULT_NAMES if n in results]
+    return names + [n for n in results if n not in names]
+
+def _check(cancel):
+    if cancel is not None:
+        cancel.check()
+
+def _chunks(df, chunk_rows: int):
+    for start in range(0, len(df), max(1, chunk_rows)):
+        yield df.iloc[start:start + chunk_rows]
+
+def _plain(value):
+    """Cell value as something CSV / XLSX / Parquet can hold (lists of row ids become text)."""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (list, tuple, set, dict)):
+        return str(value)
+    return value
+
+def _nested(value) -> bool:
+    return isinstance(value, (list, tuple, set, dict))
+
+def _flat(df):
+    """
+    Object columns with mixed / nested values mapped through _plain. A column
+    holding any list (SPLIT / BULK row ids next to 1:1 ids) becomes text in
+    every row, so Parquet sees one type per column.
+    """
+    cols = [c for c in df.columns if df[c].dtype == object]
+    if not cols:
+        return df
+    df = df.copy()
+    for c in cols:
+        if df[c].map(_nested).any():
+            df[c] = df[c].map(lambda v: None if v is None or (isinstance(v, float) and v != v) else str(_plain(v)))
+        else:
+            df[c] = df[c].map(_plain)
+    return df
+
+def write_csv(df, target, chunk_rows: int = DEFAULT_CHUNK_ROWS, cancel=None):
+    """
+    Stream a frame as CSV in row chunks, so only one chunk is ever rendered as
+    text. `target` is a path or a text file object.
+    """
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, "w", encoding="utf-8", newline="") as f:
+            return write_csv(df, f, chunk_rows, cancel)
+    if df.empty:
+        df.to_csv(target, index=False)
+        return
+    for i, chunk in enumerate(_chunks(df, chunk_rows)):
+        _check(cancel)
+        _flat(chunk).to_csv(target, index=False, header=(i == 0))
+
+def write_parquet(df, path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, cancel=None):
+    """Write a frame as Parquet, one row group per chunk. Needs pyarrow."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow)") from exc
+
+    flat = _flat(df)
+    schema = pa.Schema.from_pandas(flat, preserve_index=False)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in _chunks(flat, chunk_rows):
+            _check(cancel)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+def _xlsx_cell(value):
+    value = _plain(value)
+    if value is None or value is pd.NaT or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, (str, bool, int, float, datetime, date)):
+        return value
+    if hasattr(value, "item"): # numpy scalar
+        return _xlsx_cell(value.item())
+    return str(value)
+
+def write_xlsx(results: dict, path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, cancel=None):
+    """
+    One sheet per result frame, written with openpyxl's write-only workbook:
+    rows go straight to the sheet's XML stream instead of a cell tree.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for name in _ordered(results):
+        df = results[name]
+        ws = wb.create_sheet(title=name[:31])
+        ws.append([str(c) for c in df.columns])
+        for chunk in _chunks(df, chunk_rows):
+            _check(cancel)
+            for row in chunk.itertuples(index=False, name=None):
+                ws.append([_xlsx_cell(v) for v in row])
+    wb.save(path)
+
+def write_bundle(results: dict, path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, cancel=None):
+    """Zip of one CSV per result frame, each streamed straight into its archive entry."""
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name in _ordered(results):
+            with zf.open(f"{name}.csv", "w") as raw:
+                with io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+                    write_csv(results[name], f, chunk_rows, cancel)
+
+def export_results(results: dict, out_dir: str, formats=("csv",), workers: int = 4,
+                   chunk_rows: int = DEFAULT_CHUNK_ROWS, progress=None, cancel=None) -> Dict[str, List[str]]:
+    """
+    Write the requested artifacts for a reconciliation into out_dir:
+      csv / parquet  one file per result frame
+      xlsx           one workbook, one sheet per frame
+      zip            one archive of per-frame CSVs (plus the workbook if xlsx was asked for)
+    Independent files are written in parallel on a small thread pool; progress
+    (done, total, artifact=...) counts finished files. Returns {format: [paths]}.
+    If cancelled, files of this call are removed and JobCancelled propagates.
+    """
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown export format(s): {unknown} (expected some of {FORMATS})")
+    os.makedirs(out_dir, exist_ok=True)
+
+    tasks = [] # (format, path, fn, args)
+    for fmt in formats:
+        if fmt in ("csv", "parquet"):
+            writer = write_csv if fmt == "csv" else write_parquet
+            for name in _ordered(results):
+                path = os.path.join(out_dir, f"{name}.{fmt}")
+                tasks.append((fmt, path, writer, (results[name], path)))
+        elif fmt == "xlsx":
+            path = os.path.join(out_dir, WORKBOOK_NAME)
+            tasks.append((fmt, path, write_xlsx, (results, path)))
+        elif fmt == "zip":
+            path = os.path.join(out_dir, BUNDLE_NAME)
+            tasks.append((fmt, path, write_bundle, (results, path)))
+
+    written: Dict[str, List[str]] = {fmt: [] for fmt in formats}
+    done = 0
+    lock = threading.Lock()
+
+    def run(task):
+        nonlocal done
+        fmt, path, fn, args = task
+        _check(cancel)
+        fn(*args, chunk_rows=chunk_rows, cancel=cancel)
+        with lock:
+            done += 1
+            if progress:
+                progress(done, len(tasks), artifact=os.path.basename(path))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tasks) or 1)),
+                                thread_name_prefix="recon-export") as pool:
+            for future in [pool.submit(run, task) for task in tasks]:
+                future.result()
+        if "zip" in formats and "xlsx" in formats:
+            with zipfile.ZipFile(os.path.join(out_dir, BUNDLE_NAME), "a") as zf:
+                zf.write(os.path.join(out_dir, WORKBOOK_NAME), WORKBOOK_NAME)
+    except BaseException:
+        for _, path, _, _ in tasks:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    for fmt, path, _, _ in tasks:
+        written[fmt].append(path)
+    return written
@@ -0,0 +1,121 @@
+import multiprocessing
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Callable, Optional
+
+# Shared worker pool for background work started from Streamlit pages.
+# Threads (not processes) so jobs can report progress into plain Python objects
+# kept in st.session_state; the Streamlit script only polls them.
+_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="recon-worker")
+
+# progress(done, total, **info); info carries optional extras such as stage or eta
+ProgressCallback = Callable[..., None]
+
+class JobCancelled(Exception):
+    """Raised inside a job when its CancelToken has been cancelled."""
+
+class CancelToken:
+    """Cooperative cancellation flag, checked by long-running loops."""
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        """Raise JobCancelled if cancellation was requested."""
+        if self._event.is_set():
+            raise JobCancelled()
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool safe to start from a worker thread of a multi-threaded server
+    (Streamlit): spawned, not forked, so children never inherit locks another
+    thread was holding at fork time.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def wait_cancellable(future: Future, cancel: Optional[CancelToken], poll: float = 0.1):
+    """future.result(), checking cancel every poll seconds while waiting."""
+    while True:
+        if cancel is not None:
+            cancel.check()
+        try:
+            return future.result(timeout=poll)
+        except FuturesTimeout:
+            continue
+
+class BackgroundJob:
+    """
+    A function running on the shared worker pool.
+    The function must accept `progress` and `cancel` keyword arguments:
+    progress(done, total, **info) is recorded here for the UI to poll, and cancel
+    is this job's CancelToken.
+    """
+    def __init__(self, name: str, fn: Callable, *args, key: Optional[str] = None, **kwargs):
+        self.name = name
+        self.key = key # e.g. content hash of the input, to avoid re-submitting
+        self.token = CancelToken()
+        self.done_units = 0
+        self.total_units = 0
+        self.info = {} # extra progress fields (stage, matches, eta, ...)
+        self.started = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+        self.future = _EXECUTOR.submit(self._run, fn, args, kwargs)
+
+    def _run(self, fn, args, kwargs):
+        try:
+            return fn(*args, progress=self.report, cancel=self.token, **kwargs)
+        finally:
+            self.finished = time.time()
+
+    def report(self, done: int, total: int, **info):
+        with self._lock:
+            self.done_units = done
+            self.total_units = total
+            self.info = info
+
+    @property
+    def fraction(self) -> float:
+        with self._lock:
+            if not self.total_units:
+                return 0.0
+            return min(1.0, self.done_units / self.total_units)
+
+    @property
+    def running(self) -> bool:
+        return not self.future.done()
+
+    @property
+    def cancelled(self) -> bool:
+        if self.future.cancelled():
+            return True
+        return self.future.done() and isinstance(self.future.exception(), JobCancelled)
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        if not self.future.done() or self.cancelled:
+            return None
+        return self.future.exception()
+
+    @property
+    def error_traceback(self) -> str:
+        exc = self.error
+        if exc is None:
+            return ""
+        return "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+
+    def result(self):
+        return self.future.result()
+
+    def cancel(self):
+        self.token.cancel()
+        self.future.cancel() # no-op if already running; the token stops it
@@ -0,0 +1,174 @@
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from utils.config import ROOT_DIR
+from utils.jobs import JobCancelled
+
+log = logging.getLogger("recon.metrics")
+
+PREFIX = "pms_recon"
+JSONL_NAME = "metrics.jsonl"
+
+# name -> help text; every metric is a gauge holding the value of the last run
+METRICS = {
+    "run_timestamp_seconds": "Unix time the run started.",
+    "run_duration_seconds": "Wall time of the run.",
+    "run_success": "1 if the run finished, 0 if it failed or was cancelled.",
+    "stage_duration_seconds": "Wall time per stage (parse, normalize, matching stages per side).",
+    "rows_in": "Rows read per input (bank_blocks / broker_table_rows from files, bank / broker into matching).",
+    "rows_out": "Rows written per output (parsed bank / broker rows, rows per result report).",
+    "parse_failures": "Source rows the parsers rejected, per side and reason.",
+    "duplicates_dropped": "Parsed rows dropped as repeats across files, per side.",
+    "matches": "Matched and partial rows per side and match_type.",
+    "exceptions": "Exception records per ExceptionCode.",
+    "peak_rss_bytes": "Peak resident set size (process lifetime) of this process and its finished children.",
+}
+
+def peak_rss_bytes() -> Dict[str, int]:
+    """{'self': bytes, 'children': bytes}; {} where the resource module is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return {}
+    scale = 1 if sys.platform == "darwin" else 1024 # ru_maxrss: bytes on macOS, KiB elsewhere
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    }
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class RunMetrics:
+    """
+    Metrics of one parse or reconcile run. Values are keyed by metric name and
+    label set; add() accumulates. write() replaces a Prometheus textfile
+    (<prefix>_<kind>[_<labels>].prom, for node-exporter's textfile collector)
+    and appends the same numbers as one JSON line to metrics.jsonl.
+    """
+    def __init__(self, kind: str, labels: Optional[dict] = None):
+        self.kind = kind
+        self.labels = {k: str(v) for k, v in (labels or {}).items()}
+        self.started = time.time()
+        self.status = "running"
+        self.values: Dict[str, Dict[Tuple, float]] = {}
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, metric: str, value: float, **labels):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric!r}")
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self.values.setdefault(metric, {})
+            series[key] = series.get(key, 0) + value
+
+    def get(self, metric: str, **labels) -> float:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            return self.values.get(metric, {}).get(key, 0)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block as stage_duration_seconds{stage=name}."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add("stage_duration_seconds", time.perf_counter() - started, stage=name)
+
+    def finish(self, status: str = "ok"):
+        rss = peak_rss_bytes()
+        with self._lock:
+            self.status = status
+            self.values["run_timestamp_seconds"] = {(): self.started}
+            self.values["run_duration_seconds"] = {(): time.perf_counter() - self._t0}
+            self.values["run_success"] = {(): 1 if status == "ok" else 0}
+            self.values["peak_rss_bytes"] = {(("process", p),): v for p, v in rss.items()}
+
+    def _series(self) -> Dict[str, Dict[Tuple, float]]:
+        with self._lock:
+            return {name: dict(series) for name, series in self.values.items()}
+
+    # --- output ---------------------------------------------------------------
+
+    def to_record(self) -> dict:
+        """One JSON-lines record: run identity, status and every series."""
+        return {
+            "kind": self.kind,
+            "labels": self.labels,
+            "status": self.status,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "metrics": {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self._series().items()
+            },
+        }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        base = {"kind": self.kind, **self.labels}
+        values = self._series()
+        for name, help_text in METRICS.items():
+            series = values.get(name)
+            if not series:
+                continue
+            full = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} gauge")
+            for key, value in sorted(series.items()):
+                labels = ",".join(f'{k}="{_escape(v)}"' for k, v in {**base, **dict(key)}.items())
+                lines.append(f"{full}{{{labels}}} {float(value):.17g}")
+        return "\n".join(lines) + "\n"
+
+    def file_name(self) -> str:
+        parts = [PREFIX, self.kind] + [self.labels[k] for k in sorted(self.labels)]
+        return re.sub(r"[^A-Za-z0-9_.-]+", "_", "_".join(parts)) + ".prom"
+
+    def write(self, directory: str) -> Tuple[str, str]:
+        """Replace the .prom file atomically (temp + rename) and append the JSON line."""
+        os.makedirs(directory, exist_ok=True)
+        prom = os.path.join(directory, self.file_name())
+        tmp = f"{prom}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, prom)
+        jsonl = os.path.join(directory, JSONL_NAME)
+        with open(jsonl, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.to_record(), default=str) + "\n")
+        return prom, jsonl
+
+def metrics_dir(config: dict) -> Optional[str]:
+    """config['metrics']['dir'], relative paths taken from the app root (None = metrics are not written)."""
+    directory = (config.get('metrics', {}) or {}).get('dir')
+    return os.path.join(ROOT_DIR, directory) if directory else None
+
+@contextmanager
+def run_metrics(kind: str, config: dict, **labels):
+    """
+    RunMetrics for the block; on exit it is finished (ok / cancelled / failed)
+    and written to metrics_dir(config). A failed write is logged, never raised.
+    """
+    metrics = RunMetrics(kind, labels)
+    status = "failed"
+    try:
+        yield metrics
+        status = "ok"
+    except JobCancelled:
+        status = "cancelled"
+        raise
+    finally:
+        metrics.finish(status)
+        directory = metrics_dir(config)
+        if directory:
+            try:
+                metrics.write(directory)
+            except OSError as exc:
+                log.warning(f"Could not write metrics to {directory}: {exc}")
@@ -25,3 +25,56 @@ def extract_tokens(text: str) -> list[str]:
     if not text:
         return []
     return re.findall(r'\w+', text)
+
+# Values parsers emit when no ref was found; never used as match keys
+PLACEHOLDER_REFS = {"", "UNKNOWN", "NONE", "NAN", "NULL", "N/A", "NA"}
+
+_REF_SEPARATORS = re.compile(r'[\s\-_.:]+')
+
+def _strip_ref(ref: str) -> str:
+    """Drop separators and leading zeros ('00-478 322' -> '478322')."""
+    ref = _REF_SEPARATORS.sub('', ref)
+    return ref.lstrip('0') or ref
+
+def canonical_ref_keys(ref_raw) -> list[str]:
+    """
+    All canonical keys a reference can be matched on.
+    First entry is the primary key (canonical_ref_key); the rest are variants:
+    - upper-cased, separators and leading zeros removed
+    - slash suffix dropped ('478322208/12390' -> '478322208')
+    - CDS prefix dropped ('CDS-215769794' -> '215769794')
+    - CZ dividend suffix dropped ('72012511010096CZ' -> '72012511010096')
+    Variants shorter than 3 characters are not emitted.
+    """
+    if ref_raw is None or (isinstance(ref_raw, float) and ref_raw != ref_raw):
+        return []
+    ref = str(ref_raw).strip().upper()
+    if ref in PLACEHOLDER_REFS:
+        return []
+    
+    bases = [ref]
+    if '/' in ref:
+        head = ref.split('/')[0]
+        bases = [ref.replace('/', ''), head] if head else [ref.replace('/', '')]
+    
+    # The full ref is always a key, however short ('X1'); the floor below only
+    # keeps derived sub-keys from matching unrelated refs
+    full = _strip_ref(bases[0])
+    keys = [full] if full else []
+    for base in bases:
+        variants = [base]
+        if base.startswith('CDS'):
+            variants.append(base[3:])
+        # Same length guard as recon_clean's ref_rules for CZ dividend refs
+        if base.endswith('CZ') and len(base) > 10:
+            variants.append(base[:-2])
+        for v in variants:
+            key = _strip_ref(v)
+            if len(key) >= 3 and key not in keys:
+                keys.append(key)
+    return keys
+
+def canonical_ref_key(ref_raw) -> Optional[str]:
+    """Primary canonical key of a reference (None for missing/placeholder refs)."""
+    keys = canonical_ref_keys(ref_raw)
+    return keys[0] if keys else None
@@ -1,6 +1,4 @@
 import streamlit as st
-import yaml
-from pathlib import Path
 import os
 import sys
 
@@ -11,29 +9,43 @@ if root_dir not in sys.path:
 
 def load_config():
     """Load configuration from config.yml"""
-    # Try different paths depending on where the script is run
-    paths_to_try = [
-        Path("config.yml"),
-        Path("../config.yml"),
-        Path(os.path.join(root_dir, "config.yml"))
-    ]
-    
-    for config_path in paths_to_try:
-        if config_path.exists():
-            with open(config_path, "r") as f:
-                return yaml.safe_load(f)
-    return {}
+    from utils.config import load_config as load_config_file
+    return load_config_file()
 
 def init_session():
     """Initialize session state variables if they don't exist."""
+    from normalize.common import enable_copy_on_write
+    enable_copy_on_write()
+
     if 'config' not in st.session_state or not st.session_state['config']:
         st.session_state['config'] = load_config()
         
     if 'bank_df' not in st.session_state:
         st.session_state['bank_df'] = None
         
+    if 'bank_raw' not in st.session_state:
+        st.session_state['bank_raw'] = None # {source_file: RawStatement} behind bank_df's raw_start/raw_end
+        
     if 'broker_df' not in st.session_state:
         st.session_state['broker_df'] = None
         
     if 'results' not in st.session_state:
         st.session_state['results'] = None
+
+    if 'results_token' not in st.session_state:
+        st.session_state['results_token'] = None # new for every run stored in 'results'
+
+    if 'diagnostics' not in st.session_state:
+        st.session_state['diagnostics'] = None # CandidateDiagnostics of the run behind 'results'
+        
+    if 'parse_jobs' not in st.session_state:
+        st.session_state['parse_jobs'] = {}
+
+    if 'recon_job' not in st.session_state:
+        st.session_state['recon_job'] = None
+
+    if 'export_job' not in st.session_state:
+        st.session_state['export_job'] = None
+
+    if 'exports' not in st.session_state:
+        st.session_state['exports'] = None # {'results_token', 'out_dir', 'files' | 'downloads'} of the last export
@@ -0,0 +1,279 @@
+"""
+Watch-folder daemon: parses bank TXT / broker PDF files as they land in the
+inbox folders and reconciles an account as soon as both sides are present.
+
+    python watcher.py [--config config.yml]
+
+Settings live under `watch:` in config.yml. Files are grouped into accounts
+by `account_pattern` on the file name (first group, lower-cased), e.g.
+bishal_yakha_bank_statement.TXT and Bishal_Yakha_Broker_Ledger.pdf both
+belong to "bishal_yakha". Results go to <out_dir>/<account>/*.csv with a
+summary.json next to them.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+ROOT_DIR = os.path.abspath(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+log = logging.getLogger("recon.watcher")
+
+SIDE_BY_SUFFIX = {".txt": "bank", ".pdf": "broker"}
+DEFAULT_ACCOUNT_PATTERN = r"^(.+?)[_\- ]+(?:bank|broker)"
+
+def account_key(filename: str, pattern: str = DEFAULT_ACCOUNT_PATTERN) -> str:
+    """Account a statement belongs to, from its file name (falls back to the stem)."""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    m = re.search(pattern, stem, re.IGNORECASE)
+    return (m.group(1) if m else stem).lower()
+
+class Debouncer:
+    """
+    Holds back paths until they have been quiet for `delay` seconds and their
+    size stopped changing, so half-copied files are not parsed.
+    """
+    def __init__(self, delay: float = 5.0):
+        self.delay = delay
+        self._pending: Dict[str, tuple] = {} # path -> (last event time, last size)
+        self._lock = threading.Lock()
+
+    def touch(self, path: str, now: float = None):
+        with self._lock:
+            self._pending[path] = (now if now is not None else time.time(), _size(path))
+
+    def ready(self, now: float = None) -> List[str]:
+        now = now if now is not None else time.time()
+        done = []
+        with self._lock:
+            for path, (seen, size) in list(self._pending.items()):
+                if now - seen < self.delay:
+                    continue
+                current = _size(path)
+                if current is None:
+                    del self._pending[path] # deleted / moved away meanwhile
+                elif current != size:
+                    self._pending[path] = (now, current) # still growing
+                else:
+                    del self._pending[path]
+                    done.append(path)
+        return sorted(done)
+
+def _size(path: str) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+# --- Worker side -------------------------------------------------------------
+
+def _parse_file(side: str, path: str, config: dict):
+    from engine.pipeline import parse_files
+    from utils.metrics import run_metrics
+    with run_metrics("parse", config, side=side) as metrics:
+        df, _ = parse_files(side, [path], {**config, 'bank_parse_workers': 1}, metrics=metrics)
+    return df
+
+def _reconcile_account(account: str, bank_frames: list, broker_frames: list, config: dict, out_dir: str) -> dict:
+    from engine.pipeline import reconcile_frames, write_results
+    from parsers.uploads import merge_parsed
+    from utils.metrics import run_metrics
+
+    with run_metrics("reconcile", config, account=account) as metrics:
+        bank_df, bank_dupes = merge_parsed(bank_frames)
+        broker_df, broker_dupes = merge_parsed(broker_frames)
+        metrics.add("duplicates_dropped", bank_dupes, side="bank")
+        metrics.add("duplicates_dropped", broker_dupes, side="broker")
+        results, _ = reconcile_frames(bank_df, broker_df, config, allow_out_of_core=True, metrics=metrics)
+        account_dir = os.path.join(out_dir, account)
+        with metrics.stage("export"):
+            files = write_results(results, account_dir, config=config)
+    summary = {
+        "account": account,
+        "reconciled_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "bank_files": [name for name, _ in bank_frames],
+        "broker_files": [name for name, _ in broker_frames],
+        "duplicates_dropped": {"bank": bank_dupes, "broker": broker_dupes},
+        "counts": {name: len(df) for name, df in results.items()},
+        "files": files,
+    }
+    with open(os.path.join(account_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+# --- Daemon side -------------------------------------------------------------
+
+class WatchDaemon:
+    """
+    Parses each new file once (keyed by path, size and mtime) in a process
+    pool, keeps the parsed frames per account and side until the file is
+    deleted or moved away, and re-reconciles an account whenever one of its
+    files changes and both sides are present.
+    """
+    def __init__(self, config: dict, pool=None):
+        watch = config.get('watch', {}) or {}
+        self.config = config
+        self.inboxes = [os.path.abspath(p) for p in watch.get('inboxes', ['inbox'])]
+        self.out_dir = os.path.abspath(watch.get('out_dir', 'outbox'))
+        self.account_pattern = watch.get('account_pattern', DEFAULT_ACCOUNT_PATTERN)
+        self.debouncer = Debouncer(float(watch.get('debounce_seconds', 5)))
+        if pool is None:
+            from utils.jobs import process_pool
+            pool = process_pool(int(watch.get('workers', 2)) or os.cpu_count())
+        self.pool = pool
+
+        self.seen = {} # path -> (size, mtime) already parsed
+        self.parsed: Dict[str, Dict[str, dict]] = {} # account -> side -> {file name: frame}
+        self.parsing = {} # future -> (account, side, path)
+        self.reconciling = {} # future -> account
+        self.dirty = set() # accounts with new data since their last reconciliation
+        self._gone: List[str] = [] # paths deleted / moved away, from the observer thread
+        self._gone_lock = threading.Lock()
+
+    def side_of(self, path: str) -> Optional[str]:
+        return SIDE_BY_SUFFIX.get(os.path.splitext(path)[1].lower())
+
+    def notice(self, path: str):
+        """A file was created/modified/moved into an inbox."""
+        if self.side_of(path) and os.path.isfile(path):
+            self.debouncer.touch(path)
+
+    def forget(self, path: str):
+        """A file was deleted or moved out of an inbox (its frame is dropped on the next poll)."""
+        with self._gone_lock:
+            self._gone.append(os.path.abspath(path))
+
+    def _drop(self, path: str):
+        if self.seen.pop(path, None) is None:
+            return
+        account = account_key(path, self.account_pattern)
+        sides = self.parsed.get(account, {})
+        if sides.get(self.side_of(path), {}).pop(os.path.basename(path), None) is None:
+            return
+        if not any(sides.values()):
+            del self.parsed[account]
+            self.dirty.discard(account)
+        else:
+            self.dirty.add(account) # re-reconciled without it if both sides are still there
+
+    def scan(self):
+        """Pick up files already in the inboxes (e.g. dropped while the daemon was down)."""
+        for inbox in self.inboxes:
+            os.makedirs(inbox, exist_ok=True)
+            for name in sorted(os.listdir(inbox)):
+                self.notice(os.path.join(inbox, name))
+
+    def poll(self, now: float = None):
+        """Submit settled files, collect finished parses and start due reconciliations."""
+        with self._gone_lock:
+            gone, self._gone = self._gone, []
+        for path in gone:
+            self._drop(path)
+
+        for path in self.debouncer.ready(now):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if self.seen.get(path) == (stat.st_size, stat.st_mtime):
+                continue # unchanged since it was parsed
+            self.seen[path] = (stat.st_size, stat.st_mtime)
+            side = self.side_of(path)
+            account = account_key(path, self.account_pattern)
+            log.info("Parsing %s file %s (account %s)", side, path, account)
+            self.parsing[self.pool.submit(_parse_file, side, path, self.config)] = (account, side, path)
+
+        for future in [f for f in self.parsing if f.done()]:
+            account, side, path = self.parsing.pop(future)
+            if future.exception() is not None:
+                log.error("Failed to parse %s: %s", path, future.exception())
+                continue
+            if path not in self.seen:
+                continue # deleted / moved away while it was parsing
+            self.parsed.setdefault(account, {}).setdefault(side, {})[os.path.basename(path)] = future.result()
+            self.dirty.add(account)
+
+        for future in [f for f in self.reconciling if f.done()]:
+            account = self.reconciling.pop(future)
+            if future.exception() is not None:
+                log.error("Reconciliation of %s failed: %s", account, future.exception())
+            else:
+                log.info("Reconciled %s: %s", account, future.result()["counts"])
+
+        busy = set(self.reconciling.values()) | {account for account, _, _ in self.parsing.values()}
+        for account in sorted(self.dirty - busy):
+            sides = self.parsed.get(account, {})
+            if not sides.get('bank') or not sides.get('broker'):
+                continue
+            self.dirty.discard(account)
+            log.info("Reconciling %s", account)
+            future = self.pool.submit(
+                _reconcile_account, account,
+                sorted(sides['bank'].items()), sorted(sides['broker'].items()),
+                self.config, self.out_dir,
+            )
+            self.reconciling[future] = account
+
+    def run(self, interval: float = 1.0):
+        """Watch the inboxes until interrupted."""
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        daemon = self
+
+        class InboxHandler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    daemon.notice(event.src_path)
+
+            def on_modified(self, event):
+                if not event.is_directory:
+                    daemon.notice(event.src_path)
+
+            def on_deleted(self, event):
+                if not event.is_directory:
+                    daemon.forget(event.src_path)
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    daemon.forget(event.src_path)
+                    daemon.notice(event.dest_path)
+
+        self.scan()
+        observer = Observer()
+        for inbox in self.inboxes:
+            observer.schedule(InboxHandler(), inbox, recursive=False)
+        observer.start()
+        log.info("Watching %s -> %s", ", ".join(self.inboxes), self.out_dir)
+        try:
+            while True:
+                self.poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            observer.stop()
+            observer.join()
+            self.pool.shutdown(wait=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", dest="config_path", help="config.yml (default: the app's)")
+    args = parser.parse_args(argv)
+
+    from normalize.common import enable_copy_on_write
+    from utils.config import load_config
+
+    enable_copy_on_write()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    WatchDaemon(load_config(args.config_path)).run()
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,20 @@
 import argparse
 import sys
 import os
-import re
 import csv
 from datetime import datetime
 
 # Add src to path
-sys.path.append(os.path.dirname(__file__))
+if os.path.dirname(__file__) not in sys.path:
+    sys.path.append(os.path.dirname(__file__))
 
-from regex_utils import DATE_PATTERN, AMOUNT_PATTERN
+from regex_utils import DATE_PATTERN, AMOUNT_TOKEN
+from rule_table import RuleTable
 from text_rules import is_noise_line
 from ref_rules import extract_ref, clean_narration
 
-def parse_bank_txi(input_path, output_path):
+def parse_bank_txi(input_path, output_path, rules_path=None):
+    rules = RuleTable.load(rules_path) if rules_path else None
     print(f"Parsing Bank TXI: {input_path}...")
     
     with open(input_path, 'r', encoding='utf-8') as f:
@@ -29,7 +31,7 @@ def parse_bank_txi(input_path, output_path):
         if not line: continue
         
         # 1. Noise Filter
-        if is_noise_line(line):
+        if is_noise_line(line, rules):
             continue
             
         # 2. Date Detection (Start of Transaction)
@@ -41,7 +43,7 @@ def parse_bank_txi(input_path, output_path):
              
              # Process previous cluster if exists
              if current_lines:
-                 row = process_transaction_cluster(current_lines)
+                 row = process_transaction_cluster(current_lines, rules)
                  if row: cleaned_rows.append(row)
                  current_lines = []
              
@@ -56,7 +58,7 @@ def parse_bank_txi(input_path, output_path):
                  
     # Process last cluster
     if current_lines:
-        row = process_transaction_cluster(current_lines)
+        row = process_transaction_cluster(current_lines, rules)
         if row: cleaned_rows.append(row)
         
     # Write to CSV
@@ -69,7 +71,7 @@ def parse_bank_txi(input_path, output_path):
         writer.writerows(cleaned_rows)
     print("Done.")
 
-def process_transaction_cluster(lines):
+def process_transaction_cluster(lines, rules=None):
     """
     Merge lines for a single transaction.
     Example split dividend:
@@ -103,7 +105,7 @@ def process_transaction_cluster(lines):
     for t in tokens[1:]:
         # Remove commas for check
         clean_t = t.replace(',', '')
-        if re.match(r'^[\-\+]?\d+(\.\d{2})?$', clean_t):
+        if AMOUNT_TOKEN.fullmatch(clean_t):
             amounts.append(float(clean_t))
         else:
             other_tokens.append(t)
@@ -121,46 +123,17 @@ def process_transaction_cluster(lines):
     # 3. Extract Ref & Narration
     # Use helper rules
     # We pass the full text as "narration context" to help decision making (e.g. check for "Tax")
-    ref_no = extract_ref(other_tokens, full_text)
+    ref_no = extract_ref(other_tokens, full_text, rules)
     
-    # Narration: Join other tokens, excluding the Ref
-    # Also exclude tokens that look like the ref we just found (to clean up narration)
-    
-    final_tokens = []
-    for t in other_tokens:
-        # If t is exactly the ref or starts with ref (if ref is long)
-        if ref_no and (t == ref_no or (len(ref_no) > 5 and t.startswith(ref_no))):
-            continue
-        # Also clean up "Interest" specific noise if needed?
-        # User said: "Interest (12/08/25-17/10/25)" -> Keep it.
-        # User said: "IPS CHARGE ... remove trailing Dr/Cr totals" -> The Dr/Cr totals likely look like "1,673,000.48".
-        # We already filtered out "valid amounts" into `amounts`. 
-        # But 'valid_amounts' logic was: "abs(a) > 0.001".
-        # If the balance line "1,673,000.48" was in `amounts`, it's gon.
-        # If it wasn't valid amount (maybe formatting?), it's here.
-        
-        final_tokens.append(t)
-
-    narration = clean_narration(" ".join(final_tokens))
-    
-    # Ref cleanup (stripping /prefix) inside extract_ref logic? 
-    # extract_ref logic usually returns the Clean token if it matched the split logic.
-    # But if it matched "CDS-...", it returns "CDS-..."
-    # If extract_ref returned "47832208", then t "47832208/1230" wouldn't match "47832208" EXACTLY.
-    # We need to handle that in the loop above.
-    
-    # Re-loop to catch the original token that *generated* the ref_no
+    # Narration: other tokens minus the ref and, for long refs, the token that
+    # produced it (e.g. "47832208/1230" for ref "47832208").
+    # Balance figures like "1,673,000.48" were already taken out as amounts.
     if ref_no:
-        final_tokens_2 = []
-        for t in other_tokens:
-            # Check if t "contains" ref_no or vice versa?
-            # t: "47832208/1230", ref_no: "47832208"
-            if str(ref_no) in t and len(str(ref_no)) > 5:
-                continue
-            if t == str(ref_no):
-                continue
-            final_tokens_2.append(t)
-        narration = clean_narration(" ".join(final_tokens_2))
+        long_ref = len(ref_no) > 5
+        final_tokens = [t for t in other_tokens if not (t == ref_no or (long_ref and ref_no in t))]
+    else:
+        final_tokens = other_tokens
+    narration = clean_narration(" ".join(final_tokens))
     
     return {
         "txn_date": txn_date,
@@ -173,6 +146,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--in", dest="input_file", required=True)
     parser.add_argument("--out", dest="output_file", required=True)
+    parser.add_argument("--rules", dest="rules_file", help="cleaning rule table (default: clean_rules.json)")
     args = parser.parse_args()
     
-    parse_bank_txi(args.input_file, args.output_file)
+    parse_bank_txi(args.input_file, args.output_file, args.rules_file)
@@ -1,15 +1,16 @@
-import pandas as pd
 import argparse
 import sys
 import os
 import re
 
 # Add src to path
-sys.path.append(os.path.dirname(__file__))
+if os.path.dirname(__file__) not in sys.path:
+    sys.path.append(os.path.dirname(__file__))
 
 from text_rules import clean_particulars
 
 def clean_amount(val):
+    import pandas as pd
     if pd.isna(val):
         return 0.0
     s = str(val).strip()
@@ -26,6 +27,9 @@ def clean_amount(val):
         return 0.0
 
 def process_broker_csv(input_path, output_path):
+    # pandas is imported here, not at module load, so `--help` / bad args exit fast
+    import pandas as pd
+    
     print(f"Reading {input_path}...")
     try:
         df = pd.read_csv(input_path)
@@ -1,8 +1,10 @@
-import pandas as pd
 import argparse
 import sys
 
 def generate_diff(old_path, new_path, out_path):
+    # pandas is imported here, not at module load, so `--help` / bad args exit fast
+    import pandas as pd
+    
     print(f"Generating diff: {old_path} -> {new_path}")
     
     try:
@@ -7,5 +7,8 @@ DATE_PATTERN = re.compile(r'(\d{2}/\d{2}/\d{4})|(\d{4}-\d{2}-\d{2})')
 # We need to be careful with dots in dates vs amounts.
 AMOUNT_PATTERN = re.compile(r'[\-\+]?\s*[0-9]{1,3}(?:,?[0-9]{3})*(?:\.[0-9]{2})?')
 
+# Whole token that is an amount (commas removed first): 1594.00, -12, +5.00
+AMOUNT_TOKEN = re.compile(r'[\-\+]?\d+(\.\d{2})?')
+
 # Ref candidate: Alphanumeric, maybe with /
 REF_CANDIDATE = re.compile(r'[A-Za-z0-9/\-]+')
@@ -0,0 +1,88 @@
+import json
+import os
+import re
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), "clean_rules.json")
+
+def _overlapping(phrases) -> bool:
+    """True if a proper suffix of one phrase is a prefix of another."""
+    return any(
+        p[i:] == q[:len(p) - i]
+        for p in phrases for q in phrases
+        for i in range(1, len(p)) if len(p) - i < len(q)
+    )
+
+class RuleTable:
+    """
+    Bank cleaning rules from a JSON table (see clean_rules.json):
+      noise: a line is noise if it contains every phrase of any entry (case-insensitive)
+      tax_exclusions: narration phrases for which no ref is picked (case-insensitive)
+      ref_patterns: full-match token patterns; the lowest priority wins, then
+        the earliest token. If a pattern has a capture group, that is the ref.
+    Noise phrases and ref patterns each compile into a single regex, so the
+    cost per line / token does not grow with the number of rules.
+    """
+    def __init__(self, noise: list, tax_exclusions: list, ref_patterns: list):
+        self.noise_rules = [frozenset(p.lower() for p in rule) for rule in noise]
+        phrases = sorted({p for rule in self.noise_rules for p in rule}, key=len, reverse=True)
+        # One alternation, longest first. A match also stands for the phrases
+        # inside it; if a phrase can start inside another and run past its end,
+        # the scan resumes one character after each match instead of at its end.
+        self._noise_re = re.compile("|".join(map(re.escape, phrases))) if phrases else None
+        self._implied = {p: frozenset(q for q in phrases if q in p) for p in phrases}
+        self._noise_overlap = _overlapping(phrases)
+
+        taxes = sorted({p.lower() for p in tax_exclusions}, key=len, reverse=True)
+        self._tax_re = re.compile("|".join(map(re.escape, taxes))) if taxes else None
+
+        # Alternatives in priority order: the first one that fully matches a token is its best class
+        ordered = sorted(ref_patterns, key=lambda r: r['priority'])
+        parts = []
+        self._ref_groups = {} # outer group index -> (priority, group holding the ref)
+        group = 1
+        for rule in ordered:
+            inner = re.compile(rule['pattern']).groups
+            parts.append(f"({rule['pattern']})")
+            self._ref_groups[group] = (rule['priority'], group + 1 if inner else group)
+            group += 1 + inner
+        self._ref_re = re.compile("|".join(parts), re.DOTALL) if parts else None
+        self._top_priority = ordered[0]['priority'] if ordered else None
+
+    @classmethod
+    def load(cls, path: str = None) -> "RuleTable":
+        with open(path or DEFAULT_RULES_PATH, "r", encoding="utf-8") as f:
+            table = json.load(f)
+        return cls(table.get("noise", []), table.get("tax_exclusions", []), table.get("ref_patterns", []))
+
+    def is_noise(self, line: str) -> bool:
+        if self._noise_re is None:
+            return False
+        line = line.lower()
+        search = self._noise_re.search
+        found = set()
+        m = search(line)
+        while m is not None:
+            found |= self._implied[m.group()]
+            m = search(line, m.start() + 1 if self._noise_overlap else m.end())
+        return any(rule <= found for rule in self.noise_rules)
+
+    def is_tax(self, narration: str) -> bool:
+        return self._tax_re is not None and self._tax_re.search(narration.lower()) is not None
+
+    def extract_ref(self, tokens: list) -> str:
+        """Best ref among tokens by pattern priority ("" if none)."""
+        if self._ref_re is None:
+            return ""
+        best = None
+        for t in tokens:
+            m = self._ref_re.fullmatch(t)
+            if m is None:
+                continue
+            priority, ref_group = self._ref_groups[m.lastindex]
+            if best is None or priority < best[0]:
+                best = (priority, m.group(ref_group))
+                if priority == self._top_priority:
+                    break
+        return best[1] if best else ""
+
+DEFAULT_RULES = RuleTable.load()
@@ -0,0 +1,40 @@
+import pytest
+import json
+import sys 
+import os 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rule_table import RuleTable
+from text_rules import is_noise_line
+from bank_parser import process_transaction_cluster
+
+def test_default_noise_rules():
+    assert is_noise_line("Continued Page 2")
+    assert is_noise_line("Dr Count 12 Cr Count 30")
+    assert not is_noise_line("Dr Count 12")
+    assert is_noise_line("~Date Summary")
+    assert not is_noise_line("28/08/2025 1,046,721.56 BNKFT-PMS")
+
+def test_custom_rule_table(tmp_path):
+    # A new bank quirk is a table entry, not a code change
+    table = {
+        "noise": [["opening balance"]],
+        "tax_exclusions": ["tds"],
+        "ref_patterns": [
+            {"name": "utr", "priority": 1, "pattern": "UTR:(\\w+)"},
+            {"name": "long_number", "priority": 2, "pattern": ",*(?:\\d,*){5,16}"}
+        ]
+    }
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(table))
+    rules = RuleTable.load(str(path))
+    
+    assert is_noise_line("OPENING BALANCE 1,000.00", rules)
+    assert not is_noise_line("Continued Page 2", rules)
+    
+    row = process_transaction_cluster(["02/11/2025 1,504.00", "CDS-215769794 UTR:AB123456 transfer"], rules)
+    assert row['ref_no'] == "AB123456"
+    assert row['narration'] == "CDS-215769794 transfer"
+    
+    row = process_transaction_cluster(["02/11/2025 1,504.00", "TDS UTR:AB123456"], rules)
+    assert row['ref_no'] == ""
@@ -1,4 +1,5 @@
 import re
+from rule_table import DEFAULT_RULES, RuleTable
 
 def clean_particulars(text: str) -> str:
     """
@@ -23,15 +24,8 @@ def clean_particulars(text: str) -> str:
     
     return s.strip()
 
-def is_noise_line(line: str) -> bool:
+def is_noise_line(line: str, rules: RuleTable = None) -> bool:
     """
-    Check if a line is header/footer noise.
+    Check if a line is header/footer noise (noise phrases of the rule table).
     """
-    l = line.lower()
-    if 'collect' in l: return True
-    if 'date summary' in l: return True
-    if 'dr count' in l and 'cr count' in l: return True
-    if 'branch,' in l or 'branch ,' in l: return True
-    if 'continued page' in l: return True
-    if 'summary' in l and '~date' in l: return True
-    return False
+    return (rules or DEFAULT_RULES).is_noise(line)